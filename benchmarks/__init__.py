@@ -0,0 +1,7 @@
+"""
+Benchmarks of sorting stages and of full sorting runs
+over generated trees of files. Run with:
+
+    python -m benchmarks run results.json
+    python -m benchmarks compare old.json new.json
+"""
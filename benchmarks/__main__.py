@@ -0,0 +1,112 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from datetime import datetime
+
+from .corpus import CorpusSpec
+from .stages import DEFAULT_FORMAT, StageBenchmarks, run_sorters
+
+DEFAULT_SPEC = CorpusSpec()
+
+parser = argparse.ArgumentParser(prog='python -m benchmarks')
+commands = parser.add_subparsers(dest='command')
+
+run_parser = commands.add_parser(
+    'run', help='Run benchmarks and write results as JSON')
+run_parser.add_argument('output', type=str,
+                        help='Where to write results')
+run_parser.add_argument('--label', type=str, default='',
+                        help='Name of run, e.g. version being measured')
+run_parser.add_argument('--files', type=int, default=DEFAULT_SPEC.files)
+run_parser.add_argument('--depth', type=int, default=DEFAULT_SPEC.depth)
+run_parser.add_argument('--width', type=int, default=DEFAULT_SPEC.width,
+                        help='Subfolders of every folder')
+run_parser.add_argument('--duplicates', type=float,
+                        default=DEFAULT_SPEC.duplicates,
+                        help='Part of files which are copies of others')
+run_parser.add_argument('--collisions', type=float,
+                        default=DEFAULT_SPEC.collisions,
+                        help='Part of files with names used in other folders')
+run_parser.add_argument('--min-size', type=int, default=DEFAULT_SPEC.min_size)
+run_parser.add_argument('--max-size', type=int, default=DEFAULT_SPEC.max_size)
+run_parser.add_argument('--seed', type=int, default=DEFAULT_SPEC.seed)
+run_parser.add_argument('--repeat', type=int, default=3,
+                        help='Best of this count of repeats is taken')
+run_parser.add_argument('--format', type=str, default=DEFAULT_FORMAT,
+                        help='Folder structure format')
+run_parser.add_argument('--workers', type=int, default=1)
+run_parser.add_argument('--processes', type=int, default=0)
+run_parser.add_argument('--stages-only', action='store_true',
+                        help='Skip full sorting runs')
+
+compare_parser = commands.add_parser(
+    'compare', help='Compare two result files')
+compare_parser.add_argument('old', type=str)
+compare_parser.add_argument('new', type=str)
+
+
+def run(args):
+    spec = CorpusSpec(
+        files=args.files, depth=args.depth, width=args.width,
+        duplicates=args.duplicates, collisions=args.collisions,
+        min_size=args.min_size, max_size=args.max_size, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as work_path:
+        stages = StageBenchmarks(work_path, spec, args.format)
+        counts = stages.counts
+        results = stages.run(args.repeat)
+    if not args.stages_only:
+        results.update(run_sorters(
+            spec, args.repeat, args.format,
+            workers=args.workers, processes=args.processes))
+
+    report = {
+        'label': args.label,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': {**spec._asdict(), 'counts': counts},
+        'options': {
+            'format': args.format,
+            'repeat': args.repeat,
+            'workers': args.workers,
+            'processes': args.processes,
+        },
+        'results': {
+            name: result.to_dict() for name, result in results.items()},
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        print(f'{name:40} {result.seconds:10.4f}s '
+              f'{result.to_dict()["files_per_second"]:12.1f} files/s')
+
+
+def compare(args):
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    if old['corpus'] != new['corpus']:
+        print('Warning: results were measured on different trees')
+    print(f'{"":40} {old["label"] or "old":>12} {new["label"] or "new":>12}')
+    for name, new_result in new['results'].items():
+        old_result = old['results'].get(name)
+        if old_result is None:
+            continue
+        ratio = (old_result['seconds'] / new_result['seconds']
+                 if new_result['seconds'] else 0.0)
+        print(f'{name:40} {old_result["seconds"]:11.4f}s '
+              f'{new_result["seconds"]:11.4f}s {ratio:8.2f}x')
+
+
+args = parser.parse_args()
+if args.command == 'run':
+    run(args)
+elif args.command == 'compare':
+    compare(args)
+else:
+    parser.print_help()
+    sys.exit(1)
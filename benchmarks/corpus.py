@@ -0,0 +1,183 @@
+import os
+import random
+import struct
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from file_sort.utils.exif import (
+    DATE_PATTERN,
+    EXIF_HEADER,
+    JPEG_APP1,
+    JPEG_END,
+    JPEG_START,
+    TAG_DATE_TIME,
+    TAG_DATE_TIME_DIGITIZED,
+    TAG_DATE_TIME_ORIGINAL,
+    TAG_EXIF_IFD,
+    TYPE_ASCII,
+    TYPE_LONG
+)
+
+# dates of files are spread over these years
+FIRST_DATE = datetime(2005, 1, 1)
+DATES_RANGE = timedelta(days=15 * 365)
+
+# brands of ftyp box for every video extension
+VIDEO_BRANDS = {
+    'mp4': b'isom',
+    'mov': b'qt  ',
+}
+
+# what part of files every kind takes
+KIND_WEIGHTS = {
+    'jpg': 6,
+    'mp4': 1,
+    'mov': 1,
+    'txt': 2,
+}
+
+
+class CorpusSpec(NamedTuple):
+    """ What tree generator makes, same spec gives same tree """
+    files: int = 1000
+    depth: int = 3
+    # subfolders of every folder
+    width: int = 4
+    # part of files which are copies of other files with other names
+    duplicates: float = 0.05
+    # part of files named the same as some file of other folder
+    collisions: float = 0.05
+    min_size: int = 1024
+    max_size: int = 64 * 1024
+    seed: int = 1
+
+
+def get_folders(root: str, spec: CorpusSpec) -> List[str]:
+    """ All folders of tree, root is included """
+    folders = [root]
+    level = [root]
+    for depth in range(spec.depth):
+        level = [os.path.join(folder, f'folder_{depth}_{i}')
+                 for folder in level for i in range(spec.width)]
+        folders.extend(level)
+    return folders
+
+
+def random_bytes(size: int, rnd: random.Random) -> bytes:
+    return rnd.getrandbits(size * 8).to_bytes(size, 'little')
+
+
+def make_jpeg(date: datetime, size: int, rnd: random.Random) -> bytes:
+    """ Small JPEG with EXIF block where date is written """
+    date_value = date.strftime(DATE_PATTERN).encode('ascii') + b'\x00'
+    # TIFF header, IFD0 with DateTime and pointer to EXIF IFD,
+    # EXIF IFD with DateTimeOriginal and DateTimeDigitized, then values
+    ifd0_offset = 8
+    ifd0_size = 2 + 2 * 12 + 4
+    exif_offset = ifd0_offset + ifd0_size
+    exif_size = 2 + 2 * 12 + 4
+    values_offset = exif_offset + exif_size
+    date_offsets = [values_offset + i * len(date_value) for i in range(3)]
+
+    tiff = b'II*\x00' + struct.pack('<I', ifd0_offset)
+    tiff += struct.pack('<H', 2)
+    tiff += struct.pack('<HHII', TAG_DATE_TIME, TYPE_ASCII,
+                        len(date_value), date_offsets[0])
+    tiff += struct.pack('<HHII', TAG_EXIF_IFD, TYPE_LONG, 1, exif_offset)
+    tiff += struct.pack('<I', 0)
+    tiff += struct.pack('<H', 2)
+    tiff += struct.pack('<HHII', TAG_DATE_TIME_ORIGINAL, TYPE_ASCII,
+                        len(date_value), date_offsets[1])
+    tiff += struct.pack('<HHII', TAG_DATE_TIME_DIGITIZED, TYPE_ASCII,
+                        len(date_value), date_offsets[2])
+    tiff += struct.pack('<I', 0)
+    tiff += date_value * 3
+
+    segment = EXIF_HEADER + tiff
+    data = (JPEG_START + bytes((0xFF, JPEG_APP1)) +
+            struct.pack('>H', len(segment) + 2) + segment)
+    payload = max(size - len(data) - 2, 0)
+    return data + random_bytes(payload, rnd) + bytes((0xFF, JPEG_END))
+
+
+def make_video(extension: str, size: int, rnd: random.Random) -> bytes:
+    """ File starting like MP4 or MOV, contents are random """
+    brand = VIDEO_BRANDS[extension]
+    ftyp = brand + struct.pack('>I', 0x200) + brand + b'mp41'
+    data = struct.pack('>I', len(ftyp) + 8) + b'ftyp' + ftyp
+    payload = max(size - len(data) - 8, 0)
+    return (data + struct.pack('>I', payload + 8) + b'mdat' +
+            random_bytes(payload, rnd))
+
+
+def make_text(size: int, rnd: random.Random) -> bytes:
+    words = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'photo', 'album')
+    lines = []
+    length = 0
+    while length < size:
+        line = ' '.join(rnd.choice(words) for _ in range(10))
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines).encode('ascii')[:size]
+
+
+def generate_corpus(root: str, spec: CorpusSpec = CorpusSpec()
+                    ) -> Dict[str, int]:
+    """
+    Make tree of files described by spec in root.
+    Returns count of files of every kind
+    """
+    rnd = random.Random(spec.seed)
+    folders = get_folders(root, spec)
+    for folder in folders:
+        os.makedirs(folder, exist_ok=True)
+    kinds = list(KIND_WEIGHTS)
+    weights = list(KIND_WEIGHTS.values())
+
+    counts = dict.fromkeys(kinds + ['duplicates', 'collisions'], 0)
+    written: List[str] = []
+    dates: Dict[str, datetime] = {}
+    for i in range(spec.files):
+        folder = rnd.choice(folders)
+        date = FIRST_DATE + timedelta(
+            seconds=rnd.randrange(int(DATES_RANGE.total_seconds())))
+        size = rnd.randint(spec.min_size, spec.max_size)
+        chance = rnd.random()
+
+        if written and chance < spec.duplicates:
+            source = rnd.choice(written)
+            name = f'copy_{i}_{os.path.basename(source)}'
+            date = dates[source]
+            with open(source, 'rb') as f:
+                data = f.read()
+            counts['duplicates'] += 1
+        else:
+            kind = rnd.choices(kinds, weights)[0]
+            name = f'file_{i}.{kind}'
+            if written and chance < spec.duplicates + spec.collisions:
+                # same name and date in other folder, so both files go to
+                # the same folder, content is different
+                source = rnd.choice(written)
+                name = os.path.basename(source)
+                date = dates[source]
+                kind = os.path.splitext(name)[1].strip('.')
+                if os.path.exists(os.path.join(folder, name)):
+                    name = f'file_{i}.{kind}'
+                else:
+                    counts['collisions'] += 1
+            if kind == 'jpg':
+                data = make_jpeg(date, size, rnd)
+            elif kind in VIDEO_BRANDS:
+                data = make_video(kind, size, rnd)
+            else:
+                data = make_text(size, rnd)
+            counts[kind] += 1
+
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        timestamp = date.timestamp()
+        os.utime(path, (timestamp, timestamp))
+        written.append(path)
+        dates[path] = date
+    return counts
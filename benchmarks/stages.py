@@ -0,0 +1,200 @@
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+from file_sort.utils.destination import DestinationFolder
+from file_sort.utils.enums import (
+    ClassificationMethodEnum,
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.exif import read_exif_date
+from file_sort.utils.fastcopy import copy_file
+from file_sort.utils.file_classes import File
+from file_sort.utils.header import HeaderReader
+from file_sort.utils.main import Sorter
+from file_sort.utils.metadata import get_content_type, get_file
+from file_sort.utils.scanner import scan
+from file_sort.utils.tag_classes import PathRenderer
+
+from .corpus import CorpusSpec, generate_corpus
+
+DEFAULT_FORMAT = '%T/%Y/%m%B - %d'
+
+
+class Result(NamedTuple):
+    """ Time of the best repeat and count of files it processed """
+    seconds: float
+    files: int
+    failed: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'seconds': self.seconds,
+            'files': self.files,
+            'failed': self.failed,
+            'files_per_second':
+                self.files / self.seconds if self.seconds else 0.0,
+        }
+
+
+def measure(run: Callable[[], Result], repeat: int,
+            prepare: Callable[[], None] = lambda: None) -> Result:
+    """ Run benchmark several times, prepare is not measured """
+    best = None
+    for _ in range(max(repeat, 1)):
+        prepare()
+        result = run()
+        if best is None or result.seconds < best.seconds:
+            best = result
+    return best  # type: ignore
+
+
+def _timed(body: Callable[[], int], failed: Callable[[], int] = lambda: 0
+           ) -> Result:
+    start = time.perf_counter()
+    files = body()
+    return Result(time.perf_counter() - start, files, failed())
+
+
+class StageBenchmarks:
+    """ Benchmarks of separate stages over one generated tree """
+    def __init__(self, work_path: str, spec: CorpusSpec,
+                 path_format: str = DEFAULT_FORMAT):
+        self.work_path = work_path
+        self.spec = spec
+        self.path_format = path_format
+        self.src_path = os.path.join(work_path, 'corpus')
+        self.counts = generate_corpus(self.src_path, spec)
+        self.paths = sorted(entry.path for entry in scan(self.src_path))
+        self.files: List[File] = [get_file(path) for path in self.paths]
+
+    def run(self, repeat: int) -> Dict[str, Result]:
+        results = {
+            'scan': measure(self.scan, repeat),
+        }
+        for method in ClassificationMethodEnum:
+            results[f'classify.{method.name.lower()}'] = measure(
+                lambda: self.classify(method), repeat)
+        results['exif_date'] = measure(self.exif_date, repeat)
+        results['render_path'] = measure(self.render_path, repeat)
+        results['resolve_conflicts'] = measure(
+            self.resolve_conflicts, repeat)
+        results['transfer'] = measure(
+            self.transfer, repeat, self._clean_destination)
+        return results
+
+    def scan(self) -> Result:
+        return _timed(lambda: sum(1 for _ in scan(self.src_path)))
+
+    def classify(self, method) -> Result:
+        def _body() -> int:
+            for path in self.paths:
+                with HeaderReader(path) as reader:
+                    get_content_type(reader, method)
+            return len(self.paths)
+        return _timed(_body)
+
+    def exif_date(self) -> Result:
+        jpegs = [path for path in self.paths if path.endswith('.jpg')]
+        failed = []
+
+        def _body() -> int:
+            for path in jpegs:
+                with HeaderReader(path) as reader:
+                    if read_exif_date(reader) is None:
+                        failed.append(path)
+            return len(jpegs)
+        return _timed(_body, lambda: len(failed))
+
+    def render_path(self) -> Result:
+        def _body() -> int:
+            # renderer remembers folders, new one is made every time
+            renderer = PathRenderer(self.path_format)
+            for file_obj in self.files:
+                renderer.render(file_obj)
+            return len(self.files)
+        return _timed(_body)
+
+    def resolve_conflicts(self) -> Result:
+        """ All files go to one folder, so every collision is resolved """
+        empty_path = os.path.join(self.work_path, 'empty')
+        os.makedirs(empty_path, exist_ok=True)
+
+        def _body() -> int:
+            folder = DestinationFolder(empty_path)
+            for path in self.paths:
+                name = os.path.basename(path)
+                if folder.exists(name):
+                    name = folder.get_free_name(name)
+                folder.add(name)
+            return len(self.paths)
+        return _timed(_body)
+
+    def transfer(self) -> Result:
+        dst_path = self._dst_path
+
+        def _body() -> int:
+            for i, path in enumerate(self.paths):
+                copy_file(path, os.path.join(dst_path, str(i)))
+            return len(self.paths)
+        return _timed(_body)
+
+    @property
+    def _dst_path(self) -> str:
+        return os.path.join(self.work_path, 'transfer')
+
+    def _clean_destination(self):
+        shutil.rmtree(self._dst_path, ignore_errors=True)
+        os.makedirs(self._dst_path)
+
+
+def run_sorter(spec: CorpusSpec, method, conflict_resolve_method,
+               repeat: int, path_format: str = DEFAULT_FORMAT,
+               **sorter_options) -> Result:
+    """
+    Sort fresh tree made by spec with given methods. Tree is made anew
+    for every repeat, because moving files takes them away
+    """
+    best = None
+    for _ in range(max(repeat, 1)):
+        with tempfile.TemporaryDirectory() as work_path:
+            src_path = os.path.join(work_path, 'src')
+            dst_path = os.path.join(work_path, 'dst')
+            generate_corpus(src_path, spec)
+            os.makedirs(dst_path)
+            sorter = Sorter(
+                src_path, dst_path, path_format, method,
+                conflict_resolve_method, FolderCleanupOptionsEnum.LEAVE,
+                **sorter_options)
+            failed = []
+
+            def _body() -> int:
+                count = 0
+                for is_done, path in sorter.sort():
+                    count += 1
+                    if not is_done:
+                        failed.append(path)
+                return count
+            result = _timed(_body, lambda: len(failed))
+        if best is None or result.seconds < best.seconds:
+            best = result
+    return best  # type: ignore
+
+
+def run_sorters(spec: CorpusSpec, repeat: int,
+                path_format: str = DEFAULT_FORMAT,
+                **sorter_options) -> Dict[str, Result]:
+    """ Full sorting with every sort method and conflict resolve method """
+    results = {}
+    for method in SortMethodEnum:
+        for conflict_resolve_method in ConflictResolveMethodEnum:
+            name = (f'sort.{method.name.lower()}.'
+                    f'{conflict_resolve_method.name.lower()}')
+            results[name] = run_sorter(
+                spec, method, conflict_resolve_method, repeat, path_format,
+                **sorter_options)
+    return results
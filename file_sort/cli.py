@@ -2,14 +2,28 @@ import argparse
 import os
 import sys
 from gettext import gettext as _
+from typing import Tuple
 
+from file_sort.utils.cache import (
+    CACHE_PATH,
+    DEFAULT_CACHE_SIZE,
+    MetadataCache
+)
+from file_sort.utils.devices import get_device
+from file_sort.utils.duplicates import HASH_CACHE_PATH, HashCache
 from file_sort.utils.enums import (
+    ClassificationMethodEnum,
     ConflictResolveMethodEnum,
+    DuplicatesOptionEnum,
     FolderCleanupOptionsEnum,
     SortMethodEnum
 )
+from file_sort.utils.journal import Journal, get_journal_path
 from file_sort.utils.main import Sorter
+from file_sort.utils.metrics import Metrics
+from file_sort.utils.plan import PlanError, count_entries
 from file_sort.utils.tag_classes import get_tag_help
+from file_sort.utils.watcher import Watcher
 
 # progress bar constants
 PGB_WIDTH = 40
@@ -17,6 +31,26 @@ PGB_TEMPLATE = '[%s]'
 PGB_ON_CHAR = '#'
 PGB_OFF_CHAR = ' '
 PGB_FULL_WIDTH = len(PGB_TEMPLATE % (PGB_OFF_CHAR * PGB_WIDTH))
+# room for throughput and remaining time after progress bar
+PGB_PROGRESS_WIDTH = 32
+
+# names of files metrics are written to
+METRICS_JSON_NAME = 'metrics.json'
+METRICS_PROMETHEUS_NAME = 'metrics.prom'
+
+
+def parse_device_limit(value: str) -> Tuple[str, int]:
+    """ "PATH=COUNT" to path and count """
+    path, sep, count = value.rpartition('=')
+    try:
+        limit = int(count)
+    except ValueError:
+        limit = 0
+    if not sep or not path or limit < 1:
+        raise argparse.ArgumentTypeError(
+            _('%s is not PATH=COUNT with positive COUNT') % value)
+    return path, limit
+
 
 parser = argparse.ArgumentParser(epilog=get_tag_help())
 
@@ -29,6 +63,17 @@ parser.add_argument('path_format', type=str,
 parser.add_argument("-m", "--move",
                     help=_('Move files instead of copying them'),
                     action="store_true")
+parser.add_argument("--hardlink",
+                    help=_('Place hard links to files instead of copies, '
+                           'copy files of other devices'),
+                    action="store_true")
+parser.add_argument("--symlink",
+                    help=_('Place symbolic links to files instead of copies'),
+                    action="store_true")
+parser.add_argument("--reflink",
+                    help=_('Place clones sharing data with files '
+                           'instead of copies, if file system supports it'),
+                    action="store_true")
 parser.add_argument("-r", "--replace",
                     help=_('Replace files with same names'),
                     action="store_true")
@@ -36,15 +81,100 @@ parser.add_argument("-n", "--do-nothing",
                     help=_(
                         'Do nothing when file with same name already exists'),
                     action="store_true")
+parser.add_argument("-s", "--skip-duplicates",
+                    help=_('Skip files whose content already exists '
+                           'in destination folder'),
+                    action="store_true")
+parser.add_argument("-l", "--link-duplicates",
+                    help=_('Place hard links to files whose content already '
+                           'exists in destination folder instead of copies'),
+                    action="store_true")
+parser.add_argument("--hash-cache-path",
+                    help=_('Where to keep hashes of files'),
+                    type=str, default=HASH_CACHE_PATH)
 parser.add_argument("-d", "--dispose-folders",
                     help=_('Dispose empty folders'),
                     action="store_true")
+parser.add_argument("-e", "--by-extension",
+                    help=_('Define file types by extensions, check content '
+                           'only for unknown extensions and some samples'),
+                    action="store_true")
+parser.add_argument("-w", "--workers",
+                    help=_('Count of files processed simultaneously'),
+                    type=int, default=1)
+parser.add_argument("--device-limit",
+                    help=_('Count of files processed simultaneously '
+                           'on device of specified path, e.g. /mnt/nas=2'),
+                    type=parse_device_limit, action="append", default=[],
+                    metavar='PATH=COUNT')
+parser.add_argument("-p", "--processes",
+                    help=_('Count of processes gathering information '
+                           'about files (types, dates)'),
+                    type=int, default=0)
+parser.add_argument("--metadata-threads",
+                    help=_('Count of threads gathering information '
+                           'about files when processes are not used'),
+                    type=int, default=1)
+parser.add_argument("-c", "--cache",
+                    help=_('Remember types and dates of files between runs'),
+                    action="store_true")
+parser.add_argument("--cache-path",
+                    help=_('Where to keep cache of types and dates'),
+                    type=str, default=CACHE_PATH)
+parser.add_argument("--cache-size",
+                    help=_('How many files cache remembers'),
+                    type=int, default=DEFAULT_CACHE_SIZE)
+parser.add_argument("--plan",
+                    help=_('Only write what would be done with every file '
+                           'to file as JSON Lines, destination folder '
+                           'stays untouched'),
+                    type=str, metavar='PLAN_PATH')
+parser.add_argument("--execute",
+                    help=_('Do what plan written with --plan says '
+                           'instead of sorting'),
+                    type=str, metavar='PLAN_PATH')
+parser.add_argument("--resume",
+                    help=_('Continue interrupted sorting: skip files '
+                           'it placed and remove files it left unfinished'),
+                    action="store_true")
+parser.add_argument("--journal-path",
+                    help=_('Where to record progress of sorting, '
+                           'by default it depends on folders and format'),
+                    type=str)
+parser.add_argument("--watch",
+                    help=_('Keep running and sort new files as soon as '
+                           'they are written (Linux only)'),
+                    action="store_true")
+parser.add_argument("--keep-order",
+                    help=_('Report processed files in source order'),
+                    action="store_true")
+parser.add_argument("--metrics",
+                    help=_('Write time spent in every stage, counts of '
+                           'files, bytes and errors to folder as JSON '
+                           'and Prometheus text files'),
+                    type=str, metavar='FOLDER_PATH')
+parser.add_argument("--profile",
+                    help=_('Write cProfile dump of every stage to folder'),
+                    type=str, metavar='FOLDER_PATH')
 
 args = parser.parse_args()
 
+cache = None
+hash_cache = None
+plan_file = None
+journal = None
+watcher = None
+metrics = None
+
 try:
     if args.move:
         sm = SortMethodEnum.MOVE
+    elif args.hardlink:
+        sm = SortMethodEnum.HARDLINK
+    elif args.symlink:
+        sm = SortMethodEnum.SYMLINK
+    elif args.reflink:
+        sm = SortMethodEnum.REFLINK
     else:
         sm = SortMethodEnum.COPY
 
@@ -55,36 +185,95 @@ try:
     else:
         crm = ConflictResolveMethodEnum.SAVE_ALL
 
+    if args.skip_duplicates:
+        dpo = DuplicatesOptionEnum.SKIP
+    elif args.link_duplicates:
+        dpo = DuplicatesOptionEnum.LINK
+    else:
+        dpo = DuplicatesOptionEnum.KEEP
+
     if args.dispose_folders:
         co = FolderCleanupOptionsEnum.REMOVE
     else:
         co = FolderCleanupOptionsEnum.LEAVE
 
-    total = 0
-    for x in os.walk(args.src_path):
-        total += len(x[2])
-    delta = PGB_WIDTH / total
+    if args.by_extension:
+        clm = ClassificationMethodEnum.EXTENSION
+    else:
+        clm = ClassificationMethodEnum.CONTENT
+
+    device_limits = {}
+    for path, count in args.device_limit:
+        device_limits[get_device(path)] = count
+
+    if args.cache:
+        cache = MetadataCache(args.cache_path, args.cache_size)
+    if dpo != DuplicatesOptionEnum.KEEP:
+        hash_cache = HashCache(args.hash_cache_path)
 
-    i = 0.0
+    if args.metrics:
+        metrics = Metrics()
+
+    if not args.plan:
+        journal = Journal(
+            args.journal_path or get_journal_path(
+                args.src_path, args.dst_path, args.path_format),
+            resume=args.resume)
 
     sorter = Sorter(src_path=args.src_path, dst_path=args.dst_path,
                     path_format=args.path_format, method=sm,
-                    conflict_resolve_method=crm, cleanup_option=co)
+                    conflict_resolve_method=crm, cleanup_option=co,
+                    workers=args.workers, device_limits=device_limits,
+                    keep_order=args.keep_order, processes=args.processes,
+                    cache=cache, classification_method=clm,
+                    duplicates_option=dpo, hash_cache=hash_cache,
+                    journal=journal, metadata_workers=args.metadata_threads,
+                    metrics=metrics, profile_path=args.profile)
     is_valid, msg = sorter.validate_paths()
 
-    if is_valid:
-        for is_done, file_name in sorter.sort():
+    if is_valid and args.watch:
+        # files written while source folder is scanned are noticed too
+        watcher = Watcher(args.src_path)
+        sys.stdout.write('[INFO] %s\n' % _(
+            'Watching for new files, press Ctrl+C to stop'))
+        sys.stdout.flush()
+
+        for is_done, file_name in sorter.watch(watcher):
+            sys.stdout.write(''.join((
+                '[DONE] ' if is_done else '[FAIL] ',
+                file_name,
+                '\n',
+            )))
+            sys.stdout.flush()
+
+    elif is_valid:
+        # nothing is transferred while plan is written
+        show_progress = not args.plan
+        if args.execute:
+            delta = PGB_WIDTH / count_entries(args.execute)
+            plan_file = open(args.execute, encoding='utf-8')
+            results = sorter.execute(plan_file)
+        elif args.plan:
+            delta = PGB_WIDTH / sorter.total
+            plan_file = open(args.plan, 'w', encoding='utf-8')
+            results = sorter.plan(plan_file)
+        else:
+            delta = PGB_WIDTH / sorter.total
+            results = sorter.sort()
+        i = 0.0
+
+        for is_done, file_name in results:
             i += delta
 
             # erase last line
             sys.stdout.write(''.join((
                 '\r',
-                ' ' * PGB_FULL_WIDTH,
+                ' ' * (PGB_FULL_WIDTH + PGB_PROGRESS_WIDTH),
                 '\r',
             )))
             sys.stdout.flush()
 
-            # print file and progressbar
+            # print file, progressbar, throughput and remaining time
             sys.stdout.write(''.join((
                 '[DONE] ' if is_done else '[FAIL] ',
                 file_name,
@@ -92,12 +281,14 @@ try:
                 PGB_TEMPLATE % (
                     PGB_ON_CHAR * int(i)
                 ).ljust(PGB_WIDTH, PGB_OFF_CHAR),
+                ' ' + sorter.progress.to_text() if show_progress else '',
             )))
             sys.stdout.flush()
 
         sys.stdout.write(''.join((
             '\r',
-            PGB_TEMPLATE % (PGB_ON_CHAR * PGB_WIDTH),
+            (PGB_TEMPLATE % (PGB_ON_CHAR * PGB_WIDTH)).ljust(
+                PGB_FULL_WIDTH + PGB_PROGRESS_WIDTH),
             '\n[INFO] ',
             _('Sort process completed'),
             '\n',
@@ -117,4 +308,25 @@ except ZeroDivisionError:
     sys.stdout.write('\n[INFO] %s\n' % _('No files to sort'))
     sys.stdout.flush()
 
+except (OSError, PlanError) as e:
+    sys.stdout.write(f'\n[FAIL] {e}\n')
+    sys.stdout.flush()
+
+finally:
+    if metrics is not None:
+        os.makedirs(args.metrics, exist_ok=True)
+        metrics.write_json(os.path.join(args.metrics, METRICS_JSON_NAME))
+        metrics.write_prometheus(
+            os.path.join(args.metrics, METRICS_PROMETHEUS_NAME))
+    if watcher is not None:
+        watcher.close()
+    if plan_file is not None:
+        plan_file.close()
+    if cache is not None:
+        cache.close()
+    if hash_cache is not None:
+        hash_cache.close()
+    if journal is not None:
+        journal.close()
+
 sys.exit()
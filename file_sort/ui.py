@@ -1,24 +1,32 @@
 import locale
 import os
+import queue
+import shutil
+import tempfile
 import threading
 from gettext import gettext as _
 from tkinter import *
 from tkinter import filedialog, messagebox
-from tkinter.scrolledtext import ScrolledText  # type: ignore
 from tkinter.ttk import Combobox, Notebook, Progressbar
 
 from file_sort.utils.enums import (
+    ClassificationMethodEnum,
     ConflictResolveMethodEnum,
+    DuplicatesOptionEnum,
+    EventKindEnum,
     FolderCleanupOptionsEnum,
     LangEnum,
     SortMethodEnum
 )
+from file_sort.utils.duplicates import HashCache
 from file_sort.utils.helpers import (
     load_var_from_enum_to_settings,
     save_var_from_enum_to_settings,
     set_locale
 )
+from file_sort.utils.journal import Journal, get_journal_path
 from file_sort.utils.main import Sorter
+from file_sort.utils.result_log import ResultLog
 from file_sort.utils.settings import SettingEnum, Settings
 from file_sort.utils.tag_classes import get_tag_help
 
@@ -26,6 +34,15 @@ LABEL_WIDTH = 25
 FIELD_WIDTH = 25
 BUTTON_WIDTH = 5
 PROGRESSBAR_LENGTH = 200
+# how often results of sorting are shown, milliseconds
+UPDATE_INTERVAL = 100
+# how many results may be shown at once, so window stays responsive
+MAX_RESULTS_PER_UPDATE = 5000
+# visible lines of result lists
+LIST_ROWS = 24
+LIST_WIDTH = 80
+# how many lines are scrolled by mouse wheel
+WHEEL_STEP = 3
 
 
 settings = Settings()
@@ -79,36 +96,262 @@ class FormatHelpWindow(MyWindow):
         button.pack()
 
 
+class VirtualList(Frame):
+    """
+    List showing only visible lines of result log, they are read
+    from log when list is scrolled. It follows the end of log
+    until it is scrolled up
+    """
+    def __init__(self, master, rows: int = LIST_ROWS):
+        super().__init__(master)
+        self.rows = rows
+        self.log = None
+        self.first = 0
+        self.follow = True
+        self.listbox = Listbox(self, height=rows, width=LIST_WIDTH)
+        self.scrollbar = Scrollbar(self, orient=VERTICAL,
+                                   command=self._scroll)
+        self.listbox.pack(side=LEFT, fill=BOTH, expand=True)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.listbox.bind(sequence, self._wheel)
+
+    def set_log(self, log):
+        self.log = log
+        self.first = 0
+        self.follow = True
+        self.refresh()
+
+    def refresh(self):
+        """ Read visible lines again """
+        count = len(self.log) if self.log is not None else 0
+        last = max(count - self.rows, 0)
+        self.first = last if self.follow else min(self.first, last)
+        lines = self.log.get(self.first, self.rows) if count else []
+        self.listbox.delete(0, END)
+        if lines:
+            self.listbox.insert(END, *lines)
+        if count:
+            self.scrollbar.set(
+                self.first / count, (self.first + len(lines)) / count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def show(self, number: int):
+        """ Scroll to line and select it """
+        self._move(number - self.rows // 2)
+        self.listbox.selection_clear(0, END)
+        self.listbox.selection_set(number - self.first)
+
+    def _move(self, first: int):
+        count = len(self.log) if self.log is not None else 0
+        last = max(count - self.rows, 0)
+        self.first = min(max(first, 0), last)
+        self.follow = self.first >= last
+        self.refresh()
+
+    def _scroll(self, action, value, unit=None):
+        count = len(self.log) if self.log is not None else 0
+        if action == MOVETO:
+            self._move(int(float(value) * count))
+        elif action == SCROLL:
+            step = self.rows if unit == PAGES else 1
+            self._move(self.first + int(value) * step)
+
+    def _wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._move(self.first - WHEEL_STEP)
+        else:
+            self._move(self.first + WHEEL_STEP)
+        # listbox mustn't scroll lines itself
+        return 'break'
+
+
 class ResultWindow(MyWindow):
+    """
+    Shows results of sorting. Sorting thread puts them to queue,
+    widgets are changed only by main loop which takes results in batches.
+    Results are written to log files and only visible ones are read,
+    so any count of files takes the same memory
+    """
     name = _('Sorting process')
 
     def __init__(self, master):
         super().__init__(master)
         self.total = 0
         self.result_pgb = None
+        self.progress_lbl = None
         self.done_lst = None
         self.failed_lst = None
+        self.search_fld = None
+        # finished events of every file, error which stopped sorting,
+        # None when sorting is over
+        self.results = queue.Queue()
+        # tells sorting thread that window is closed
+        self.stopped = threading.Event()
+        # throughput and remaining time, sorting thread sets it
+        self.progress_text = ''
+        self.is_finished = False
+        self._update_id = None
+        self._logs_path = ''
+        self._done_log = None
+        self._failed_log = None
+        # failures containing filter text, if it is set
+        self._filtered_log = None
+        self._filter_text = ''
+        self._found = -1
 
     def _after_launch(self):
+        self.results = queue.Queue()
+        self.stopped = threading.Event()
+        self.progress_text = ''
+        self.is_finished = False
+        self._logs_path = tempfile.mkdtemp(prefix='file-sort-')
+        self._done_log = ResultLog(os.path.join(self._logs_path, 'done.log'))
+        self._failed_log = ResultLog(
+            os.path.join(self._logs_path, 'failed.log'))
+        self._filtered_log = None
+        self._filter_text = ''
+        self._found = -1
+
         self.result_pgb = Progressbar(
             self._window, orient="horizontal",
             length=PROGRESSBAR_LENGTH, mode="determinate")
         self.result_pgb.config(maximum=self.total)
         self.result_pgb.config(value=0)
+        self.progress_lbl = Label(self._window, anchor=W)
 
         tabs = Notebook(self._window)
         done_frame = Frame(tabs)
         fails_frame = Frame(tabs)
         tabs.add(done_frame, text=_('Done'))
         tabs.add(fails_frame, text=_('Fails'))
-        self.done_lst = ScrolledText(done_frame)
-        self.failed_lst = ScrolledText(fails_frame)
+        self.done_lst = VirtualList(done_frame)
+        self.done_lst.set_log(self._done_log)
+
+        search_frame = Frame(fails_frame)
+        self.search_fld = Entry(search_frame)
+        find_btn = Button(search_frame, text=_('Find'), command=self._find)
+        filter_btn = Button(search_frame, text=_('Filter'),
+                            command=self._filter)
+        self.failed_lst = VirtualList(fails_frame)
+        self.failed_lst.set_log(self._failed_log)
 
         self.result_pgb.pack(fill=X)
+        self.progress_lbl.pack(fill=X)
         tabs.pack(fill=BOTH)
         self.done_lst.pack(fill=BOTH)
+        search_frame.pack(fill=X)
+        self.search_fld.pack(side=LEFT, fill=X, expand=True)
+        find_btn.pack(side=LEFT)
+        filter_btn.pack(side=LEFT)
         self.failed_lst.pack(fill=BOTH)
 
+        self._update_id = self._window.after(UPDATE_INTERVAL, self._update)
+
+    def _update(self):
+        """ Show results gathered since last update """
+        count = 0
+        is_finished = False
+        error = None
+        for i in range(MAX_RESULTS_PER_UPDATE):
+            try:
+                event = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                is_finished = True
+                break
+            if isinstance(event, Exception):
+                error = event
+                is_finished = True
+                break
+            count += 1
+            if event.is_done:
+                self._done_log.append(event.path)
+                continue
+            line = '%s: %s' % (event.path, event.error or _('Failed'))
+            self._failed_log.append(line)
+            if (self._filtered_log is not None and
+                    self._filter_text in line.lower()):
+                self._filtered_log.append(line)
+
+        if count:
+            self.result_pgb.step(count)
+            self.done_lst.refresh()
+            self.failed_lst.refresh()
+        self.progress_lbl.config(text=self.progress_text)
+
+        if not is_finished:
+            self._update_id = self._window.after(
+                UPDATE_INTERVAL, self._update)
+            return
+        self._update_id = None
+        self.is_finished = True
+        if error is not None:
+            messagebox.showerror(
+                title=_('Error'),
+                message='%s: %s' % (type(error).__name__, error),
+            )
+            return
+        self.result_pgb.config(value=self.total)
+        messagebox.showinfo(
+            title=_('Success'),
+            message=_('Sort process completed'),
+        )
+
+    def _find(self):
+        """ Show next failure containing search text """
+        text = self.search_fld.get()
+        log = self.failed_lst.log
+        number = log.find(text, self._found + 1)
+        if number is None and self._found >= 0:
+            # searching from the beginning
+            number = log.find(text)
+        if number is None:
+            self._found = -1
+            messagebox.showinfo(
+                title=_('Information'),
+                message=_('Nothing is found'),
+            )
+            return
+        self._found = number
+        self.failed_lst.show(number)
+
+    def _filter(self):
+        """ Show only failures containing search text, all if it is empty """
+        self._filter_text = self.search_fld.get().lower()
+        self._found = -1
+        if self._filtered_log is not None:
+            self._filtered_log.remove()
+            self._filtered_log = None
+        if self._filter_text:
+            self._filtered_log = self._failed_log.filter(
+                self._filter_text,
+                os.path.join(self._logs_path, 'filtered.log'))
+            self.failed_lst.set_log(self._filtered_log)
+        else:
+            self.failed_lst.set_log(self._failed_log)
+
+    def _close_handler(self):
+        if self._window:
+            if self._update_id is not None:
+                self._window.after_cancel(self._update_id)
+                self._update_id = None
+            if not self.is_finished:
+                self.stopped.set()
+                messagebox.showinfo(
+                    title=_('Information'),
+                    message=_('The sorting process is interrupted'),
+                )
+            for log in (self._done_log, self._failed_log,
+                        self._filtered_log):
+                if log is not None:
+                    log.remove()
+            self._done_log = self._failed_log = self._filtered_log = None
+            shutil.rmtree(self._logs_path, ignore_errors=True)
+        super()._close_handler()
+
 
 class MyUI:
     def __init__(self):
@@ -141,7 +384,10 @@ class MyUI:
     def _create_variables(self):
         self.method_var = StringVar(self.main_window)
         self.conflict_var = StringVar(self.main_window)
+        self.duplicates_var = StringVar(self.main_window)
+        self.classification_var = StringVar(self.main_window)
         self.cleanup_var = IntVar(self.main_window)
+        self.resume_var = IntVar(self.main_window)
         self.lang_var = StringVar(self.main_window)
         self.options_var = IntVar(self.main_window)
 
@@ -188,6 +434,23 @@ class MyUI:
             self.conflict_var,
             *ConflictResolveMethodEnum.values().values())
 
+        self.duplicates_lbl = Label(self.main_window,
+                                    text=_('Files with same content'),
+                                    width=LABEL_WIDTH, anchor=E, justify=RIGHT)
+        self.duplicates_fld = OptionMenu(
+            self.main_window,
+            self.duplicates_var,
+            *DuplicatesOptionEnum.values().values())
+
+        self.classification_lbl = Label(self.main_window,
+                                        text=_('File type detection'),
+                                        width=LABEL_WIDTH, anchor=E,
+                                        justify=RIGHT)
+        self.classification_fld = OptionMenu(
+            self.main_window,
+            self.classification_var,
+            *ClassificationMethodEnum.values().values())
+
         self.cleanup_lbl = Label(self.main_window,
                                  text=_('Remove empty folders from source'),
                                  width=LABEL_WIDTH, anchor=E, justify=RIGHT)
@@ -196,6 +459,12 @@ class MyUI:
             offvalue=FolderCleanupOptionsEnum.LEAVE.value,
             onvalue=FolderCleanupOptionsEnum.REMOVE.value)
 
+        self.resume_lbl = Label(self.main_window,
+                                text=_('Continue interrupted sorting'),
+                                width=LABEL_WIDTH, anchor=E, justify=RIGHT)
+        self.resume_fld = Checkbutton(
+            self.main_window, variable=self.resume_var)
+
         self.lang_lbl = Label(self.main_window, text=_('Language'),
                               width=LABEL_WIDTH, anchor=E, justify=RIGHT)
         self.lang_fld = OptionMenu(self.main_window,
@@ -225,13 +494,22 @@ class MyUI:
         self.conflict_lbl.grid(row=5, column=0)
         self.conflict_fld.grid(row=5, column=1, sticky=E + W)
 
-        self.cleanup_lbl.grid(row=6, column=0)
-        self.cleanup_fld.grid(row=6, column=1, sticky=E + W)
+        self.duplicates_lbl.grid(row=6, column=0)
+        self.duplicates_fld.grid(row=6, column=1, sticky=E + W)
+
+        self.classification_lbl.grid(row=7, column=0)
+        self.classification_fld.grid(row=7, column=1, sticky=E + W)
 
-        self.lang_lbl.grid(row=7, column=0)
-        self.lang_fld.grid(row=7, column=1, sticky=E + W)
+        self.cleanup_lbl.grid(row=8, column=0)
+        self.cleanup_fld.grid(row=8, column=1, sticky=E + W)
 
-        self.main_btn.grid(row=8, column=1)
+        self.resume_lbl.grid(row=9, column=0)
+        self.resume_fld.grid(row=9, column=1, sticky=E + W)
+
+        self.lang_lbl.grid(row=10, column=0)
+        self.lang_fld.grid(row=10, column=1, sticky=E + W)
+
+        self.main_btn.grid(row=11, column=1)
 
     def _bind_handlers(self):
         self.src_btn.bind(
@@ -267,6 +545,13 @@ class MyUI:
             ConflictResolveMethodEnum.to_text(
                 ConflictResolveMethodEnum.get_default()))
 
+        self.duplicates_var.set(
+            DuplicatesOptionEnum.to_text(DuplicatesOptionEnum.get_default()))
+
+        self.classification_var.set(
+            ClassificationMethodEnum.to_text(
+                ClassificationMethodEnum.get_default()))
+
         self.cleanup_var.set(FolderCleanupOptionsEnum.get_default().value)
 
         locale_code, encoding = locale.getlocale()
@@ -289,6 +574,13 @@ class MyUI:
         load_var_from_enum_to_settings(
             ConflictResolveMethodEnum, SettingEnum.CONFLICT, self.conflict_var,
         )
+        load_var_from_enum_to_settings(
+            DuplicatesOptionEnum, SettingEnum.DUPLICATES, self.duplicates_var,
+        )
+        load_var_from_enum_to_settings(
+            ClassificationMethodEnum, SettingEnum.CLASSIFICATION,
+            self.classification_var,
+        )
 
         value = settings.get(SettingEnum.CLEANUP)
         if value:
@@ -312,6 +604,13 @@ class MyUI:
         save_var_from_enum_to_settings(
             ConflictResolveMethodEnum, SettingEnum.CONFLICT, self.conflict_var,
         )
+        save_var_from_enum_to_settings(
+            DuplicatesOptionEnum, SettingEnum.DUPLICATES, self.duplicates_var,
+        )
+        save_var_from_enum_to_settings(
+            ClassificationMethodEnum, SettingEnum.CLASSIFICATION,
+            self.classification_var,
+        )
         settings.set(SettingEnum.CLEANUP, str(self.cleanup_var.get()))
 
         settings.save()
@@ -343,27 +642,35 @@ class MyUI:
         sm = SortMethodEnum.to_value(self.method_var.get())
         crm = ConflictResolveMethodEnum.to_value(self.conflict_var.get())
         co = FolderCleanupOptionsEnum(self.cleanup_var.get())
-
-        def _sorting_thread_body(sorter):
-            for is_done, file_name in sorter.sort():
-                try:
-                    self.result_window.result_pgb.step(1)
-                    if is_done:
-                        self.result_window.done_lst.insert(END, '%s\n' % file_name)
-                    else:
-                        self.result_window.failed_lst.insert(END, '%s\n' % file_name)
-                except TclError:
-                    messagebox.showinfo(
-                        title=_('Information'),
-                        message=_('The sorting process is interrupted'),
-                    )
-                    return
-
-            self.result_window.result_pgb.config(value=total)
-            messagebox.showinfo(
-                title=_('Success'),
-                message=_('Sort process completed'),
-            )
+        clm = ClassificationMethodEnum.to_value(self.classification_var.get())
+        dpo = DuplicatesOptionEnum.to_value(self.duplicates_var.get())
+
+        def _sorting_thread_body(sorter, result_window):
+            # widgets must not be touched here, Tk isn't thread-safe
+            results = result_window.results
+            stopped = result_window.stopped
+            events = sorter.events()
+            try:
+                for event in events:
+                    if stopped.is_set():
+                        return
+                    if event.kind == EventKindEnum.FINISHED:
+                        results.put(event)
+                    # progress is changed by this thread only,
+                    # so its text is made here
+                    result_window.progress_text = sorter.progress.to_text()
+            except Exception as e:  # TODO specify kinds of error
+                results.put(e)
+            finally:
+                # sorting is stopped before its journal and caches
+                events.close()
+                sorter.journal.close()
+                if sorter.hash_cache is not None:
+                    sorter.hash_cache.close()
+                if sorter.cache is not None:
+                    sorter.cache.close()
+                # window waits for it even if sorting failed
+                results.put(None)
 
         if self.result_window.is_launched:
             return
@@ -373,24 +680,32 @@ class MyUI:
         fmt = self.fmt_fld.get()
         sorter = Sorter(src_path=src_path, dst_path=dst_path, path_format=fmt,
                         method=sm, conflict_resolve_method=crm,
-                        cleanup_option=co)
+                        cleanup_option=co, classification_method=clm,
+                        duplicates_option=dpo,
+                        hash_cache=(
+                            HashCache()
+                            if dpo != DuplicatesOptionEnum.KEEP else None),
+                        journal=Journal(
+                            get_journal_path(src_path, dst_path, fmt),
+                            resume=bool(self.resume_var.get())))
         is_valid, msg = sorter.validate_paths()
         if not is_valid:
+            sorter.journal.close()
+            if sorter.hash_cache is not None:
+                sorter.hash_cache.close()
             messagebox.showerror(
                 title=_('Validation error'),
                 message=msg,
             )
         else:
-            # FIXME in some cases counts incorrectly
-            total = 0
-            for top, dirs, non_dirs in os.walk(src_path):
-                total += len(non_dirs)
+            total = sorter.total
 
             self.result_window.total = total
             self.result_window.launch()
             # start sorting
             sorting_thread = threading.Thread(
-                target=lambda: _sorting_thread_body(sorter))
+                target=lambda: _sorting_thread_body(
+                    sorter, self.result_window))
             sorting_thread.start()
 
         # update settings and widget values
@@ -408,7 +723,10 @@ class MyUI:
         options_widgets = (
             self.method_lbl, self.method_fld,
             self.conflict_lbl, self.conflict_fld,
+            self.duplicates_lbl, self.duplicates_fld,
+            self.classification_lbl, self.classification_fld,
             self.cleanup_lbl, self.cleanup_fld,
+            self.resume_lbl, self.resume_fld,
             self.lang_lbl, self.lang_fld,
         )
         for widget in options_widgets:
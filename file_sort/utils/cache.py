@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from .enums import ClassificationMethodEnum, ContentTypesEnum, MyEnum
+from .file_classes import FileInfo
+from .settings import CACHE_DIR
+
+CACHE_PATH = os.path.join(CACHE_DIR, 'cache.sqlite3')
+# how many files cache remembers
+DEFAULT_CACHE_SIZE = 1000000
+# how many changes are kept in memory before writing them to disk
+CACHE_BATCH_SIZE = 1000
+
+# version of table layout, older tables are dropped
+SCHEMA_VERSION = 1
+
+SQLITE_MAX_INT = 2 ** 63
+
+Key = Tuple[int, int, int, int]
+
+
+class MetadataCache:
+    """
+    Remembers types and dates of files between runs.
+    File is recognized by device, inode, size and modification time,
+    so changed file is never taken from cache. Types are kept separately
+    for every classification method, so type guessed by extension
+    isn't given out as checked by content
+    """
+    def __init__(self, path: str = CACHE_PATH,
+                 max_size: int = DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._new_rows: List[Tuple] = []
+        self._used_keys: List[Tuple] = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        version, = self._connection.execute(
+            'PRAGMA user_version').fetchone()
+        if version < SCHEMA_VERSION:
+            with self._connection:
+                self._connection.execute('DROP TABLE IF EXISTS files')
+                self._connection.execute(
+                    f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                method INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                extension TEXT NOT NULL,
+                date TEXT NOT NULL,
+                used REAL NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, method)
+            );
+            CREATE INDEX IF NOT EXISTS files_used ON files (used);
+        ''')
+
+    def get(self, path: str, stat: os.stat_result,
+            method: MyEnum = ClassificationMethodEnum.CONTENT
+            ) -> Optional[FileInfo]:
+        """ Get information about file if it is known """
+        key = (*self._get_key(stat), method.value)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT content_type, extension, date FROM files '
+                'WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? '
+                'AND method = ?', key).fetchone()
+            if row is None:
+                return None
+            content_type, extension, date = row
+            # renamed file keeps its inode but may change its extension
+            if extension != os.path.splitext(path)[1].strip('.'):
+                return None
+            self._used_keys.append(key)
+            if len(self._used_keys) >= CACHE_BATCH_SIZE:
+                self._write()
+        return FileInfo(path, ContentTypesEnum(content_type), extension,
+                        datetime.fromisoformat(date))
+
+    def set(self, stat: os.stat_result, info: FileInfo,
+            method: MyEnum = ClassificationMethodEnum.CONTENT):
+        """ Remember information about file """
+        # type isn't known without libmagic, such results are not saved
+        if info.content_type is None or info.error:
+            return
+        with self._lock:
+            self._new_rows.append((
+                *self._get_key(stat), method.value, info.content_type.value,
+                info.extension, info.date.isoformat(), time.time()))
+            if len(self._new_rows) >= CACHE_BATCH_SIZE:
+                self._write()
+
+    def flush(self):
+        """ Write all changes to disk and forget the oldest files """
+        with self._lock:
+            self._write()
+            count, = self._connection.execute(
+                'SELECT COUNT(*) FROM files').fetchone()
+            if count > self.max_size:
+                self._connection.execute(
+                    'DELETE FROM files WHERE rowid IN ('
+                    'SELECT rowid FROM files ORDER BY used LIMIT ?)',
+                    (count - self.max_size,))
+                self._connection.commit()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def _write(self):
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO files '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                self._new_rows)
+            self._connection.executemany(
+                'UPDATE files SET used = ? '
+                'WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? '
+                'AND method = ?',
+                ((time.time(), *key) for key in self._used_keys))
+        self._new_rows = []
+        self._used_keys = []
+
+    @staticmethod
+    def _get_key(stat: os.stat_result) -> Key:
+        return get_stat_key(stat)
+
+
+def get_stat_key(stat: os.stat_result) -> Key:
+    """ Device, inode, size and modification time of file for SQLite """
+    # SQLite integers are signed, big unsigned numbers must be wrapped
+    return tuple(  # type: ignore
+        value - 2 * SQLITE_MAX_INT if value >= SQLITE_MAX_INT else value
+        for value in (stat.st_dev, stat.st_ino,
+                      stat.st_size, stat.st_mtime_ns))
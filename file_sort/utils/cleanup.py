@@ -0,0 +1,65 @@
+import errno
+import heapq
+import logging
+import os
+import threading
+import traceback
+from typing import List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FolderCleaner:
+    """
+    Remembers source folders files were taken from and removes the empty
+    ones once all files are placed. Folders are checked from the deepest
+    up, every one only once, so folders emptied by removing their empty
+    subfolders are removed too. Root folder itself is always kept
+    """
+    def __init__(self, root_path: str):
+        self.root_path = os.path.abspath(root_path)
+        self._touched: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, folder_path: str):
+        """ Remember folder some file was taken from """
+        with self._lock:
+            self._touched.add(folder_path)
+
+    def cleanup(self) -> List[str]:
+        """ Remove empty remembered folders, return removed ones """
+        with self._lock:
+            touched = self._touched
+            self._touched = set()
+
+        # the deepest folders go first
+        heap: List[Tuple[int, str]] = []
+        checked: Set[str] = set()
+        for folder_path in touched:
+            self._push(heap, checked, os.path.abspath(folder_path))
+
+        removed = []
+        while heap:
+            _depth, folder_path = heapq.heappop(heap)
+            try:
+                # fails for folder with anything inside, no listing needed
+                os.rmdir(folder_path)
+            except OSError as e:
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST,
+                                   errno.ENOENT):
+                    logger.error(traceback.format_exc())
+                continue
+            removed.append(folder_path)
+            self._push(heap, checked, os.path.dirname(folder_path))
+        return removed
+
+    def _push(self, heap: List[Tuple[int, str]], checked: Set[str],
+              folder_path: str):
+        if folder_path in checked or not self._is_inside_root(folder_path):
+            return
+        checked.add(folder_path)
+        heapq.heappush(heap, (-folder_path.count(os.sep), folder_path))
+
+    def _is_inside_root(self, folder_path: str) -> bool:
+        return (folder_path != self.root_path and
+                folder_path.startswith(os.path.join(self.root_path, '')))
@@ -0,0 +1,228 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Set
+
+from .fastcopy import IS_LINUX, clone_file, copy_file
+from .metrics import Metrics, get_timer
+
+# how many destination folders are kept opened at once
+MAX_OPEN_FOLDERS = 64
+
+# folders can be opened and used as base of relative paths
+SUPPORTS_DIR_FD = (
+    hasattr(os, 'O_DIRECTORY') and
+    {os.open, os.rename, os.unlink, os.stat, os.link, os.symlink} <=
+    os.supports_dir_fd)
+SUPPORTS_SCANDIR_FD = os.scandir in os.supports_fd
+
+# file systems of these platforms usually ignore case of names
+name_key: Callable[[str], str] = (
+    str.casefold if sys.platform in ('darwin', 'win32') else str)
+
+
+class DestinationFolder:
+    """
+    Folder files are placed in. It is opened once for all its files,
+    so names inside it are not resolved from the root every time.
+    Names of its files are listed once and then kept up to date,
+    so checking whether name is taken costs nothing.
+    Threads placing files check and take names holding lock,
+    name is taken before file is placed, so it is never given
+    to other file in the meantime
+    """
+    def __init__(self, path: str, fd: Optional[int] = None):
+        self.path = path
+        self.fd = fd
+        self.users = 0
+        self._names: Optional[Set[str]] = None
+        # next number to try for every name taken already
+        self._suffixes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # names are checked, taken and renamed holding it
+        self.lock = threading.Lock()
+        self._device: Optional[int] = None
+        # whether source folders are on the same device as this folder
+        self._same_device: Dict[str, bool] = {}
+
+    @property
+    def names(self) -> Set[str]:
+        if self._names is None:
+            with self._lock:
+                if self._names is None:
+                    target = (self.fd if self.fd is not None and
+                              SUPPORTS_SCANDIR_FD else self.path)
+                    try:
+                        with os.scandir(target) as entries:
+                            self._names = {
+                                name_key(e.name) for e in entries}
+                    except FileNotFoundError:
+                        # folder is going to be created
+                        self._names = set()
+        return self._names
+
+    @property
+    def device(self) -> int:
+        if self._device is None:
+            self._device = os.stat(
+                self.fd if self.fd is not None else self.path).st_dev
+        return self._device
+
+    def is_on_same_device(self, src_folder_path: str) -> bool:
+        """ Check if files of source folder can be simply renamed """
+        if src_folder_path not in self._same_device:
+            self._same_device[src_folder_path] = (
+                os.stat(src_folder_path).st_dev == self.device)
+        return self._same_device[src_folder_path]
+
+    def join(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def stat(self, name: str) -> os.stat_result:
+        return os.stat(self._get_path(name), dir_fd=self.fd)
+
+    def exists(self, name: str) -> bool:
+        return name_key(name) in self.names
+
+    def add(self, name: str):
+        """ Remember name of file placed into folder """
+        self.names.add(name_key(name))
+
+    def get_free_name(self, name: str) -> str:
+        """ Name like "name (2).ext" nobody uses yet """
+        file_name, file_ext = os.path.splitext(name)
+        key = name_key(name)
+        i = self._suffixes.get(key, 2)
+        while True:
+            new_name = f'{file_name} ({i}){file_ext}'
+            i += 1
+            if not self.exists(new_name):
+                break
+        self._suffixes[key] = i
+        return new_name
+
+    def discard(self, name: str):
+        """ Forget name taken for file which wasn't placed """
+        self.names.discard(name_key(name))
+
+    def remove(self, name: str):
+        os.unlink(self._get_path(name), dir_fd=self.fd)
+        self.names.discard(name_key(name))
+
+    def rename(self, name: str, new_name: str):
+        os.rename(self._get_path(name), self._get_path(new_name),
+                  src_dir_fd=self.fd, dst_dir_fd=self.fd)
+        self.names.discard(name_key(name))
+        self.names.add(name_key(new_name))
+
+    def open(self, name: str, flags: int, mode: int = 0o666) -> int:
+        return os.open(self._get_path(name), flags, mode, dir_fd=self.fd)
+
+    def move_in(self, file_path: str, name: str):
+        """ Rename file from other folder of the same device into folder """
+        os.rename(file_path, self._get_path(name), dst_dir_fd=self.fd)
+
+    def link_in(self, file_path: str, name: str):
+        """ Make hard link to file of the same device in folder """
+        os.link(file_path, self._get_path(name), dst_dir_fd=self.fd)
+
+    def symlink_in(self, file_path: str, name: str):
+        """ Make symbolic link to file in folder """
+        os.symlink(os.path.abspath(file_path), self._get_path(name),
+                   dir_fd=self.fd)
+
+    def clone_in(self, file_path: str, name: str) -> bool:
+        """ Make copy sharing data blocks with file if file system can """
+        if IS_LINUX:
+            return clone_file(file_path, self._get_path(name), dir_fd=self.fd)
+        return clone_file(file_path, self.join(name))
+
+    def copy_in(self, file_path: str, name: str):
+        """ Copy file into folder with its metadata """
+        if IS_LINUX:
+            copy_file(file_path, self._get_path(name), dir_fd=self.fd)
+        else:
+            copy_file(file_path, self.join(name))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _get_path(self, name: str) -> str:
+        return name if self.fd is not None else self.join(name)
+
+
+class FolderCache:
+    """
+    Remembers destination folders which already exist
+    and keeps the most used of them opened
+    """
+    def __init__(self, max_open: int = MAX_OPEN_FOLDERS,
+                 metrics: Optional[Metrics] = None):
+        self.max_open = max_open
+        self.metrics = metrics
+        self._created: Set[str] = set()
+        self._opened: 'OrderedDict[str, DestinationFolder]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, path: str) -> Iterator[DestinationFolder]:
+        """ Create folder if needed and give it for use """
+        folder = self._acquire(path)
+        try:
+            yield folder
+        finally:
+            with self._lock:
+                folder.users -= 1
+
+    def close(self):
+        with self._lock:
+            for folder in self._opened.values():
+                folder.close()
+            self._opened.clear()
+
+    def _acquire(self, path: str) -> DestinationFolder:
+        with self._lock:
+            folder = self._opened.get(path)
+            if folder is not None:
+                self._opened.move_to_end(path)
+                folder.users += 1
+                return folder
+
+        if path not in self._created:
+            with get_timer(self.metrics, 'makedirs'):
+                os.makedirs(path, exist_ok=True)
+            self._created.add(path)
+        fd = None
+        if SUPPORTS_DIR_FD:
+            with get_timer(self.metrics, 'open_folder'):
+                fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+
+        with self._lock:
+            if path in self._opened:
+                # other thread was faster
+                if fd is not None:
+                    os.close(fd)
+                folder = self._opened[path]
+                self._opened.move_to_end(path)
+            else:
+                folder = DestinationFolder(path, fd)
+                self._opened[path] = folder
+                self._close_unused()
+            folder.users += 1
+            return folder
+
+    def _close_unused(self):
+        """ Close the least recently used folders nobody works with """
+        excess = len(self._opened) - self.max_open
+        for path in list(self._opened):
+            if excess <= 0:
+                break
+            folder = self._opened[path]
+            if not folder.users:
+                folder.close()
+                del self._opened[path]
+                excess -= 1
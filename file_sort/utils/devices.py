@@ -0,0 +1,66 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+# how many simultaneous operations spinning disk can bear
+ROTATIONAL_DEVICE_WORKERS = 2
+
+SYS_BLOCK_DEVICE_PATH = '/sys/dev/block/{major}:{minor}'
+
+
+def get_device(path: str) -> int:
+    """ Get id of device path is placed on """
+    return os.stat(path).st_dev
+
+
+def is_rotational(device: int) -> bool:
+    """ Check if device is a spinning disk (works on Linux only) """
+    device_path = SYS_BLOCK_DEVICE_PATH.format(
+        major=os.major(device), minor=os.minor(device))
+    # partitions keep queue information in their parent device folder
+    for queue_path in (os.path.join(device_path, 'queue'),
+                       os.path.join(device_path, '..', 'queue')):
+        try:
+            with open(os.path.join(queue_path, 'rotational')) as f:
+                return f.read().strip() == '1'
+        except OSError:
+            continue
+    return False
+
+
+class DeviceLimiter:
+    """ Limits count of simultaneous operations on every device """
+    def __init__(self, default_limit: int,
+                 limits: Optional[Dict[int, int]] = None):
+        self.default_limit = max(default_limit, 1)
+        self.limits = dict(limits or {})
+        self._semaphores: Dict[int, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def get_limit(self, device: int) -> int:
+        if device in self.limits:
+            return max(self.limits[device], 1)
+        if is_rotational(device):
+            return min(self.default_limit, ROTATIONAL_DEVICE_WORKERS)
+        return self.default_limit
+
+    @contextmanager
+    def hold(self, *devices: int) -> Iterator[None]:
+        """ Wait until all devices have a free slot and occupy them """
+        # same order everywhere to avoid deadlocks
+        semaphores = [self._get_semaphore(d) for d in sorted(set(devices))]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            yield
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+
+    def _get_semaphore(self, device: int) -> threading.Semaphore:
+        with self._lock:
+            if device not in self._semaphores:
+                self._semaphores[device] = threading.Semaphore(
+                    self.get_limit(device))
+            return self._semaphores[device]
@@ -0,0 +1,243 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .cache import get_stat_key
+from .scanner import scan
+from .settings import CACHE_DIR
+
+HASH_CACHE_PATH = os.path.join(CACHE_DIR, 'hashes.sqlite3')
+# how many changes are kept in memory before writing them to disk
+HASH_CACHE_BATCH_SIZE = 1000
+
+# size of blocks at the beginning and at the end of file compared first
+PARTIAL_BLOCK_SIZE = 64 * 1024
+FULL_HASH_CHUNK_SIZE = 1024 * 1024
+# count of locks protecting files of the same size from simultaneous checks
+SIZE_LOCKS_COUNT = 64
+
+
+class HashCache:
+    """ Remembers hashes of files between runs """
+    def __init__(self, path: str = HASH_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._new_rows: List[Tuple] = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('''
+            CREATE TABLE IF NOT EXISTS hashes (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, kind)
+            )
+        ''')
+
+    def get(self, stat: os.stat_result, kind: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT hash FROM hashes WHERE dev = ? AND ino = ? '
+                'AND size = ? AND mtime_ns = ? AND kind = ?',
+                (*self._get_key(stat), kind)).fetchone()
+        return row[0] if row else None
+
+    def set(self, stat: os.stat_result, kind: str, value: str):
+        with self._lock:
+            self._new_rows.append((*self._get_key(stat), kind, value))
+            if len(self._new_rows) >= HASH_CACHE_BATCH_SIZE:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def _write(self):
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)',
+                self._new_rows)
+        self._new_rows = []
+
+    @staticmethod
+    def _get_key(stat: os.stat_result) -> Tuple[int, ...]:
+        return get_stat_key(stat)
+
+
+class _Candidate:
+    """ File of destination folder with hashes computed so far """
+    __slots__ = ('path', 'size', 'stat', 'hashes')
+
+    def __init__(self, path: str, size: int,
+                 stat: Optional[os.stat_result],
+                 hashes: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.size = size
+        self.stat = stat
+        self.hashes = hashes or {}
+
+
+class DuplicateFinder:
+    """
+    Finds files of destination folder with the same content.
+    Files are compared by size first, then by hash of their first and last
+    blocks and only then by hash of whole content
+    """
+    PARTIAL = 'partial'
+    FULL = 'full'
+
+    def __init__(self, dst_path: str, cache: Optional[HashCache] = None):
+        self.dst_path = dst_path
+        self.cache = cache
+        self._sizes: Optional[Dict[int, List[_Candidate]]] = None
+        # the same candidates by their paths
+        self._paths: Dict[str, _Candidate] = {}
+        self._lock = threading.Lock()
+        self._size_locks = [
+            threading.Lock() for _ in range(SIZE_LOCKS_COUNT)]
+
+    def get_lock(self, size: int) -> threading.Lock:
+        """ Files of the same size must be checked and placed one by one """
+        return self._size_locks[size % SIZE_LOCKS_COUNT]
+
+    def find(self, path: str, stat: os.stat_result
+             ) -> Tuple[Optional[str], Dict[str, str]]:
+        """
+        Get path of destination file with the same content
+        and hashes of file computed while searching
+        """
+        hashes: Dict[str, str] = {}
+        sizes = self._get_sizes()
+        with self._lock:
+            candidates = list(sizes.get(stat.st_size, ()))
+        if not candidates:
+            return None, hashes
+        for kind in (self.PARTIAL, self.FULL):
+            if kind == self.PARTIAL and stat.st_size <= 2 * PARTIAL_BLOCK_SIZE:
+                # partial hash of small file is almost as expensive as full
+                continue
+            hashes[kind] = self._get_hash(path, stat, kind)
+            candidates = [
+                c for c in candidates
+                if self._get_candidate_hash(c, kind) == hashes[kind]]
+            if not candidates:
+                return None, hashes
+        return candidates[0].path, hashes
+
+    def add(self, path: str, size: int, hashes: Dict[str, str]):
+        """ Remember file placed into destination folder """
+        sizes = self._get_sizes()
+        try:
+            stat: Optional[os.stat_result] = os.stat(path)
+        except OSError:
+            stat = None
+        with self._lock:
+            self._remove(path)
+            self._add(sizes, _Candidate(path, size, stat, dict(hashes)))
+
+    def remove(self, path: str):
+        """ Forget file removed from destination folder """
+        self._get_sizes()
+        with self._lock:
+            self._remove(path)
+
+    def rename(self, path: str, new_path: str):
+        """ File of destination folder got other name """
+        sizes = self._get_sizes()
+        with self._lock:
+            candidate = self._remove(path)
+            if candidate is not None:
+                candidate.path = new_path
+                self._add(sizes, candidate)
+
+    def _add(self, sizes: Dict[int, List[_Candidate]],
+             candidate: _Candidate):
+        sizes.setdefault(candidate.size, []).append(candidate)
+        self._paths[_get_key(candidate.path)] = candidate
+
+    def _remove(self, path: str) -> Optional[_Candidate]:
+        candidate = self._paths.pop(_get_key(path), None)
+        if candidate is not None:
+            self._sizes[candidate.size].remove(candidate)  # type: ignore
+        return candidate
+
+    def _get_sizes(self) -> Dict[int, List[_Candidate]]:
+        """ Sizes of files in destination folder, it is walked once """
+        if self._sizes is None:
+            with self._lock:
+                if self._sizes is None:
+                    sizes: Dict[int, List[_Candidate]] = {}
+                    for entry in scan(self.dst_path):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        self._add(sizes, _Candidate(
+                            entry.path, stat.st_size, stat))
+                    self._sizes = sizes
+        return self._sizes
+
+    def _get_candidate_hash(self, candidate: _Candidate,
+                            kind: str) -> Optional[str]:
+        try:
+            stat = os.stat(candidate.path)
+            if candidate.stat is None or _is_changed(candidate.stat, stat):
+                # file was replaced or changed, known hashes are wrong
+                candidate.stat = stat
+                candidate.hashes = {}
+            if stat.st_size != candidate.size:
+                return None
+            if kind not in candidate.hashes:
+                candidate.hashes[kind] = self._get_hash(
+                    candidate.path, stat, kind)
+        except OSError:
+            # file was renamed or removed while sorting
+            return None
+        return candidate.hashes[kind]
+
+    def _get_hash(self, path: str, stat: os.stat_result, kind: str) -> str:
+        value = self.cache.get(stat, kind) if self.cache else None
+        if value is None:
+            if kind == self.PARTIAL:
+                value = get_partial_hash(path, stat.st_size)
+            else:
+                value = get_full_hash(path)
+            if self.cache is not None:
+                self.cache.set(stat, kind, value)
+        return value
+
+
+def _get_key(path: str) -> str:
+    return os.path.abspath(path)
+
+
+def _is_changed(old: os.stat_result, new: os.stat_result) -> bool:
+    return ((old.st_dev, old.st_ino, old.st_size, old.st_mtime_ns) !=
+            (new.st_dev, new.st_ino, new.st_size, new.st_mtime_ns))
+
+
+def get_partial_hash(path: str, size: int) -> str:
+    """ Hash of the first and the last blocks of file """
+    hasher = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        hasher.update(f.read(PARTIAL_BLOCK_SIZE))
+        f.seek(max(size - PARTIAL_BLOCK_SIZE, 0))
+        hasher.update(f.read(PARTIAL_BLOCK_SIZE))
+    return hasher.hexdigest()
+
+
+def get_full_hash(path: str) -> str:
+    hasher = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(FULL_HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+import errno
+import logging
 import os
-import shutil
 from enum import Enum
 from gettext import gettext as _
-from typing import Callable, Dict
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Set, Tuple
 
+from .cleanup import FolderCleaner
+from .destination import DestinationFolder
 from .file_classes import File, ImageFile
 
+if TYPE_CHECKING:
+    # duplicates import enums through cache
+    from .duplicates import DuplicateFinder
+
+logger = logging.getLogger(__name__)
+
+# errors meaning link can't be made here, so file is copied instead
+LINK_FALLBACK_ERRORS = {
+    errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOSYS,
+}
+# fallbacks already written to log, every one is reported once per run
+_reported_fallbacks: Set[Tuple[str, str]] = set()
+
 
 class MyEnum(Enum):
 
@@ -40,12 +56,18 @@ class SortMethodEnum(EnumWithAction):
     """ What to do with files """
     COPY = 1
     MOVE = 2
+    HARDLINK = 3
+    SYMLINK = 4
+    REFLINK = 5
 
     @classmethod
     def values(cls) -> Dict[MyEnum, str]:
         return {
             SortMethodEnum.COPY: _('Copy'),
             SortMethodEnum.MOVE: _('Move'),
+            SortMethodEnum.HARDLINK: _('Hard link (copy if impossible)'),
+            SortMethodEnum.SYMLINK: _('Symbolic link (copy if impossible)'),
+            SortMethodEnum.REFLINK: _('Clone (copy if impossible)'),
         }
 
     @classmethod
@@ -57,15 +79,80 @@ class SortMethodEnum(EnumWithAction):
         return {
             SortMethodEnum.COPY: cls.copy_handler,
             SortMethodEnum.MOVE: cls.move_handler,
+            SortMethodEnum.HARDLINK: cls.hardlink_handler,
+            SortMethodEnum.SYMLINK: cls.symlink_handler,
+            SortMethodEnum.REFLINK: cls.reflink_handler,
         }
 
     @classmethod
-    def copy_handler(cls, file_path, new_file_dir):
-        shutil.copy2(file_path, new_file_dir)
+    def copy_handler(cls, file_path: str, folder: DestinationFolder):
+        folder.copy_in(file_path, os.path.basename(file_path))
+
+    @classmethod
+    def move_handler(cls, file_path: str, folder: DestinationFolder,
+                     remove_source: Callable[[str], None] = os.remove):
+        """
+        Rename file if it stays on the same device, otherwise copy it,
+        check the copy and give source to remove_source, which may
+        remove it at once or later together with other files
+        """
+        new_file_name = os.path.basename(file_path)
+        if folder.is_on_same_device(os.path.dirname(file_path)):
+            try:
+                folder.move_in(file_path, new_file_name)
+                return
+            except OSError as e:
+                # same device number doesn't always mean same file system
+                if e.errno != errno.EXDEV:
+                    raise
+
+        folder.copy_in(file_path, new_file_name)
+        if folder.stat(new_file_name).st_size != os.stat(file_path).st_size:
+            folder.remove(new_file_name)
+            raise IOError(f'Copy of {file_path} has wrong size')
+        remove_source(file_path)
+
+    @classmethod
+    def hardlink_handler(cls, file_path: str, folder: DestinationFolder):
+        new_file_name = os.path.basename(file_path)
+        if not folder.is_on_same_device(os.path.dirname(file_path)):
+            cls._copy_instead(file_path, folder, 'hard link',
+                              os.strerror(errno.EXDEV))
+            return
+        try:
+            folder.link_in(file_path, new_file_name)
+        except OSError as e:
+            if e.errno not in LINK_FALLBACK_ERRORS:
+                raise
+            cls._copy_instead(file_path, folder, 'hard link',
+                              os.strerror(e.errno))
+
+    @classmethod
+    def symlink_handler(cls, file_path: str, folder: DestinationFolder):
+        try:
+            folder.symlink_in(file_path, os.path.basename(file_path))
+        except OSError as e:
+            if e.errno not in LINK_FALLBACK_ERRORS:
+                raise
+            cls._copy_instead(file_path, folder, 'symbolic link',
+                              os.strerror(e.errno))
+
+    @classmethod
+    def reflink_handler(cls, file_path: str, folder: DestinationFolder):
+        if not folder.clone_in(file_path, os.path.basename(file_path)):
+            cls._copy_instead(file_path, folder, 'clone',
+                              'file system does not support cloning')
 
     @classmethod
-    def move_handler(cls, file_path, new_file_dir):
-        shutil.move(file_path, new_file_dir, shutil.copy2)
+    def _copy_instead(cls, file_path: str, folder: DestinationFolder,
+                      kind: str, reason: str):
+        """ Copy file which can't be linked, tell about it once """
+        if (kind, reason) not in _reported_fallbacks:
+            _reported_fallbacks.add((kind, reason))
+            logger.warning(f'Can`t make {kind} of {file_path} '
+                           f'in {folder.path} ({reason}), files are copied '
+                           f'in such cases')
+        cls.copy_handler(file_path, folder)
 
 
 class ConflictResolveMethodEnum(EnumWithAction):
@@ -98,34 +185,57 @@ class ConflictResolveMethodEnum(EnumWithAction):
         }
 
     @classmethod
-    def replace_handler(cls, file_path, new_file_dir):
+    def replace_handler(cls, file_path: str, folder: DestinationFolder,
+                        duplicates: Optional[DuplicateFinder] = None):
+        new_file_name = os.path.basename(file_path)
 
-        file_name, file_ext = os.path.splitext(os.path.basename(file_path))
-        new_file_path = os.path.join(new_file_dir, f'{file_name}{file_ext}')
-
-        if os.path.exists(new_file_path):
-            os.remove(new_file_path)
+        if folder.exists(new_file_name):
+            folder.remove(new_file_name)
+            if duplicates is not None:
+                duplicates.remove(folder.join(new_file_name))
 
     @classmethod
-    def save_all_handler(cls, file_path, new_file_dir):
+    def save_all_handler(cls, file_path: str, folder: DestinationFolder,
+                         duplicates: Optional[DuplicateFinder] = None):
         # rename file with same name
-        file_name, file_ext = os.path.splitext(os.path.basename(file_path))
-        new_file_path = os.path.join(new_file_dir, f'{file_name}{file_ext}')
+        new_file_name = os.path.basename(file_path)
 
-        if os.path.exists(new_file_path):
-            tmp_path = new_file_path
-            i = 2
-            while os.path.exists(tmp_path):
-                tmp_path = os.path.join(
-                    new_file_dir,
-                    f'{file_name} ({i}){file_ext}')
-                i += 1
-            os.rename(new_file_path, tmp_path)
+        if folder.exists(new_file_name):
+            free_name = folder.get_free_name(new_file_name)
+            folder.rename(new_file_name, free_name)
+            if duplicates is not None:
+                duplicates.rename(folder.join(new_file_name),
+                                  folder.join(free_name))
 
     @classmethod
-    def do_nothing_handler(cls, new_file_path):
-        if os.path.exists(new_file_path):
-            raise Exception()
+    def do_nothing_handler(cls, file_path: str, folder: DestinationFolder,
+                           duplicates: Optional[DuplicateFinder] = None):
+        new_file_name = os.path.basename(file_path)
+
+        if folder.exists(new_file_name):
+            raise FileExistsError(folder.join(new_file_name))
+
+
+class DuplicatesOptionEnum(MyEnum):
+    """ What to do if file with same content already exists in dst folder """
+    KEEP = 1
+    SKIP = 2
+    LINK = 3
+
+    @classmethod
+    def values(cls) -> Dict[MyEnum, str]:
+        return {
+            DuplicatesOptionEnum.KEEP:
+                _('Place anyway'),
+            DuplicatesOptionEnum.SKIP:
+                _('Skip'),
+            DuplicatesOptionEnum.LINK:
+                _('Link to existing file'),
+        }
+
+    @classmethod
+    def get_default(cls) -> MyEnum:
+        return DuplicatesOptionEnum.KEEP
 
 
 class FolderCleanupOptionsEnum(EnumWithAction):
@@ -152,10 +262,47 @@ class FolderCleanupOptionsEnum(EnumWithAction):
         }
 
     @classmethod
-    def remove_handler(cls, file_path, new_file_dir):
-        old_file_dir = os.path.dirname(file_path)
-        if not os.listdir(old_file_dir):
-            os.rmdir(old_file_dir)
+    def remove_handler(cls, file_path: str, cleaner: FolderCleaner):
+        # folders are removed together when all files are placed
+        cleaner.add(os.path.dirname(file_path))
+
+
+class ClassificationMethodEnum(MyEnum):
+    """ How to define content type of file """
+    CONTENT = 1
+    EXTENSION = 2
+
+    @classmethod
+    def values(cls) -> Dict[MyEnum, str]:
+        return {
+            ClassificationMethodEnum.CONTENT:
+                _('By content'),
+            ClassificationMethodEnum.EXTENSION:
+                _('By extension, check content if unsure'),
+        }
+
+    @classmethod
+    def get_default(cls) -> MyEnum:
+        return ClassificationMethodEnum.CONTENT
+
+
+class EventKindEnum(MyEnum):
+    """ What happened to file while it was sorted """
+    STARTED = 1
+    PROGRESS = 2
+    FINISHED = 3
+
+    @classmethod
+    def values(cls) -> Dict[MyEnum, str]:
+        return {
+            EventKindEnum.STARTED: _('Started'),
+            EventKindEnum.PROGRESS: _('In progress'),
+            EventKindEnum.FINISHED: _('Finished'),
+        }
+
+    @classmethod
+    def get_default(cls) -> MyEnum:
+        return EventKindEnum.FINISHED
 
 
 class HiddenOptionEnum(EnumWithAction):
@@ -0,0 +1,108 @@
+import time
+from datetime import timedelta
+from gettext import gettext as _
+from typing import Dict, NamedTuple, Optional
+
+from .enums import EventKindEnum, MyEnum
+
+# conflict action of file not placed because the same file is there
+SKIPPED_DUPLICATE = 'skip_duplicate'
+
+MEGABYTE = 1024 * 1024
+
+
+class SortEvent(NamedTuple):
+    """ Something that happened to file while it was sorted """
+    kind: MyEnum
+    path: str
+    size: int = 0
+    # bytes of file transferred so far
+    transferred: int = 0
+    dst_path: str = ''
+    # what happened to file already having dst path, e.g. "rename"
+    conflict_action: str = ''
+    is_done: bool = False
+    # why file is not placed
+    error: Optional[str] = None
+
+
+class Progress:
+    """
+    Throughput and remaining time of sorting,
+    bytes of large files are counted while they are transferred
+    """
+    def __init__(self, total_files: int = 0, total_bytes: int = 0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.files_done = 0
+        self.files_failed = 0
+        # bytes of failed files, they aren't transferred but aren't left
+        self.bytes_failed = 0
+        self.started = time.monotonic()
+        self._finished_bytes = 0
+        # bytes transferred of files which are not finished yet
+        self._partial: Dict[str, int] = {}
+
+    def update(self, event: SortEvent):
+        if event.kind == EventKindEnum.PROGRESS:
+            self._partial[event.path] = event.transferred
+        elif event.kind == EventKindEnum.FINISHED:
+            self._partial.pop(event.path, None)
+            if event.is_done:
+                self.files_done += 1
+                self._finished_bytes += event.size
+            else:
+                self.files_failed += 1
+                self.bytes_failed += event.size
+
+    @property
+    def files(self) -> int:
+        """ Count of processed files, placed and failed ones """
+        return self.files_done + self.files_failed
+
+    @property
+    def bytes(self) -> int:
+        """ Bytes of placed files and transferred part of others """
+        return self._finished_bytes + sum(self._partial.values())
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def files_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.files / elapsed if elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes_per_second / MEGABYTE
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Seconds left, by bytes if their total is known, otherwise by files.
+        None until speed is known
+        """
+        if self.total_bytes:
+            speed = self.bytes_per_second
+            left = self.total_bytes - self.bytes - self.bytes_failed
+        elif self.total_files:
+            speed, left = self.files_per_second, self.total_files - self.files
+        else:
+            return None
+        if not speed:
+            return None
+        return max(left, 0) / speed
+
+    def to_text(self) -> str:
+        """ Throughput and remaining time like "12.3 MB/s, 0:01:05 left" """
+        eta = self.eta
+        return _('%.1f MB/s, %s left') % (
+            self.megabytes_per_second,
+            '?' if eta is None else timedelta(seconds=round(eta)))
@@ -0,0 +1,158 @@
+import struct
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+DATE_PATTERN = '%Y:%m:%d %H:%M:%S'
+
+JPEG_START = b'\xff\xd8'
+JPEG_APP1 = 0xE1
+JPEG_SCAN_START = 0xDA
+JPEG_END = 0xD9
+EXIF_HEADER = b'Exif\x00\x00'
+TIFF_HEADERS = {
+    b'II*\x00': '<',
+    b'MM\x00*': '>',
+}
+
+TAG_DATE_TIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATE_TIME_ORIGINAL = 0x9003
+TAG_DATE_TIME_DIGITIZED = 0x9004
+
+TYPE_ASCII = 2
+TYPE_LONG = 4
+IFD_ENTRY_SIZE = 12
+# real images have a few dozens of tags in IFD
+MAX_IFD_ENTRIES = 1024
+
+Reader = Callable[[int, int], bytes]
+IfdEntry = Tuple[int, int, bytes]
+
+
+class ExifError(Exception):
+    """ File has format the reader doesn't understand """
+
+
+def read_exif_date(f: BinaryIO) -> Optional[datetime]:
+    """
+    Read date when picture was taken from JPEG or TIFF file.
+    Only tags with dates are read, everything else is skipped.
+    Returns None if file has no dates, raises ExifError if file
+    can't be parsed
+    """
+    try:
+        return _read_date(f)
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        raise ExifError(str(e))
+
+
+def _read_date(f: BinaryIO) -> Optional[datetime]:
+    start = f.tell()
+    header = f.read(4)
+    if header in TIFF_HEADERS:
+        def _read_file(offset: int, size: int) -> bytes:
+            f.seek(start + offset)
+            return _check_size(f.read(size), size)
+        return _parse_tiff(_read_file)
+
+    if header[:2] != JPEG_START:
+        raise ExifError('Not a JPEG or TIFF file')
+    f.seek(start + len(JPEG_START))
+    segment = _find_exif_segment(f)
+    if segment is None:
+        return None
+
+    def _read_segment(offset: int, size: int) -> bytes:
+        return _check_size(segment[offset:offset + size], size)
+    return _parse_tiff(_read_segment)
+
+
+def _find_exif_segment(f: BinaryIO) -> Optional[bytes]:
+    """ Skip JPEG segments until APP1 with EXIF information """
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ExifError('Broken JPEG marker')
+        if marker[1] == 0xFF:
+            # padding before marker
+            f.seek(-1, 1)
+            continue
+        if marker[1] in (JPEG_SCAN_START, JPEG_END):
+            return None
+        length, = struct.unpack('>H', _check_size(f.read(2), 2))
+        if length < 2:
+            raise ExifError('Broken JPEG segment')
+        if marker[1] == JPEG_APP1:
+            segment = _check_size(f.read(length - 2), length - 2)
+            if segment.startswith(EXIF_HEADER):
+                return segment[len(EXIF_HEADER):]
+        else:
+            f.seek(length - 2, 1)
+
+
+def _parse_tiff(read: Reader) -> Optional[datetime]:
+    header = read(0, 8)
+    endian = TIFF_HEADERS.get(header[:4])
+    if endian is None:
+        raise ExifError('Broken TIFF header')
+    ifd_offset, = struct.unpack(endian + 'I', header[4:])
+
+    main_tags = _read_ifd(read, endian, ifd_offset,
+                          (TAG_DATE_TIME, TAG_EXIF_IFD))
+    exif_tags: Dict[int, IfdEntry] = {}
+    if TAG_EXIF_IFD in main_tags:
+        exif_offset = _get_long(endian, main_tags[TAG_EXIF_IFD])
+        exif_tags = _read_ifd(
+            read, endian, exif_offset,
+            (TAG_DATE_TIME_DIGITIZED, TAG_DATE_TIME_ORIGINAL),
+            stop_tag=TAG_DATE_TIME_DIGITIZED)
+
+    # same priority as it always was
+    for tags, tag in ((exif_tags, TAG_DATE_TIME_DIGITIZED),
+                      (exif_tags, TAG_DATE_TIME_ORIGINAL),
+                      (main_tags, TAG_DATE_TIME)):
+        if tag in tags:
+            value = _get_ascii(read, endian, tags[tag])
+            return datetime.strptime(value, DATE_PATTERN)
+    return None
+
+
+def _read_ifd(read: Reader, endian: str, offset: int, wanted: Tuple[int, ...],
+              stop_tag: Optional[int] = None) -> Dict[int, IfdEntry]:
+    """ Read entries of wanted tags from image file directory """
+    count, = struct.unpack(endian + 'H', read(offset, 2))
+    if count > MAX_IFD_ENTRIES:
+        raise ExifError('Too many IFD entries')
+    data = read(offset + 2, count * IFD_ENTRY_SIZE)
+    result = {}
+    for i in range(0, len(data), IFD_ENTRY_SIZE):
+        tag, tag_type, value_count = struct.unpack(
+            endian + 'HHI', data[i:i + 8])
+        if tag in wanted:
+            result[tag] = (tag_type, value_count, data[i + 8:i + 12])
+            if tag == stop_tag:
+                break
+    return result
+
+
+def _get_long(endian: str, entry: IfdEntry) -> int:
+    tag_type, count, value = entry
+    if tag_type != TYPE_LONG:
+        raise ExifError('Unexpected tag type')
+    return struct.unpack(endian + 'I', value)[0]
+
+
+def _get_ascii(read: Reader, endian: str, entry: IfdEntry) -> str:
+    tag_type, count, value = entry
+    if tag_type != TYPE_ASCII:
+        raise ExifError('Unexpected tag type')
+    if count > 4:
+        value = read(struct.unpack(endian + 'I', value)[0], count)
+    # everything after null is garbage
+    return value[:count].split(b'\x00', 1)[0].decode('utf-8')
+
+
+def _check_size(data: bytes, size: int) -> bytes:
+    if len(data) < size:
+        raise ExifError('Unexpected end of file')
+    return data
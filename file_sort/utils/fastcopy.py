@@ -0,0 +1,238 @@
+import errno
+import os
+import shutil
+import stat as st
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore
+
+IS_LINUX = sys.platform.startswith('linux')
+
+# ioctl asking file system to share data blocks of files (btrfs, XFS, ...)
+FICLONE = 0x40049409
+# kernel copies big files by parts, so interruption doesn't take long
+MAX_CHUNK_SIZE = 1024 * 1024 * 1024
+USERSPACE_CHUNK_SIZE = 1024 * 1024
+# chunks are smaller when somebody waits for progress of copying
+PROGRESS_CHUNK_SIZE = 64 * 1024 * 1024
+
+# errors meaning way of copying isn't supported here, not that it failed
+UNSUPPORTED_ERRORS = {
+    errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP,
+    errno.ENOTTY, errno.EBADF,
+}
+# errors of extended attributes copying which are ignored as shutil does
+IGNORED_XATTR_ERRORS = {
+    errno.EPERM, errno.ENOTSUP, errno.ENODATA, errno.EINVAL, errno.EACCES,
+}
+
+# callbacks told about copied bytes, every thread has its own
+_progress = threading.local()
+
+
+class FileChangedError(OSError):
+    """ Source file was changed while it was copied, copy isn't whole """
+
+
+@contextmanager
+def report_progress(callback: Callable[[int], None]) -> Iterator[None]:
+    """
+    Files copied by current thread inside block tell callback
+    how many bytes of them are copied already
+    """
+    previous = getattr(_progress, 'callback', None)
+    _progress.callback = callback
+    try:
+        yield
+    finally:
+        _progress.callback = previous
+
+
+def copy_file(src_path: str, dst_path: str, dir_fd: Optional[int] = None):
+    """
+    Copy file with its metadata like shutil.copy2 does,
+    but data doesn't go through userspace if possible:
+    file system clones file or kernel copies it, holes of sparse files
+    stay holes. dst_path may be relative to folder dir_fd
+    """
+    if not IS_LINUX:
+        if dir_fd is not None:
+            raise ValueError('dir_fd is supported on Linux only')
+        shutil.copy2(src_path, dst_path)
+        _report(os.stat(dst_path).st_size)
+        return
+
+    src_fd = os.open(src_path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        src_stat = os.fstat(src_fd)
+        dst_fd = os.open(
+            dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC,
+            st.S_IMODE(src_stat.st_mode), dir_fd=dir_fd)
+        try:
+            if not _clone(src_fd, dst_fd):
+                _copy_data(src_fd, dst_fd, src_stat.st_size)
+                _check_unchanged(src_fd, src_stat, src_path)
+            _report(src_stat.st_size)
+            _copy_stat(src_fd, dst_fd, src_stat)
+        except BaseException:
+            os.close(dst_fd)
+            # don't leave half copied file
+            os.unlink(dst_path, dir_fd=dir_fd)
+            raise
+        os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def clone_file(src_path: str, dst_path: str,
+               dir_fd: Optional[int] = None) -> bool:
+    """
+    Make copy of file sharing data blocks with it (reflink).
+    Nothing is created and False is returned if file system can't do it
+    """
+    if not IS_LINUX:
+        return False
+
+    src_fd = os.open(src_path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        src_stat = os.fstat(src_fd)
+        dst_fd = os.open(
+            dst_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC,
+            st.S_IMODE(src_stat.st_mode), dir_fd=dir_fd)
+        try:
+            is_cloned = _clone(src_fd, dst_fd)
+            if is_cloned:
+                _copy_stat(src_fd, dst_fd, src_stat)
+        except BaseException:
+            os.close(dst_fd)
+            os.unlink(dst_path, dir_fd=dir_fd)
+            raise
+        os.close(dst_fd)
+        if not is_cloned:
+            os.unlink(dst_path, dir_fd=dir_fd)
+        return is_cloned
+    finally:
+        os.close(src_fd)
+
+
+def _clone(src_fd: int, dst_fd: int) -> bool:
+    """ Make file system share data blocks of files, copy nothing """
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    except OSError as e:
+        if e.errno in UNSUPPORTED_ERRORS:
+            return False
+        raise
+    return True
+
+
+def _copy_data(src_fd: int, dst_fd: int, size: int):
+    """ Copy data parts of file, holes are skipped """
+    copier = _KernelCopier(src_fd, dst_fd)
+    offset = 0
+    while offset < size:
+        try:
+            data_start = os.lseek(src_fd, offset, os.SEEK_DATA)
+            data_end = os.lseek(src_fd, data_start, os.SEEK_HOLE)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # only hole is left
+                break
+            if e.errno not in UNSUPPORTED_ERRORS:
+                raise
+            # file system doesn't know about holes
+            data_start, data_end = offset, size
+        copier.copy(data_start, data_end - data_start)
+        offset = data_end
+    # hole at the end of file isn't written, so size must be set
+    os.ftruncate(dst_fd, size)
+
+
+class _KernelCopier:
+    """ Copies ranges of file with the fastest way that works """
+    def __init__(self, src_fd: int, dst_fd: int):
+        self.src_fd = src_fd
+        self.dst_fd = dst_fd
+        self.callback = getattr(_progress, 'callback', None)
+        self.chunk_size = (
+            MAX_CHUNK_SIZE if self.callback is None else PROGRESS_CHUNK_SIZE)
+        self.use_copy_file_range = hasattr(os, 'copy_file_range')
+        self.use_sendfile = hasattr(os, 'sendfile')
+
+    def copy(self, offset: int, length: int):
+        while length > 0:
+            count = min(length, self.chunk_size)
+            try:
+                copied = self._copy_chunk(offset, count)
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+                if self.use_copy_file_range:
+                    self.use_copy_file_range = False
+                elif self.use_sendfile:
+                    self.use_sendfile = False
+                else:
+                    raise
+                continue
+            if not copied:
+                raise FileChangedError(
+                    errno.EIO, 'File became shorter while it was copied')
+            offset += copied
+            length -= copied
+            if self.callback is not None:
+                self.callback(offset)
+
+    def _copy_chunk(self, offset: int, count: int) -> int:
+        if self.use_copy_file_range:
+            return os.copy_file_range(  # type: ignore
+                self.src_fd, self.dst_fd, count, offset, offset)
+        if self.use_sendfile:
+            os.lseek(self.dst_fd, offset, os.SEEK_SET)
+            return os.sendfile(self.dst_fd, self.src_fd, offset, count)
+        data = os.pread(
+            self.src_fd, min(count, USERSPACE_CHUNK_SIZE), offset)
+        return os.pwrite(self.dst_fd, data, offset)
+
+
+def _check_unchanged(src_fd: int, src_stat: os.stat_result, src_path: str):
+    """
+    Size copy got is the size file had before copying,
+    so file changed since then is copied wrong
+    """
+    stat = os.fstat(src_fd)
+    if (stat.st_size, stat.st_mtime_ns) != (
+            src_stat.st_size, src_stat.st_mtime_ns):
+        raise FileChangedError(
+            errno.EIO, 'File changed while it was copied', src_path)
+
+
+def _report(copied: int):
+    callback = getattr(_progress, 'callback', None)
+    if callback is not None:
+        callback(copied)
+
+
+def _copy_stat(src_fd: int, dst_fd: int, src_stat: os.stat_result):
+    """ Copy permissions, times and extended attributes like copystat """
+    try:
+        names = os.listxattr(src_fd)
+    except OSError as e:
+        if e.errno not in IGNORED_XATTR_ERRORS:
+            raise
+        names = []
+    for name in names:
+        try:
+            os.setxattr(dst_fd, name, os.getxattr(src_fd, name))
+        except OSError as e:
+            if e.errno not in IGNORED_XATTR_ERRORS:
+                raise
+    os.chmod(dst_fd, st.S_IMODE(src_stat.st_mode))
+    os.utime(dst_fd, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
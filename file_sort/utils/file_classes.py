@@ -1,44 +1,95 @@
 import os
 from datetime import datetime
-from typing import Text
+from typing import Any, BinaryIO, NamedTuple, Optional, Text
 
 import exifread  # type: ignore
 
-DATE_PATTERN = '%Y:%m:%d %H:%M:%S'
+from .exif import DATE_PATTERN, ExifError, read_exif_date
+
+
+class FileInfo(NamedTuple):
+    """ Lightweight information about file, cheap to pass between processes """
+    path: Text
+    content_type: Any
+    extension: Text
+    date: datetime
+    error: Optional[Text] = None
 
 
 class File:
     """ Class with information about file """
-    def __init__(self, _path: Text, _type):
+    def __init__(self, _path: Text, _type, _date: Optional[datetime] = None,
+                 _stat: Optional[os.stat_result] = None,
+                 _reader: Optional[BinaryIO] = None):
         self.path = _path
         self.content_type = _type
         self.extension = os.path.splitext(_path)[1].strip('.')
-        self.date = self.get_date()
+        self._stat = _stat
+        # already opened file is used while file object is being created
+        self._reader = _reader
+        self.date = _date if _date is not None else self.get_date()
+        self._reader = None
+
+    @property
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    @classmethod
+    def from_info(cls, info: FileInfo,
+                  stat: Optional[os.stat_result] = None) -> 'File':
+        """ Restore file object without reading the file again """
+        file_obj = cls(info.path, info.content_type, info.date, stat)
+        file_obj.extension = info.extension
+        return file_obj
+
+    def to_info(self) -> FileInfo:
+        return FileInfo(
+            self.path, self.content_type, self.extension, self.date)
 
     def get_date(self) -> datetime:
-        if os.path.getmtime(self.path):
-            return datetime.fromtimestamp(os.path.getmtime(self.path))
-        elif os.path.getctime(self.path):
-            return datetime.fromtimestamp(os.path.getctime(self.path))
+        if self.stat.st_mtime:
+            return datetime.fromtimestamp(self.stat.st_mtime)
+        elif self.stat.st_ctime:
+            return datetime.fromtimestamp(self.stat.st_ctime)
         return datetime.min
 
 
 class ImageFile(File):
     """ Class with information about image file """
     def get_date(self) -> datetime:
-        result = None
-        with open(self.path, 'rb') as f:
-            exif = exifread.process_file(f)
-
-            if 'EXIF DateTimeDigitized' in exif:
-                result = datetime.strptime(
-                    exif['EXIF DateTimeDigitized'].values, DATE_PATTERN)
-            elif 'EXIF DateTimeOriginal' in exif:
-                result = datetime.strptime(
-                    exif['EXIF DateTimeOriginal'].values, DATE_PATTERN)
-            elif 'Image DateTime' in exif:
-                result = datetime.strptime(
-                    exif['Image DateTime'].values, DATE_PATTERN)
+        if self._reader is not None:
+            result = self._read_date(self._reader)
+        else:
+            with open(self.path, 'rb') as f:
+                result = self._read_date(f)
         if not result:
             result = super().get_date()
         return result
+
+    @classmethod
+    def _read_date(cls, f: BinaryIO) -> Optional[datetime]:
+        f.seek(0)
+        try:
+            return read_exif_date(f)
+        except ExifError:
+            f.seek(0)
+            return cls._get_exifread_date(f)
+
+    @staticmethod
+    def _get_exifread_date(f) -> Optional[datetime]:
+        """ Slow way for files fast reader doesn't understand """
+        result = None
+        exif = exifread.process_file(f, details=False)
+
+        if 'EXIF DateTimeDigitized' in exif:
+            result = datetime.strptime(
+                exif['EXIF DateTimeDigitized'].values, DATE_PATTERN)
+        elif 'EXIF DateTimeOriginal' in exif:
+            result = datetime.strptime(
+                exif['EXIF DateTimeOriginal'].values, DATE_PATTERN)
+        elif 'Image DateTime' in exif:
+            result = datetime.strptime(
+                exif['Image DateTime'].values, DATE_PATTERN)
+        return result
@@ -0,0 +1,71 @@
+import io
+import os
+from typing import BinaryIO, Optional
+
+# enough for signatures libmagic looks for and for usual EXIF block
+HEADER_SIZE = 64 * 1024
+
+
+class HeaderReader(io.RawIOBase):
+    """
+    Readable file that keeps beginning of file in memory.
+    File is opened on first read only, so everyone who needs file content
+    shares one open and one read of header
+    """
+    def __init__(self, path: str, header_size: int = HEADER_SIZE):
+        super().__init__()
+        self.path = path
+        self.header_size = header_size
+        self._file: Optional[BinaryIO] = None
+        self._header: Optional[bytes] = None
+        self._position = 0
+
+    @property
+    def header(self) -> bytes:
+        if self._header is None:
+            self._file = open(self.path, 'rb', buffering=0)
+            self._header = self._file.read(self.header_size)
+        return self._header
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._get_size()
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        header = self.header
+        size = len(buffer)
+        end = self._position + size
+        if end <= len(header) or len(header) < self.header_size:
+            # whole file is in memory or needed part is in header
+            data = header[self._position:end]
+        else:
+            # metadata goes further than header
+            self._file.seek(self._position)  # type: ignore
+            data = self._file.read(size)  # type: ignore
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+    def _get_size(self) -> int:
+        if self._header is not None and len(self._header) < self.header_size:
+            return len(self._header)
+        return os.stat(self.path).st_size
@@ -5,12 +5,14 @@ import sys
 import traceback
 from gettext import bindtextdomain
 from gettext import gettext as _
-from typing import Optional, Type
+from typing import Optional, Tuple, Type
 
 from .enums import LangEnum, MyEnum
 from .settings import SettingEnum, Settings
 
 LOCALE_REL_PATH = '../locale'
+# environment variables gettext chooses language by
+LANGUAGE_VARIABLES = ('LANGUAGE', 'LC_ALL', 'LC_MESSAGES', 'LANG')
 
 
 logger = logging.getLogger(__name__)
@@ -49,6 +51,11 @@ def set_locale(predefined: Optional[MyEnum] = None):
                 break
 
 
+def get_locale_key() -> Tuple[Optional[str], ...]:
+    """ Identifies current language of translations """
+    return tuple(os.environ.get(name) for name in LANGUAGE_VARIABLES)
+
+
 def get_default_folder_name():
     return _('Others')
 
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .cache import Key, get_stat_key
+from .settings import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+JOURNALS_PATH = os.path.join(CACHE_DIR, 'journals')
+# how many records may be not synced to disk
+JOURNAL_SYNC_BATCH_SIZE = 256
+# how many seconds records may be not synced to disk
+JOURNAL_SYNC_INTERVAL = 1.0
+# how many records journal may have before it is compacted,
+# after that it is compacted when records are twice more than kept ones
+JOURNAL_COMPACT_SIZE = 100000
+
+START = 'start'
+DONE = 'done'
+
+
+def get_journal_path(src_path: str, dst_path: str, path_format: str) -> str:
+    """ Runs with the same folders and format share journal """
+    key = '\n'.join((
+        os.path.abspath(src_path), os.path.abspath(dst_path), path_format))
+    name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(JOURNALS_PATH, f'{name}.jsonl')
+
+
+class Journal:
+    """
+    Append-only record of sort run. Every file gets "start" record
+    when its destination name is free and "done" record when it is placed.
+    Records are flushed one by one, so they survive crash of program,
+    and synced to disk in batches, so they survive crash of system too.
+    Resumed run skips done files and removes destination files
+    which were started but not finished.
+    Every record has identity of source file (device, inode, size and
+    modification time), so file created later at the same path
+    is never taken for the one placed before
+    """
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        # identities of placed files
+        self._done: Dict[str, Optional[Key]] = {}
+        # destination paths, operations and identities of started files
+        self._unfinished: Dict[
+            str, Tuple[str, str, Optional[Key]]] = {}
+        # moved files whose sources may be left
+        self._moved: List[Tuple[str, str, Optional[Key]]] = []
+        # count of records in file and count of them kept by compaction
+        self._records = 0
+        self._kept_records = 0
+        if resume:
+            self._load()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def is_done(self, src: str, stat: os.stat_result) -> bool:
+        """ File was placed and it wasn't changed since """
+        identity = self._done.get(src)
+        return identity is not None and identity == get_stat_key(stat)
+
+    def start(self, src: str, dst: str, operation: str,
+              stat: os.stat_result):
+        self._done.pop(src, None)
+        self._write({'event': START, 'src': src, 'dst': dst,
+                     'operation': operation, 'id': get_stat_key(stat)})
+
+    def done(self, src: str, stat: os.stat_result):
+        identity = get_stat_key(stat)
+        self._done[src] = identity
+        self._write({'event': DONE, 'src': src, 'id': identity})
+
+    def recover(self) -> List[str]:
+        """
+        Remove destination files of interrupted operations.
+        Sources of moved files which were not removed are returned,
+        only if they are the same files and their copies exist
+        """
+        for src, (dst, operation, identity) in self._unfinished.items():
+            # if source is gone or changed, destination file can be
+            # its only copy
+            if not _is_same(src, identity):
+                continue
+            try:
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                    logger.info(f'Unfinished {dst} is removed')
+            except OSError:
+                logger.exception(f'Unfinished {dst} can`t be removed')
+        self._unfinished = {}
+        moved = [src for src, dst, identity in self._moved
+                 if _is_same(src, identity) and
+                 _is_copy(dst, identity)]  # type: ignore
+        self._moved = []
+        return moved
+
+    def compact(self):
+        """
+        Rewrite journal keeping only files which are still in place
+        unchanged, so long running sort doesn't make it grow endlessly.
+        Must be called after recover() while no file is placed
+        """
+        with self._lock:
+            if self._records < max(JOURNAL_COMPACT_SIZE,
+                                   2 * self._kept_records):
+                return
+            self._done = {src: identity
+                          for src, identity in self._done.items()
+                          if _is_same(src, identity)}
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as tmp_file:
+                for src, identity in self._done.items():
+                    tmp_file.write(json.dumps(
+                        {'event': DONE, 'src': src, 'id': identity},
+                        ensure_ascii=False) + '\n')
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            self._file.close()
+            # old journal is replaced only by complete new one
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._records = self._kept_records = len(self._done)
+            self._unsynced = 0
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+
+    def _load(self):
+        try:
+            journal_file = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with journal_file:
+            for line in journal_file:
+                self._records += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last record could be written partially
+                    continue
+                src = record['src']
+                # records without identity never match any file
+                identity = record.get('id')
+                if identity is not None:
+                    identity = tuple(identity)
+                if record['event'] == START:
+                    # file could be placed again by other plan
+                    self._done.pop(src, None)
+                    self._unfinished[src] = (
+                        record['dst'], record['operation'], identity)
+                elif record['event'] == DONE:
+                    self._done[src] = identity
+                    dst, operation, identity = self._unfinished.pop(
+                        src, (None, None, None))
+                    if operation == 'move':
+                        self._moved.append((src, dst, identity))
+
+    def _write(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self._records += 1
+            self._unsynced += 1
+            if (self._unsynced >= JOURNAL_SYNC_BATCH_SIZE or
+                    time.monotonic() - self._synced_at >=
+                    JOURNAL_SYNC_INTERVAL):
+                self._sync()
+
+    def _sync(self):
+        if self._file.closed or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+
+def _is_same(path: str, identity: Optional[Key]) -> bool:
+    """ File at path is the one journal knows """
+    try:
+        return (identity is not None and
+                get_stat_key(os.stat(path)) == identity)
+    except OSError:
+        return False
+
+
+def _is_copy(path: str, identity: Key) -> bool:
+    """ File at path may be complete copy of file journal knows """
+    try:
+        return os.stat(path).st_size == identity[2]
+    except OSError:
+        return False
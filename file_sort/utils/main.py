@@ -1,28 +1,65 @@
 import logging
 import os
-import re
+import threading
 import traceback
+from contextlib import nullcontext
+from functools import partial
 from gettext import gettext as _
-from typing import Iterator, List, Optional, Set, Text, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple
+)
 
+from .cache import MetadataCache
+from .cleanup import FolderCleaner
+from .destination import DestinationFolder, FolderCache
+from .devices import DeviceLimiter, get_device
+from .duplicates import DuplicateFinder, HashCache
 from .enums import (
+    ClassificationMethodEnum,
     ConflictResolveMethodEnum,
     ContentTypesEnum,
+    DuplicatesOptionEnum,
+    EventKindEnum,
     FolderCleanupOptionsEnum,
     MyEnum,
     SortMethodEnum
 )
-from .tag_classes import TagProcessor
+from .events import SKIPPED_DUPLICATE, Progress, SortEvent
+from .fastcopy import report_progress
+from .file_classes import File, FileInfo
+from .journal import Journal
+from .metadata import (
+    BATCH_SIZE,
+    BATCHES_PER_PROCESS,
+    MetadataExtractor,
+    get_file
+)
+from .metrics import Metrics, get_timer
+from .pipeline import QUEUE_SIZE, Batcher, Pipeline, Stage
+from .plan import (
+    CONFLICT_ACTIONS,
+    NO_CONFLICT,
+    DestinationTurns,
+    PlanEntry,
+    get_conflict_method,
+    get_method,
+    get_operation,
+    read_plan,
+    write_entry
+)
+from .scanner import FileEntry, scan
+from .tag_classes import PathRenderer
+from .watcher import Watcher
 
 logger = logging.getLogger(__name__)
 
-
-try:
-    import magic  # type: ignore
-except ImportError:
-    logger.warning('libmagic isn`t installed')
-    magic = None
-
 logging.basicConfig(
     filename="../log.log",
     level=logging.INFO,
@@ -31,33 +68,310 @@ logging.basicConfig(
 
 
 # constants
-PATH_DELIMITER = '/'
-TAG_PATTERN = '%[a-zA-Z]'
+# how many files may wait in queue for every worker
+TASKS_PER_WORKER = 4
+# count of locks protecting destination names from simultaneous use
+PATH_LOCKS_COUNT = 64
+# how many files are grouped by destination folder at once
+GROUP_SIZE = 256
+# how many moved files are removed from source at once
+REMOVAL_BATCH_SIZE = 256
+
+
+class MetadataError(Exception):
+    """ Information about file couldn't be gathered in worker process """
+
+
+class Task:
+    """ File going through stages of sorting """
+    __slots__ = ('index', 'entry', 'info', 'file_obj', 'folder_path',
+                 'plan_entry', 'result', 'size', 'dst_path',
+                 'conflict_action', 'error', 'turn')
+
+    def __init__(self, index: int, entry: Optional[os.DirEntry] = None,
+                 plan_entry: Optional[PlanEntry] = None):
+        self.index = index
+        self.entry = entry
+        self.plan_entry = plan_entry
+        self.info: Optional[FileInfo] = None
+        self.file_obj: Optional[File] = None
+        self.folder_path = ''
+        self.result: Optional[Tuple[bool, str]] = None
+        self.size = 0
+        self.dst_path = ''
+        self.conflict_action = ''
+        self.error: Optional[str] = None
+        # place of plan entry among entries of the same destination
+        self.turn = 0
+
+    @property
+    def path(self) -> str:
+        if self.plan_entry is not None:
+            return self.plan_entry.src
+        return self.entry.path  # type: ignore
+
+    def fail(self, error: Exception):
+        """ Remember why file is not placed """
+        logger.error(traceback.format_exc())
+        self.result = False, self.path
+        self.error = f'{type(error).__name__}: {error}'
+
+    def to_event(self) -> SortEvent:
+        is_done, path = self.result  # type: ignore
+        return SortEvent(
+            EventKindEnum.FINISHED, path, self.size,
+            self.size if is_done else 0, self.dst_path,
+            self.conflict_action, is_done, self.error)
 
 
 class Sorter:
     def __init__(self, src_path: str, dst_path: str, path_format: str,
                  method: MyEnum,
                  conflict_resolve_method: MyEnum,
-                 cleanup_option: MyEnum):
+                 cleanup_option: MyEnum,
+                 workers: int = 1,
+                 device_limits: Optional[Dict[int, int]] = None,
+                 keep_order: bool = False,
+                 processes: int = 0,
+                 cache: Optional[MetadataCache] = None,
+                 classification_method: MyEnum =
+                 ClassificationMethodEnum.get_default(),
+                 duplicates_option: MyEnum =
+                 DuplicatesOptionEnum.get_default(),
+                 hash_cache: Optional[HashCache] = None,
+                 journal: Optional[Journal] = None,
+                 metadata_workers: int = 1,
+                 queue_size: int = QUEUE_SIZE,
+                 metrics: Optional[Metrics] = None,
+                 profile_path: Optional[str] = None):
         self.src_path = src_path
         self.dst_path = dst_path
         self.method = method
         self.conflict_resolve_method = conflict_resolve_method
         self.cleanup_option = cleanup_option
+        self.workers = max(workers, 1)
+        self.device_limits = device_limits
+        self.keep_order = keep_order
+        self.processes = processes
+        self.cache = cache
+        self.classification_method = classification_method
+        self.duplicates_option = duplicates_option
+        self.hash_cache = hash_cache
+        self.journal = journal
+        self.metadata_workers = max(metadata_workers, 1)
+        self.queue_size = queue_size
+        self.metrics = metrics
+        # throughput of the last run of events()
+        self.progress = Progress()
+        self.profile_path = profile_path
+
+        self._manifest: Optional[List[str]] = None
 
-        self.path_structure: List[Tuple[Text, Set[Text]]] = []
-        for part in path_format.split(PATH_DELIMITER):
-            self.path_structure.append(
-                (part, set(re.findall(TAG_PATTERN, part))))
+        self._path_locks = [
+            threading.Lock() for _ in range(PATH_LOCKS_COUNT)]
+        self._cleaner = FolderCleaner(src_path)
+        self._folders = FolderCache(metrics=metrics)
+        self._postponed_removals: List[str] = []
+        self._removal_lock = threading.Lock()
+        self._duplicates: Optional[DuplicateFinder] = None
+        if duplicates_option != DuplicatesOptionEnum.KEEP:
+            self._duplicates = DuplicateFinder(dst_path, hash_cache)
+
+        self.path_renderer = PathRenderer(path_format)
+
+        # handlers are chosen once instead of doing it for every file
+        self._method_handler = self._get_method_handler(method)
+        self._conflict_handler = ConflictResolveMethodEnum.handlers()[
+            conflict_resolve_method]
+        self._cleanup_handler = FolderCleanupOptionsEnum.handlers()[
+            cleanup_option]
+        # empty source folders are kept while new files may come to them
+        self._is_watching = False
+
+        # state of stages, it is made anew for every run
+        self._extractor: Optional[MetadataExtractor] = None
+        self._limiter: Optional[DeviceLimiter] = None
+        self._dst_device = 0
+        self._metadata_batch = Batcher(BATCH_SIZE)
+        self._group_batch = Batcher(GROUP_SIZE)
+        self._plan_folders: Dict[str, DestinationFolder] = {}
+        self._plan_file: Optional[TextIO] = None
+        self._turns = DestinationTurns()
+        # pipeline taking detailed events, see _report_progress()
+        self._pipeline: Optional[Pipeline] = None
 
     def sort(self) -> Iterator[Tuple[bool, str]]:
         """
         Sort files from src_path and place them in dst_path
-        according to path_format
+        according to path_format.
+        Source folder is walked while files are sorted
+        unless it was walked already to count files.
+        Progress is updated with every sorted file
+        """
+        return _get_results(self._track_progress(
+            self._sort_events(self._get_entries())))
+
+    def sort_files(self, entries: Iterable[os.DirEntry]
+                   ) -> Iterator[Tuple[bool, str]]:
+        """ Sort only given files of src_path """
+        return _get_results(self._sort_events(entries))
+
+    def events(self) -> Iterator[SortEvent]:
+        """
+        Sort like sort() does, but tell when every file is started,
+        how many bytes of it are transferred, where it is placed
+        and why it failed. Progress is updated with every event
         """
-        for result in self._process_folder(self.src_path):
-            yield result
+        return self._track_progress(
+            self._sort_events(self._get_entries(), detailed=True))
+
+    def _track_progress(self, events: Iterator[SortEvent]
+                        ) -> Iterator[SortEvent]:
+        """ Update progress, totals are known if files were counted """
+        total_bytes = 0
+        if self._manifest is not None:
+            total_bytes = self.total_bytes
+        self.progress = Progress(len(self._manifest or ()), total_bytes)
+        try:
+            for event in events:
+                self.progress.update(event)
+                yield event
+        finally:
+            events.close()  # type: ignore
+
+    def _sort_events(self, entries: Iterable[os.DirEntry],
+                     detailed: bool = False) -> Iterator[SortEvent]:
+        """
+        Files go through stages running simultaneously:
+        scanning, gathering information, choosing folders,
+        placing and cleanup
+        """
+        return self._finish(self._run(entries, [
+            self._get_metadata_stage(),
+            Stage('planner', self._plan_folder, finish=self._flush_groups),
+            Stage('transfer', self._transfer, workers=self.workers),
+            self._get_cleanup_stage(),
+        ], detailed))
+
+    def watch(self, watcher: Watcher) -> Iterator[Tuple[bool, str]]:
+        """
+        Sort files of src_path, then sort new files as soon as they are
+        written until watcher is stopped. Watcher must be created before,
+        so files appearing while src_path is scanned aren't missed.
+        Empty source folders are removed only when watching stops,
+        folders just made by somebody uploading files are kept
+        """
+        self._is_watching = True
+        try:
+            for result in self.sort():
+                yield result
+            if self.journal is not None:
+                self.journal.compact()
+            for paths in watcher.batches():
+                # file written again at sorted path is sorted again
+                entries = [entry for entry in map(FileEntry, paths)
+                           if not self._is_placed(entry)]
+                for result in self.sort_files(entries):  # type: ignore
+                    yield result
+                if self.journal is not None:
+                    self.journal.compact()
+        finally:
+            self._is_watching = False
+            with get_timer(self.metrics, 'cleanup'):
+                self._cleaner.cleanup()
+
+    def plan(self, plan_file: TextIO) -> Iterator[Tuple[bool, str]]:
+        """
+        Decide what to do with every file without touching dst_path
+        and write decisions to plan_file as JSON Lines
+        """
+        # names folders will have, folders may not exist yet
+        self._plan_folders = {}
+        self._plan_file = plan_file
+        return _get_results(self._finish(self._run(self._get_entries(), [
+            self._get_metadata_stage(),
+            Stage('planner', self._plan_task),
+        ])))
+
+    def execute(self, plan_file: TextIO) -> Iterator[Tuple[bool, str]]:
+        """
+        Do what plan written by plan() says.
+        Progress is updated with every placed file
+        """
+        entries = read_plan(plan_file)
+        if self.journal is not None:
+            entries = (entry for entry in entries
+                       if not self._is_placed(FileEntry(entry.src)))
+        self._turns = DestinationTurns()
+        tasks = (self._get_plan_task(i, entry)
+                 for i, entry in enumerate(entries))
+        return _get_results(self._track_progress(self._finish(
+            self._run_tasks(tasks, [
+                Stage('transfer', self._execute_task, workers=self.workers),
+                self._get_cleanup_stage(),
+            ]))))
+
+    def _get_plan_task(self, index: int, entry: PlanEntry) -> Task:
+        task = Task(index, plan_entry=entry)
+        task.turn = self._turns.get_turn(entry.dst)
+        return task
+
+    def _finish(self, events: Iterator[SortEvent]
+                ) -> Iterator[SortEvent]:
+        """ Yield events and release everything when they end """
+        if self.journal is not None:
+            # finish what interrupted run left
+            for file_path in self.journal.recover():
+                self._postpone_removal(file_path)
+        try:
+            try:
+                for event in events:
+                    yield event
+            finally:
+                # threads of stages must be stopped before everything
+                # they use is released
+                events.close()  # type: ignore
+        finally:
+            # copies of these files are complete already
+            self._remove_sources()
+            if not self._is_watching:
+                with get_timer(self.metrics, 'cleanup'):
+                    self._cleaner.cleanup()
+            self._folders.close()
+            if self.cache is not None:
+                self.cache.flush()
+            if self.hash_cache is not None:
+                self.hash_cache.flush()
+            if self.journal is not None:
+                self.journal.sync()
+
+    @property
+    def manifest(self) -> List[str]:
+        """
+        Paths of all files to sort, source folder is walked only once.
+        Only paths are kept, entries with their stats are made again
+        while files are sorted, so counting huge folder costs little memory.
+        Files placed by interrupted run are skipped
+        """
+        if self._manifest is None:
+            self._manifest = [entry.path for entry in self._scan()]
+        return self._manifest
+
+    @property
+    def total(self) -> int:
+        """ Count of files to sort """
+        return len(self.manifest)
+
+    @property
+    def total_bytes(self) -> int:
+        """ Size of files to sort """
+        total = 0
+        for path in self.manifest:
+            try:
+                total += os.stat(path).st_size
+            except OSError:
+                pass
+        return total
 
     def validate_paths(self) -> Tuple[bool, str]:
         """ Check correctness of paths """
@@ -67,58 +381,450 @@ class Sorter:
             return False, _('Destination folder path is not valid')
         return True, ''
 
-    def _process_folder(self, folder_path: str) -> Iterator[Tuple[bool, str]]:
-        """ Process folder """
-        if not os.path.isdir(folder_path):
-            return
-        for name in os.listdir(folder_path):
-            current_path = os.path.join(folder_path, name)
-            if os.path.isfile(current_path):
+    def _get_entries(self) -> Iterable[os.DirEntry]:
+        """ Counted files or files found while source folder is walked """
+        if self._manifest is not None:
+            return map(FileEntry, self._manifest)  # type: ignore
+        return self._scan()
+
+    def _scan(self) -> Iterator[os.DirEntry]:
+        """ Files of src_path except ones placed by interrupted run """
+        return (entry for entry in scan(self.src_path)
+                if not self._is_placed(entry))
+
+    def _is_placed(self, entry: os.DirEntry) -> bool:
+        """ File was placed by interrupted run and it wasn't changed since """
+        if self.journal is None:
+            return False
+        try:
+            return self.journal.is_done(entry.path, entry.stat())
+        except OSError:
+            return False
+
+    def _run(self, entries: Iterable[os.DirEntry], stages: List[Stage],
+             detailed: bool = False) -> Iterator[SortEvent]:
+        return self._run_tasks(
+            (Task(i, entry) for i, entry in enumerate(entries)), stages,
+            detailed)
+
+    def _run_tasks(self, tasks: Iterable[Task], stages: List[Stage],
+                   detailed: bool = False) -> Iterator[SortEvent]:
+        """
+        Pass tasks through stages. Count of tasks in work is limited,
+        so files are never read far ahead of the ones being placed.
+        Only finishing of files is told unless detailed events are wanted
+        """
+        self._limiter = None
+        if self.workers > 1:
+            self._limiter = DeviceLimiter(self.workers, self.device_limits)
+            self._dst_device = get_device(self.dst_path)
+        # partly filled batches must not hold all tasks
+        max_pending = (2 * (BATCH_SIZE + GROUP_SIZE) +
+                       self.workers * TASKS_PER_WORKER)
+        pipeline = Pipeline(stages, self.queue_size, max_pending,
+                            self.metrics, self.profile_path is not None)
+        order_key = (lambda task: task.index) if self.keep_order else None
+        self._pipeline = pipeline if detailed else None
+
+        if self.processes > 0:
+            self._extractor = MetadataExtractor(
+                self.processes, self.classification_method, self.metrics)
+        try:
+            with self._extractor or nullcontext():
+                items = pipeline.run(tasks, order_key)
                 try:
-                    self._process_file(current_path)
-                except Exception as e:  # TODO specify kinds of error
-                    logger.error(traceback.format_exc())
-                    yield False, current_path
-                else:
-                    yield True, current_path
-            elif os.path.isdir(current_path):
-                for result in self._process_folder(current_path):
-                    yield result
+                    for item in items:
+                        if isinstance(item, SortEvent):
+                            # started file or progress of its transfer
+                            yield item
+                            continue
+                        if self.metrics is not None:
+                            self.metrics.count(
+                                'files_done' if item.result[0] else
+                                'files_failed')
+                        yield item.to_event()
+                finally:
+                    # stages may still use processes of extractor
+                    items.close()
+        finally:
+            self._extractor = None
+            self._pipeline = None
+            if self.profile_path is not None:
+                pipeline.dump_profiles(self.profile_path)
 
-    def _process_file(self, file_path: str) -> None:
-        """ Process file """
-        # defining type of file
-        file_type: Optional[MyEnum] = None
-        if magic is not None:
-            mime_info = magic.from_file(file_path, mime=True) or ''
+    def _get_metadata_stage(self) -> Stage:
+        workers = self.metadata_workers
+        if self.processes > 0:
+            # every thread waits for its batch handled in some process
+            workers = self.processes * BATCHES_PER_PROCESS
+        return Stage('metadata', self._read_metadata, workers=workers,
+                     finish=self._flush_metadata)
+
+    def _get_cleanup_stage(self) -> Stage:
+        return Stage('cleanup', self._cleanup)
+
+    def _read_metadata(self, task: Task) -> List[Task]:
+        """ Gather information about file unless cache knows it """
+        task.info = self._get_cached_info(task.entry)  # type: ignore
+        if task.info is None and self._extractor is not None:
+            return self._extract_batch(self._metadata_batch.add(task))
+        self._make_file(task)
+        return [task]
+
+    def _flush_metadata(self) -> List[Task]:
+        return self._extract_batch(self._metadata_batch.take())
+
+    def _extract_batch(self, tasks: List[Task]) -> List[Task]:
+        """ Gather information about files in pool of processes """
+        if not tasks:
+            return tasks
+        infos = self._extractor.extract(  # type: ignore
+            [task.entry.path for task in tasks])  # type: ignore
+        for task, info in zip(tasks, infos):
+            task.info = info
+            self._save_info(task.entry, info)  # type: ignore
+            self._make_file(task)
+        return tasks
+
+    def _make_file(self, task: Task):
+        try:
+            with get_timer(self.metrics, 'metadata'):
+                task.file_obj = self._get_file(
+                    task.entry, task.info)  # type: ignore
+        except Exception as e:  # TODO specify kinds of error
+            task.fail(e)
+
+    def _plan_folder(self, task: Task) -> List[Task]:
+        """ Choose folder for file, files are grouped by folders """
+        if task.result is None:
+            try:
+                task.folder_path = self._get_folder_path(
+                    task.file_obj)  # type: ignore
+            except Exception as e:  # TODO specify kinds of error
+                task.fail(e)
+        return self._group(self._group_batch.add(task))
+
+    def _flush_groups(self) -> List[Task]:
+        return self._group(self._group_batch.take())
+
+    @staticmethod
+    def _group(tasks: List[Task]) -> List[Task]:
+        """
+        Put files going to the same folder together,
+        so folder is opened once for all of them
+        """
+        failed = []
+        groups: Dict[str, List[Task]] = {}
+        for task in tasks:
+            if task.result is not None:
+                failed.append(task)
+            else:
+                groups.setdefault(task.folder_path, []).append(task)
+        for group in groups.values():
+            failed.extend(group)
+        return failed
+
+    def _transfer(self, task: Task) -> List[Task]:
+        """ Place file into its folder """
+        if task.result is None:
+            file_obj: File = task.file_obj  # type: ignore
+            try:
+                task.size = file_obj.stat.st_size
+                with self._hold_devices(file_obj.stat.st_dev), \
+                        self._folders.open(task.folder_path) as folder, \
+                        self._report_progress(task):
+                    self._place_path(task, folder)
+            except Exception as e:  # TODO specify kinds of error
+                task.fail(e)
+        return [task]
+
+    def _execute_task(self, task: Task) -> List[Task]:
+        """ Do what plan says about file """
+        entry: PlanEntry = task.plan_entry  # type: ignore
+        with self._turns.wait(entry.dst, task.turn):
+            try:
+                stat = os.stat(entry.src)
+            except OSError as e:
+                task.fail(e)
+                return [task]
+            task.size = stat.st_size
+            with self._hold_devices(stat.st_dev), \
+                    self._report_progress(task):
+                self._execute_entry(task, stat)
+        return [task]
+
+    def _report_progress(self, task: Task):
+        """
+        Tell that file is started and how much of it is copied,
+        if somebody waits for that
+        """
+        pipeline = self._pipeline
+        if pipeline is None:
+            return nullcontext()
+        pipeline.send(SortEvent(EventKindEnum.STARTED, task.path, task.size))
+
+        def _send(copied: int):
+            # the end of file is told by finishing event
+            if copied < task.size:
+                pipeline.send(SortEvent(  # type: ignore
+                    EventKindEnum.PROGRESS, task.path, task.size, copied))
+        return report_progress(_send)
+
+    def _cleanup(self, task: Task) -> List[Task]:
+        """ Remove sources of files moved to other device by batches """
+        if len(self._postponed_removals) >= REMOVAL_BATCH_SIZE:
+            self._remove_sources()
+        return [task]
+
+    def _hold_devices(self, src_device: int):
+        """
+        Wait until devices of source and destination
+        may take one more operation
+        """
+        if self._limiter is None:
+            return nullcontext()
+        return self._limiter.hold(src_device, self._dst_device)
+
+    def _get_cached_info(self, entry: os.DirEntry) -> Optional[FileInfo]:
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(
+                entry.path, entry.stat(), self.classification_method)
+        except OSError:
+            return None
+
+    def _save_info(self, entry: os.DirEntry, info: FileInfo):
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(entry.stat(), info, self.classification_method)
+        except OSError:
+            pass
+
+    def _place_path(self, task: Task, folder: DestinationFolder):
+        """ Place file catching errors """
+        file_obj: File = task.file_obj  # type: ignore
+        try:
+            with get_timer(self.metrics, 'place'):
+                task.dst_path, task.conflict_action = self._process_file(
+                    file_obj.path, folder, file_obj.stat)
+        except Exception as e:  # TODO specify kinds of error
+            task.fail(e)
+            return
+        task.result = True, file_obj.path
+
+    def _get_file(self, entry: os.DirEntry,
+                  info: Optional[FileInfo]) -> File:
+        """ Gather information about file or restore it if it is ready """
+        if info is None:
+            file_obj = get_file(
+                entry.path, entry.stat(), self.classification_method,
+                self.metrics)
+            self._save_info(entry, file_obj.to_info())
+            return file_obj
+        if info.error:
+            raise MetadataError(info.error)
+        cls = ContentTypesEnum.get_class(info.content_type)
+        return cls.from_info(info, entry.stat())
+
+    def _get_folder_path(self, file_obj: File) -> str:
+        """ Construct path of folder file must be placed in """
+        with get_timer(self.metrics, 'render'):
+            return os.path.join(
+                self.dst_path, *self.path_renderer.render(file_obj))
+
+    def _plan_task(self, task: Task) -> List[Task]:
+        """ Decide what to do with file and write it to plan """
+        entry: os.DirEntry = task.entry  # type: ignore
+        if task.result is not None:
+            return [task]
+        try:
+            folder_path = self._get_folder_path(
+                task.file_obj)  # type: ignore
+            folder = self._plan_folders.get(folder_path)
+            if folder is None:
+                folder = DestinationFolder(folder_path)
+                self._plan_folders[folder_path] = folder
+            conflict_action = self._plan_conflict(entry.path, folder)
+        except Exception as e:  # TODO specify kinds of error
+            task.fail(e)
+            return [task]
+        task.dst_path = folder.join(os.path.basename(entry.path))
+        task.conflict_action = conflict_action
+        write_entry(self._plan_file, PlanEntry(  # type: ignore
+            entry.path, task.dst_path, get_operation(self.method),
+            conflict_action))
+        task.result = True, entry.path
+        return [task]
+
+    def _plan_conflict(self, file_path: str,
+                       folder: DestinationFolder) -> str:
+        """ Decide what conflict resolving will do, remember new names """
+        new_file_name = os.path.basename(file_path)
+        if not folder.exists(new_file_name):
+            folder.add(new_file_name)
+            return NO_CONFLICT
+        if self.conflict_resolve_method == ConflictResolveMethodEnum.SAVE_ALL:
+            # file already there will be renamed
+            folder.add(folder.get_free_name(new_file_name))
+        return CONFLICT_ACTIONS[self.conflict_resolve_method]
+
+    def _execute_entry(self, task: Task,
+                       stat: Optional[os.stat_result] = None):
+        """ Do what plan says about file catching errors """
+        entry: PlanEntry = task.plan_entry  # type: ignore
+        try:
+            if os.path.basename(entry.dst) != os.path.basename(entry.src):
+                raise ValueError(
+                    f'Files can\'t be renamed by plan: {entry.dst}')
+            method = get_method(entry.operation)
+            conflict_method = get_conflict_method(entry.conflict_action)
+            with self._folders.open(os.path.dirname(entry.dst)) as folder, \
+                    get_timer(self.metrics, 'place'):
+                task.dst_path, task.conflict_action = self._process_file(
+                    entry.src, folder, stat, method=method,
+                    conflict_method=conflict_method)
+        except Exception as e:  # TODO specify kinds of error
+            task.fail(e)
+            return
+        task.result = True, entry.src
+
+    def _process_file(self, file_path: str, folder: DestinationFolder,
+                      stat: Optional[os.stat_result] = None,
+                      method: Optional[MyEnum] = None,
+                      conflict_method: Optional[MyEnum] = None
+                      ) -> Tuple[str, str]:
+        """
+        Process file. Method and conflict resolve method of sorter
+        are used unless others are given.
+        Returns path file got and what was done with conflict
+        """
+        method_handler = self._method_handler
+        if method is None:
+            method = self.method
+        elif method != self.method:
+            method_handler = self._get_method_handler(method)
+        conflict_handler = self._conflict_handler
+        if conflict_method is None:
+            conflict_method = self.conflict_resolve_method
+        elif conflict_method != self.conflict_resolve_method:
+            conflict_handler = ConflictResolveMethodEnum.handlers()[
+                conflict_method]
+        new_file_name = os.path.basename(file_path)
+        new_file_path = folder.join(new_file_name)
+
+        # journal and duplicates finder recognize files by stat
+        if stat is None and (
+                self.journal is not None or self._duplicates is not None):
+            stat = os.stat(file_path)
+        # files with same size are checked for duplicates one by one
+        size_lock = nullcontext()  # type: ignore
+        if self._duplicates is not None:
+            size_lock = self._duplicates.get_lock(
+                stat.st_size)  # type: ignore
+
+        # files with same name must not be placed simultaneously
+        with size_lock, self._get_path_lock(new_file_path):
+            duplicate_path, hashes = None, {}
+            if self._duplicates is not None:
+                with get_timer(self.metrics, 'duplicates', False):
+                    duplicate_path, hashes = self._duplicates.find(
+                        file_path, stat)
+                if duplicate_path is not None and (
+                        duplicate_path == new_file_path or
+                        self.duplicates_option == DuplicatesOptionEnum.SKIP):
+                    if self.metrics is not None:
+                        self.metrics.count('duplicates_skipped')
+                    if self.journal is not None:
+                        self.journal.done(file_path, stat)  # type: ignore
+                    return duplicate_path, SKIPPED_DUPLICATE
+
+            # resolving conflict if file already exists, free names
+            # of other files being placed can't be taken by renaming
+            conflict_action = NO_CONFLICT
+            with get_timer(self.metrics, 'conflict', False), folder.lock:
+                if folder.exists(new_file_name):
+                    conflict_action = CONFLICT_ACTIONS[conflict_method]
+                conflict_handler(file_path, folder, self._duplicates)
+                folder.add(new_file_name)
+
+            if self.journal is not None:
+                self.journal.start(
+                    file_path, new_file_path, get_operation(method),
+                    stat)  # type: ignore
+
+            # doing main job
             try:
-                file_type = ContentTypesEnum(mime_info.split('/')[0])
-            except ValueError:
-                file_type = ContentTypesEnum.get_default()
-        cls = ContentTypesEnum.get_class(file_type)
-        file_obj = cls(file_path, file_type)
-
-        # constructing file's new path
-        new_path_parts = [self.dst_path]
-        for lvl, lvl_tags in self.path_structure:
-            lvl = TagProcessor.process_string(
-                file_obj=file_obj, string=lvl, tags=lvl_tags)
-            new_path_parts.append(lvl)
-
-        new_file_dir = os.path.join(*new_path_parts)
-
-        if not os.path.exists(new_file_dir):
-            os.makedirs(new_file_dir)
-
-        # resolving conflict if file already exists
-        handler = ConflictResolveMethodEnum.handlers()[
-            self.conflict_resolve_method]
-        handler(file_path, new_file_dir)
-
-        # doing main job
-        handler = SortMethodEnum.handlers()[self.method]
-        handler(file_path, new_file_dir)
-
-        # delete empty old folder if needed
-        handler = FolderCleanupOptionsEnum.handlers()[self.cleanup_option]
-        handler(file_path, new_file_dir)
+                with get_timer(self.metrics, 'transfer', False):
+                    if duplicate_path is None or not self._link_duplicate(
+                            file_path, new_file_path, duplicate_path,
+                            method):
+                        method_handler(file_path, folder)
+            except BaseException:
+                with folder.lock:
+                    folder.discard(new_file_name)
+                raise
+            if self.metrics is not None and stat is not None:
+                self.metrics.count('bytes', stat.st_size)
+            if self.journal is not None:
+                self.journal.done(file_path, stat)  # type: ignore
+
+            if self._duplicates is not None:
+                self._duplicates.add(
+                    new_file_path, stat.st_size, hashes)  # type: ignore
+
+        # remember old folder to delete it later if it becomes empty
+        self._cleanup_handler(file_path, self._cleaner)
+        return new_file_path, conflict_action
+
+    def _link_duplicate(self, file_path: str, new_file_path: str,
+                        duplicate_path: str, method: MyEnum) -> bool:
+        """ Place link to file with same content instead of file itself """
+        try:
+            os.link(duplicate_path, new_file_path)
+        except OSError:
+            # file system doesn't support hard links
+            logger.warning(traceback.format_exc())
+            return False
+        if method == SortMethodEnum.MOVE:
+            os.remove(file_path)
+        return True
+
+    def _get_method_handler(self, method: MyEnum) -> Callable:
+        handler = SortMethodEnum.handlers()[method]
+        if method == SortMethodEnum.MOVE:
+            # sources of files copied to other device are removed in batches
+            handler = partial(handler, remove_source=self._postpone_removal)
+        return handler
+
+    def _postpone_removal(self, file_path: str):
+        """ Remember source to remove it later, see _cleanup() """
+        with self._removal_lock:
+            self._postponed_removals.append(file_path)
+
+    def _remove_sources(self):
+        """ Remove sources of files moved to other device """
+        with self._removal_lock:
+            file_paths = self._postponed_removals
+            self._postponed_removals = []
+        for file_path in file_paths:
+            try:
+                with get_timer(self.metrics, 'remove_source'):
+                    os.remove(file_path)
+                self._cleanup_handler(file_path, self._cleaner)
+            except OSError:
+                logger.error(traceback.format_exc())
+
+    def _get_path_lock(self, path: str) -> threading.Lock:
+        return self._path_locks[hash(path) % PATH_LOCKS_COUNT]
+
+
+def _get_results(events: Iterator[SortEvent]) -> Iterator[Tuple[bool, str]]:
+    """ Results as they were before events, only finished files are told """
+    try:
+        for event in events:
+            if event.kind == EventKindEnum.FINISHED:
+                yield event.is_done, event.path
+    finally:
+        events.close()  # type: ignore
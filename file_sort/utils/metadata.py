@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .enums import ClassificationMethodEnum, ContentTypesEnum, MyEnum
+from .file_classes import File, FileInfo
+from .header import HeaderReader
+from .metrics import Metrics, get_timer
+
+logger = logging.getLogger(__name__)
+
+
+try:
+    import magic  # type: ignore
+except ImportError:
+    logger.warning('libmagic isn`t installed')
+    magic = None
+
+
+# how many files are sent to worker process at once
+BATCH_SIZE = 64
+# how many batches may be given to every process at once
+BATCHES_PER_PROCESS = 2
+
+# extensions which almost always mean the same content type,
+# ambiguous ones (ogg, 3gp, ts, ...) are always checked by content
+EXTENSION_CONTENT_TYPES: Dict[str, MyEnum] = {
+    **dict.fromkeys(
+        ('jpg', 'jpeg', 'jpe', 'png', 'gif', 'bmp', 'tif', 'tiff', 'webp',
+         'heic', 'heif', 'cr2', 'nef', 'arw', 'dng', 'orf', 'rw2'),
+        ContentTypesEnum.IMAGE),
+    **dict.fromkeys(
+        ('mp4', 'm4v', 'mov', 'avi', 'mkv', 'wmv', 'mpg', 'mpeg', 'mts',
+         'm2ts', 'flv', 'webm'),
+        ContentTypesEnum.VIDEO),
+    **dict.fromkeys(
+        ('mp3', 'wav', 'flac', 'm4a', 'aac', 'wma', 'aiff', 'opus'),
+        ContentTypesEnum.AUDIO),
+    **dict.fromkeys(
+        ('txt', 'csv', 'log', 'md', 'rst', 'ini'),
+        ContentTypesEnum.TEXT),
+}
+# how many first files of every extension are checked by content
+SAMPLE_SIZE = 5
+# every n-th file of trusted extension is checked by content
+CHECK_INTERVAL = 100
+
+
+def get_mime_content_type(reader: HeaderReader) -> Optional[MyEnum]:
+    """ Define type of file by its content """
+    file_type: Optional[MyEnum] = None
+    if magic is not None:
+        mime_info = magic.from_buffer(reader.header, mime=True) or ''
+        try:
+            file_type = ContentTypesEnum(mime_info.split('/')[0])
+        except ValueError:
+            file_type = ContentTypesEnum.get_default()
+    return file_type
+
+
+class ExtensionClassifier:
+    """
+    Defines type of file by its extension, content is checked only
+    for unknown extensions and for some samples of known ones.
+    Extension is not trusted anymore once sample content disagrees with it
+    """
+    def __init__(self):
+        self._seen: Dict[str, int] = {}
+        self._distrusted = set()
+        self._lock = threading.Lock()
+
+    def get_content_type(self, reader: HeaderReader) -> Optional[MyEnum]:
+        extension = os.path.splitext(reader.path)[1].strip('.').lower()
+        file_type = EXTENSION_CONTENT_TYPES.get(extension)
+        if file_type is None or magic is None:
+            return file_type or get_mime_content_type(reader)
+
+        with self._lock:
+            if extension in self._distrusted:
+                need_check, trusted = True, False
+            else:
+                seen = self._seen.get(extension, 0)
+                self._seen[extension] = seen + 1
+                need_check = (
+                    seen < SAMPLE_SIZE or seen % CHECK_INTERVAL == 0)
+                trusted = True
+        if not need_check:
+            return file_type
+
+        mime_type = get_mime_content_type(reader)
+        if trusted and mime_type != file_type:
+            logger.info(f'Extension {extension} is not trusted anymore')
+            with self._lock:
+                self._distrusted.add(extension)
+        return mime_type
+
+
+_extension_classifier = ExtensionClassifier()
+
+
+def get_content_type(reader: HeaderReader,
+                     method: MyEnum = ClassificationMethodEnum.CONTENT
+                     ) -> Optional[MyEnum]:
+    """ Define type of file with chosen method """
+    if method == ClassificationMethodEnum.EXTENSION:
+        return _extension_classifier.get_content_type(reader)
+    return get_mime_content_type(reader)
+
+
+def get_file(file_path: str, stat: Optional[os.stat_result] = None,
+             method: MyEnum = ClassificationMethodEnum.CONTENT,
+             metrics: Optional[Metrics] = None) -> File:
+    """
+    Gather all information about file,
+    file is opened once at most and its header is read once
+    """
+    with HeaderReader(file_path) as reader:
+        with get_timer(metrics, 'classify', False):
+            file_type = get_content_type(reader, method)
+        cls = ContentTypesEnum.get_class(file_type)
+        with get_timer(metrics, 'read_date', False):
+            return cls(file_path, file_type, _stat=stat, _reader=reader)
+
+
+def extract_metadata(paths: List[str], method: MyEnum,
+                     gather_metrics: bool = False
+                     ) -> Tuple[List[FileInfo], Optional[Metrics]]:
+    """
+    Gather information about batch of files, runs in worker process.
+    Metrics of batch are returned to be merged with metrics of sorting
+    """
+    metrics = Metrics() if gather_metrics else None
+    result = []
+    for path in paths:
+        try:
+            info = get_file(path, method=method, metrics=metrics).to_info()
+        except Exception:
+            info = FileInfo(path, None, '', datetime.min,
+                            traceback.format_exc())
+        result.append(info)
+    return result, metrics
+
+
+class MetadataExtractor:
+    """ Gathers information about files in pool of processes """
+    def __init__(self, processes: int,
+                 method: MyEnum = ClassificationMethodEnum.CONTENT,
+                 metrics: Optional[Metrics] = None):
+        self.processes = processes
+        self.method = method
+        self.metrics = metrics
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'MetadataExtractor':
+        self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self
+
+    def __exit__(self, *args):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def extract(self, paths: List[str]) -> List[FileInfo]:
+        """
+        Gather information about batch of files in one of processes,
+        results are in the same order as paths
+        """
+        infos, metrics = self._executor.submit(  # type: ignore
+            extract_metadata, paths, self.method,
+            self.metrics is not None).result()
+        if metrics is not None:
+            self.metrics.merge(metrics)  # type: ignore
+        return infos
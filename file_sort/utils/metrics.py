@@ -0,0 +1,223 @@
+import bisect
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# upper bounds of latency histogram buckets, seconds
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+# prefix of names of exported Prometheus metrics
+PROMETHEUS_PREFIX = 'file_sort'
+
+
+class Histogram:
+    """ Latencies of one stage counted by buckets """
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        # the last bucket is for everything longer than BUCKETS
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'Histogram'):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """ Upper bound of bucket where quantile falls """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if i < len(BUCKETS):
+                    return min(BUCKETS[i], self.max)
+                return self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class _Timer:
+    """
+    Measures time of block, exception leaving block is counted
+    unless timer is inside other one which counts it
+    """
+    __slots__ = ('metrics', 'stage', 'count_errors', 'start')
+
+    def __init__(self, metrics: 'Metrics', stage: str,
+                 count_errors: bool = True):
+        self.metrics = metrics
+        self.stage = stage
+        self.count_errors = count_errors
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None and self.count_errors:
+            self.metrics.error(self.stage, exc_type)
+
+
+class Metrics:
+    """
+    Latencies of sorting stages, counters of files and bytes
+    and counts of errors by their classes. Can be gathered in other
+    process and merged, summary is exported as JSON or Prometheus text
+    """
+    def __init__(self):
+        self.started = time.time()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def time(self, stage: str, count_errors: bool = True) -> _Timer:
+        """ Context manager measuring stage """
+        return _Timer(self, stage, count_errors)
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def error(self, stage: str, error_class: type):
+        key = (stage, error_class.__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def merge(self, other: 'Metrics'):
+        """ Add everything other metrics have gathered """
+        with self._lock:
+            for stage, histogram in other._histograms.items():
+                if stage not in self._histograms:
+                    self._histograms[stage] = Histogram()
+                self._histograms[stage].merge(histogram)
+            for name, value in other._counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            for key, count in other._errors.items():
+                self._errors[key] = self._errors.get(key, 0) + count
+
+    def summary(self) -> Dict:
+        with self._lock:
+            elapsed = time.time() - self.started
+            return {
+                'elapsed': elapsed,
+                'stages': {stage: histogram.to_dict() for stage, histogram
+                           in sorted(self._histograms.items())},
+                'counters': dict(sorted(self._counters.items())),
+                'errors': [
+                    {'stage': stage, 'error': error, 'count': count}
+                    for (stage, error), count
+                    in sorted(self._errors.items())],
+            }
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_prometheus(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.prometheus_lines()) + '\n')
+
+    def prometheus_lines(self) -> List[str]:
+        """ Metrics in Prometheus text exposition format """
+        name = f'{PROMETHEUS_PREFIX}_stage_duration_seconds'
+        lines = [
+            f'# HELP {name} Time spent in sorting stages.',
+            f'# TYPE {name} histogram',
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (None,), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound is None else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage}",'
+                                 f'le="{le}"}} {cumulative}')
+                lines.append(
+                    f'{name}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(
+                    f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            for counter, value in sorted(self._counters.items()):
+                counter_name = f'{PROMETHEUS_PREFIX}_{counter}_total'
+                lines.append(f'# TYPE {counter_name} counter')
+                lines.append(f'{counter_name} {value!r}')
+
+            name = f'{PROMETHEUS_PREFIX}_errors_total'
+            lines.append(f'# HELP {name} Errors by stage and class.')
+            lines.append(f'# TYPE {name} counter')
+            for (stage, error), count in sorted(self._errors.items()):
+                lines.append(
+                    f'{name}{{stage="{stage}",error="{error}"}} {count}')
+        return lines
+
+
+def get_timer(metrics: Optional[Metrics], stage: str,
+              count_errors: bool = True):
+    """
+    Timer of stage, it does nothing if metrics are not gathered.
+    Timers inside other ones must not count errors, otherwise
+    the same error is counted by every timer it leaves
+    """
+    if metrics is None:
+        return _NO_TIMER
+    return metrics.time(stage, count_errors)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NO_TIMER = _NoTimer()
@@ -0,0 +1,253 @@
+import cProfile
+import os
+import pstats
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .metrics import Metrics, get_timer
+
+# how many items may wait between two stages
+QUEUE_SIZE = 64
+# how many items may be inside pipeline at once
+MAX_PENDING = 1024
+# how often blocked threads check whether pipeline is stopped, seconds
+POLL_INTERVAL = 0.1
+
+# marks end of items in queue
+_END = object()
+
+
+class _Message:
+    """ Item given to caller right away, see Pipeline.send() """
+    __slots__ = ('item',)
+
+    def __init__(self, item: Any):
+        self.item = item
+
+
+class PipelineStopped(Exception):
+    """ Pipeline was stopped while thread waited """
+
+
+class Stage:
+    """
+    Step of pipeline. Handler is called for every item by several threads
+    and returns items for the next stage, it may keep items and give
+    them later. Finish is called once after the last item and returns
+    everything kept
+    """
+    def __init__(self, name: str, handler: Callable[[Any], Iterable[Any]],
+                 workers: int = 1,
+                 finish: Optional[Callable[[], Iterable[Any]]] = None):
+        self.name = name
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.finish = finish or (lambda: ())
+
+
+class Batcher:
+    """ Collects items given by several threads into batches """
+    def __init__(self, size: int):
+        self.size = size
+        self._items: List[Any] = []
+        self._lock = threading.Lock()
+
+    def add(self, item: Any) -> List[Any]:
+        """ Keep item, return batch once it is full """
+        with self._lock:
+            self._items.append(item)
+            if len(self._items) < self.size:
+                return []
+            return self._take()
+
+    def take(self) -> List[Any]:
+        """ Return everything kept """
+        with self._lock:
+            return self._take()
+
+    def _take(self) -> List[Any]:
+        items, self._items = self._items, []
+        return items
+
+
+class Pipeline:
+    """
+    Stages run simultaneously in their own threads and are connected
+    by bounded queues, so a slow stage holds back the ones before it.
+    Count of items inside pipeline is limited as well, so source is never
+    read far ahead of results. Every source item must give exactly one
+    result, results are yielded in thread of caller
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = QUEUE_SIZE,
+                 max_pending: int = MAX_PENDING,
+                 metrics: Optional[Metrics] = None,
+                 profile: bool = False):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.profile = profile
+        # profiles of every thread by names of stages
+        self.profiles: Dict[str, List[cProfile.Profile]] = {}
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._pending = threading.Semaphore(max_pending)
+        self._remaining: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._queues: List[queue.Queue] = []
+
+    def run(self, source: Iterable[Any],
+            order_key: Optional[Callable[[Any], int]] = None
+            ) -> Iterator[Any]:
+        """
+        Pass source items through all stages and yield results.
+        If order_key is given, results are yielded in order of their keys,
+        which must be 0, 1, 2...
+        """
+        queues: List[queue.Queue] = [
+            queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        self._queues = queues
+        threads = [threading.Thread(
+            target=self._feed, args=(source, queues[0]), name='source',
+            daemon=True)]
+        for i, stage in enumerate(self.stages):
+            self._remaining[i] = stage.workers
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(i, queues[i], queues[i + 1]),
+                    name=f'{stage.name}-{n}', daemon=True))
+        for thread in threads:
+            thread.start()
+
+        # results waiting for earlier ones
+        early: Dict[int, Any] = {}
+        next_key = 0
+        try:
+            while True:
+                try:
+                    item = self._get(queues[-1])
+                except PipelineStopped:
+                    break
+                if item is _END:
+                    break
+                if isinstance(item, _Message):
+                    yield item.item
+                    continue
+                if order_key is None:
+                    self._pending.release()
+                    yield item
+                    continue
+                early[order_key(item)] = item
+                while next_key in early:
+                    self._pending.release()
+                    yield early.pop(next_key)
+                    next_key += 1
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def send(self, item: Any):
+        """
+        Give item to caller of run() right away, past the rest of stages.
+        It is not a result, so it doesn't free place for a source item.
+        Item is dropped if pipeline is stopped
+        """
+        try:
+            self._put(self._queues[-1], _Message(item))
+        except PipelineStopped:
+            pass
+
+    def dump_profiles(self, folder_path: str):
+        """ Write profile of every stage to file named as stage """
+        os.makedirs(folder_path, exist_ok=True)
+        for name, profiles in self.profiles.items():
+            stats = pstats.Stats(*profiles)
+            stats.dump_stats(os.path.join(folder_path, f'{name}.prof'))
+
+    def _feed(self, source: Iterable[Any], output: queue.Queue):
+        try:
+            for item in source:
+                while not self._pending.acquire(timeout=POLL_INTERVAL):
+                    if self._stop.is_set():
+                        return
+                self._put(output, item)
+            self._put(output, _END)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _work(self, index: int, input: queue.Queue, output: queue.Queue):
+        stage = self.stages[index]
+        timer_name = f'stage.{stage.name}'
+        profile = cProfile.Profile() if self.profile else None
+        profiled = False
+        try:
+            while True:
+                item = self._get(input)
+                if item is _END:
+                    # other threads of stage must see it too
+                    self._put(input, _END)
+                    break
+                with get_timer(self.metrics, timer_name):
+                    enabled = profile is not None and _enable(profile)
+                    try:
+                        results = stage.handler(item)
+                    finally:
+                        if enabled:
+                            profile.disable()  # type: ignore
+                            profiled = True
+                for result in results:
+                    self._put(output, result)
+            with self._lock:
+                self._remaining[index] -= 1
+                is_last = not self._remaining[index]
+            if is_last:
+                for result in stage.finish():
+                    self._put(output, result)
+                self._put(output, _END)
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            if profiled:
+                with self._lock:
+                    self.profiles.setdefault(stage.name, []).append(
+                        profile)  # type: ignore
+
+    def _fail(self, error: BaseException):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _get(self, source: queue.Queue) -> Any:
+        while True:
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise PipelineStopped()
+
+    def _put(self, target: queue.Queue, item: Any):
+        while True:
+            try:
+                target.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                if self._stop.is_set():
+                    raise PipelineStopped()
+
+
+def _enable(profile: cProfile.Profile) -> bool:
+    """ Start profiling, only one profile may be active since Python 3.12 """
+    try:
+        profile.enable()
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,115 @@
+import json
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, TextIO
+
+from .destination import name_key
+from .enums import ConflictResolveMethodEnum, MyEnum, SortMethodEnum
+
+# conflict actions written to plan
+NO_CONFLICT = 'none'
+CONFLICT_ACTIONS = {
+    ConflictResolveMethodEnum.REPLACE: 'replace',
+    ConflictResolveMethodEnum.SAVE_ALL: 'rename',
+    ConflictResolveMethodEnum.DO_NOTHING: 'keep',
+}
+
+
+class PlanError(ValueError):
+    """ Plan file is broken """
+
+
+class PlanEntry(NamedTuple):
+    """ What is going to be done with one file """
+    src: str
+    dst: str
+    # name of sort method, e.g. "copy"
+    operation: str
+    # what happens to file already having dst path, e.g. "rename"
+    conflict_action: str
+
+
+def get_operation(method: MyEnum) -> str:
+    return method.name.lower()
+
+
+def get_method(operation: str) -> MyEnum:
+    try:
+        return SortMethodEnum[operation.upper()]
+    except KeyError:
+        raise PlanError(f'Unknown operation {operation}')
+
+
+def get_conflict_method(conflict_action: str) -> MyEnum:
+    """
+    Conflict resolve method doing planned action. If file appeared
+    where no conflict was planned, it is kept and the file is not placed
+    """
+    if conflict_action == NO_CONFLICT:
+        return ConflictResolveMethodEnum.DO_NOTHING
+    for method, action in CONFLICT_ACTIONS.items():
+        if action == conflict_action:
+            return method
+    raise PlanError(f'Unknown conflict action {conflict_action}')
+
+
+def write_entry(plan_file: TextIO, entry: PlanEntry):
+    plan_file.write(json.dumps(entry._asdict(), ensure_ascii=False))
+    plan_file.write('\n')
+
+
+def read_plan(plan_file: TextIO) -> Iterator[PlanEntry]:
+    """ Read plan line by line, so it may be of any size """
+    for line_number, line in enumerate(plan_file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield PlanEntry(**json.loads(line))
+        except (ValueError, TypeError) as e:
+            raise PlanError(f'Line {line_number} of plan is broken: {e}')
+
+
+def count_entries(plan_path: str) -> int:
+    with open(plan_path, encoding='utf-8') as plan_file:
+        return sum(1 for line in plan_file if line.strip())
+
+
+class DestinationTurns:
+    """
+    Entries of plan with the same destination depend on each other,
+    e.g. "none" is right only if it is done before "rename" of the same
+    name. They are executed in order of plan, others go as they like.
+    Only destinations having entries in work are remembered
+    """
+    def __init__(self):
+        # how many entries of destination are given out and done
+        self._given: Dict[str, int] = {}
+        self._done: Dict[str, int] = {}
+        self._condition = threading.Condition()
+
+    def get_turn(self, dst: str) -> int:
+        """ Called in order of plan for every entry """
+        key = name_key(dst)
+        with self._condition:
+            turn = self._given.get(key, 0)
+            self._given[key] = turn + 1
+        return turn
+
+    @contextmanager
+    def wait(self, dst: str, turn: int) -> Iterator[None]:
+        """ Block runs after entries of destination given before it """
+        key = name_key(dst)
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._done.get(key, 0) == turn)
+        try:
+            yield
+        finally:
+            with self._condition:
+                if self._given[key] == turn + 1:
+                    # nothing waits for destination
+                    del self._given[key]
+                    self._done.pop(key, None)
+                else:
+                    self._done[key] = turn + 1
+                    self._condition.notify_all()
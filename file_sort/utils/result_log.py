@@ -0,0 +1,110 @@
+import os
+import struct
+from collections import deque
+from typing import List, Optional
+
+# how many last lines are kept in memory, they are shown while sorting goes
+RECENT_SIZE = 1024
+# how many lines are read at once while log is searched
+SEARCH_CHUNK_SIZE = 4096
+
+# offset of every line in index file
+_OFFSET = struct.Struct('<Q')
+
+
+class ResultLog:
+    """
+    Lines kept in file, so count of them doesn't matter for memory.
+    Offsets of lines are kept in index file, so any page of lines
+    is read without reading the ones before it. Last lines are kept
+    in memory as well
+    """
+    def __init__(self, path: str, recent_size: int = RECENT_SIZE):
+        self.path = path
+        self.index_path = f'{path}.index'
+        self._data = open(path, 'w+b')
+        self._index = open(self.index_path, 'w+b')
+        self._count = 0
+        self._offset = 0
+        self._recent: deque = deque(maxlen=recent_size)
+        self._is_flushed = True
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, line: str):
+        line = line.replace('\n', ' ')
+        data = line.encode('utf-8', 'replace') + b'\n'
+        self._data.write(data)
+        self._index.write(_OFFSET.pack(self._offset))
+        self._offset += len(data)
+        self._count += 1
+        self._recent.append(line)
+        self._is_flushed = False
+
+    def get(self, start: int, count: int) -> List[str]:
+        """ Lines from start, the last ones are taken from memory """
+        start = max(start, 0)
+        stop = min(start + count, self._count)
+        if start >= stop:
+            return []
+        first_recent = self._count - len(self._recent)
+        if start >= first_recent:
+            return [self._recent[i - first_recent]
+                    for i in range(start, stop)]
+        return self._read(start, stop)
+
+    def find(self, text: str, start: int = 0) -> Optional[int]:
+        """ Number of first line from start containing text, case ignored """
+        text = text.lower()
+        while start < self._count:
+            lines = self.get(start, SEARCH_CHUNK_SIZE)
+            for i, line in enumerate(lines):
+                if text in line.lower():
+                    return start + i
+            start += len(lines)
+        return None
+
+    def filter(self, text: str, path: str) -> 'ResultLog':
+        """ New log written to path with lines containing text """
+        result = ResultLog(path, self._recent.maxlen)  # type: ignore
+        start = 0
+        text = text.lower()
+        while start < self._count:
+            lines = self.get(start, SEARCH_CHUNK_SIZE)
+            for line in lines:
+                if text in line.lower():
+                    result.append(line)
+            start += len(lines)
+        return result
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def remove(self):
+        """ Close log and remove its files """
+        self.close()
+        for path in (self.path, self.index_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _read(self, start: int, stop: int) -> List[str]:
+        if not self._is_flushed:
+            self._data.flush()
+            self._index.flush()
+            self._is_flushed = True
+        # the end of every line is the start of the next one
+        self._index.seek(start * _OFFSET.size)
+        offsets = [offset for offset, in _OFFSET.iter_unpack(
+            self._index.read((stop - start + 1) * _OFFSET.size))]
+        if stop == self._count:
+            offsets.append(self._offset)
+        # writing goes on at the ends of files
+        self._index.seek(0, os.SEEK_END)
+        self._data.seek(offsets[0])
+        data = self._data.read(offsets[-1] - offsets[0])
+        self._data.seek(0, os.SEEK_END)
+        return data.decode('utf-8', 'replace').split('\n')[:-1]
@@ -0,0 +1,57 @@
+import logging
+import os
+import traceback
+from typing import Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def scan(folder_path: str) -> Iterator[os.DirEntry]:
+    """
+    Yield entries of all files inside folder and its subfolders.
+    Walks without recursion, so depth of folder tree doesn't matter,
+    and file types are taken from directory listing without extra syscalls.
+    """
+    if not os.path.isdir(folder_path):
+        return
+    stack: List[str] = [folder_path]
+    # protects from infinite loops made by symbolic links
+    visited: Set[Tuple[int, int]] = set()
+    while stack:
+        current_path = stack.pop()
+        try:
+            stat = os.stat(current_path)
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+            # listing is read completely, so folder may change while
+            # its files are processed
+            with os.scandir(current_path) as iterator:
+                entries = list(iterator)
+        except OSError:
+            logger.error(traceback.format_exc())
+            continue
+
+        subfolders = []
+        for entry in entries:
+            if entry.is_file():
+                yield entry
+            elif entry.is_dir():
+                subfolders.append(entry.path)
+        # keep listing order of subfolders
+        stack.extend(reversed(subfolders))
+
+
+class FileEntry:
+    """ File known by path only, it is used like entry given by scandir """
+    __slots__ = ('path', 'name', '_stat')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat: Optional[os.stat_result] = None
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
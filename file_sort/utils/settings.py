@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+import sys
 from enum import Enum
 from typing import Dict, Optional
 
@@ -10,6 +11,23 @@ SETTINGS_PATH = os.path.join(
     os.path.dirname(__file__),
     SETTINGS_REL_PATH,
 )
+# name of folder of caches and journals inside user cache folder
+CACHE_DIR_NAME = 'file-sort'
+
+
+def get_cache_dir() -> str:
+    """ Folder for files program keeps between runs, it is per user """
+    if sys.platform == 'win32':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        root = os.path.expanduser('~/Library/Caches')
+    else:
+        root = (os.environ.get('XDG_CACHE_HOME') or
+                os.path.expanduser('~/.cache'))
+    return os.path.join(root, CACHE_DIR_NAME)
+
+
+CACHE_DIR = get_cache_dir()
 
 
 class SettingEnum(Enum):
@@ -19,7 +37,9 @@ class SettingEnum(Enum):
     OPTIONS = 'options'
     METHOD = 'method'
     CONFLICT = 'conflict'
+    DUPLICATES = 'duplicates'
     CLEANUP = 'cleanup'
+    CLASSIFICATION = 'classification'
     LNG = 'lng'
 
     @staticmethod
@@ -42,7 +62,9 @@ class SettingEnum(Enum):
             SettingEnum.OPTIONS: SettingEnum.single_value_handler,
             SettingEnum.METHOD: SettingEnum.single_value_handler,
             SettingEnum.CONFLICT: SettingEnum.single_value_handler,
+            SettingEnum.DUPLICATES: SettingEnum.single_value_handler,
             SettingEnum.CLEANUP: SettingEnum.single_value_handler,
+            SettingEnum.CLASSIFICATION: SettingEnum.single_value_handler,
             SettingEnum.LNG: SettingEnum.single_value_handler,
         }
 
@@ -1,9 +1,25 @@
+import re
 from gettext import gettext as _
-from typing import Dict, Set, Text, Type
+from typing import (
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Text,
+    Tuple,
+    Type,
+    Union
+)
 
-from .enums import ContentTypesEnum
+from .enums import ContentTypesEnum, MyEnum
 from .file_classes import File
-from .helpers import get_default_folder_name
+from .helpers import get_default_folder_name, get_locale_key
+
+PATH_DELIMITER = '/'
+TAG_PATTERN = '%[a-zA-Z]'
+# how many different folder paths renderer remembers
+RENDER_CACHE_SIZE = 4096
 
 
 class Tag:
@@ -26,6 +42,9 @@ class ContentTypeTag(Tag):
     def help_str():
         return _('Content type name of file (Images, Videos, ...)')
 
+    # translated names for every language used
+    _translations: Dict[Hashable, Tuple[Dict[MyEnum, str], str]] = {}
+
     @staticmethod
     def get_folder_names():
         return {
@@ -37,12 +56,12 @@ class ContentTypeTag(Tag):
 
     @classmethod
     def process(cls, file_obj: File) -> str:
-        folder_names = cls.get_folder_names()
-        if file_obj.content_type in folder_names:
-            result = folder_names[file_obj.content_type]
-        else:
-            result = get_default_folder_name()
-        return result
+        locale_key = get_locale_key()
+        if locale_key not in cls._translations:
+            cls._translations[locale_key] = (
+                cls.get_folder_names(), get_default_folder_name())
+        folder_names, default_name = cls._translations[locale_key]
+        return folder_names.get(file_obj.content_type, default_name)
 
 
 class ExtensionTag(Tag):
@@ -58,6 +77,9 @@ class ExtensionTag(Tag):
 
 
 class DateTimeTag(Tag):
+    # False if only date matters, not time of day
+    uses_time = True
+
     @classmethod
     def process(cls, file_obj: File) -> str:
         return file_obj.date.strftime(cls.tag)
@@ -65,6 +87,7 @@ class DateTimeTag(Tag):
 
 class YearTag(DateTimeTag):
     tag = '%Y'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -73,6 +96,7 @@ class YearTag(DateTimeTag):
 
 class DecimalMonthTag(DateTimeTag):
     tag = '%m'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -81,6 +105,7 @@ class DecimalMonthTag(DateTimeTag):
 
 class DayTag(DateTimeTag):
     tag = '%d'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -121,6 +146,7 @@ class TimeZoneTag(DateTimeTag):
 
 class WeekDayTag(DateTimeTag):
     tag = '%a'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -129,6 +155,7 @@ class WeekDayTag(DateTimeTag):
 
 class FullWeekDayTag(DateTimeTag):
     tag = '%A'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -137,6 +164,7 @@ class FullWeekDayTag(DateTimeTag):
 
 class AbbrMonthTag(DateTimeTag):
     tag = '%b'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -145,6 +173,7 @@ class AbbrMonthTag(DateTimeTag):
 
 class MonthTag(DateTimeTag):
     tag = '%B'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -177,6 +206,7 @@ class DayPartTag(DateTimeTag):
 
 class CapitalRomanMonthTag(DateTimeTag):
     tag = '%R'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -195,6 +225,7 @@ class CapitalRomanMonthTag(DateTimeTag):
 
 class SmallRomanMonthTag(DateTimeTag):
     tag = '%r'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -213,6 +244,7 @@ class SmallRomanMonthTag(DateTimeTag):
 
 class NumberInCircleMonthTag(DateTimeTag):
     tag = '%C'
+    uses_time = False
 
     @staticmethod
     def help_str():
@@ -279,6 +311,63 @@ for x in classes:
     TagProcessor.add_tag_class(x)
 
 
+class PathRenderer:
+    """
+    Path format compiled once into folder levels with tag slots.
+    Tags depend only on date, content type and extension of file,
+    so rendered folders are remembered for every such combination
+    """
+    def __init__(self, path_format: Text,
+                 cache_size: int = RENDER_CACHE_SIZE):
+        self.levels: List[List[Union[Text, Type[Tag]]]] = [
+            self._compile_level(level)
+            for level in path_format.split(PATH_DELIMITER)]
+
+        date_tags = [
+            slot for level in self.levels for slot in level
+            if isinstance(slot, type) and issubclass(slot, DateTimeTag)]
+        self._uses_date = bool(date_tags)
+        self._uses_time = any(tag.uses_time for tag in date_tags)
+
+        self.cache_size = cache_size
+        self._cache: Dict[Hashable, Tuple[Text, ...]] = {}
+
+    def render(self, file_obj: File) -> Tuple[Text, ...]:
+        """ Get folder names file must be placed in """
+        date_key: Optional[Hashable] = None
+        if self._uses_time:
+            date_key = file_obj.date
+        elif self._uses_date:
+            date_key = file_obj.date.date()
+        key = (date_key, file_obj.content_type, file_obj.extension)
+
+        result = self._cache.get(key)
+        if result is None:
+            result = tuple(
+                ''.join(
+                    slot if isinstance(slot, str) else slot.process(file_obj)
+                    for slot in level)
+                for level in self.levels)
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[key] = result
+        return result
+
+    @staticmethod
+    def _compile_level(level: Text) -> List[Union[Text, Type[Tag]]]:
+        slots: List[Union[Text, Type[Tag]]] = []
+        for i, part in enumerate(re.split(f'({TAG_PATTERN})', level)):
+            if i % 2 == 0:
+                if part:
+                    slots.append(part)
+            elif part in TagProcessor.tag_classes:
+                slots.append(TagProcessor.tag_classes[part])
+            else:
+                # level with unknown tag goes to default folder
+                return [get_default_folder_name()]
+        return slots
+
+
 def get_tag_help():
     separator_help = _('''/  - Folder structure separator''')
 
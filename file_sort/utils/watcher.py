@@ -0,0 +1,173 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# seconds size and modification time of file must stay the same
+SETTLE_TIME = 0.5
+# how many files are sorted at once
+WATCH_BATCH_SIZE = 256
+EVENTS_BUFFER_SIZE = 64 * 1024
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+if sys.platform.startswith('linux'):
+    _libc = ctypes.CDLL(
+        ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+
+
+def _check(result: int) -> int:
+    if result < 0:
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code))
+    return result
+
+
+class Watcher:
+    """
+    Watches folder and its subfolders for new files with inotify.
+    Nothing is polled: only files which were just written are checked
+    until their size and modification time stay the same for settle_time,
+    then they are given away in batches
+    """
+    def __init__(self, folder_path: str, settle_time: float = SETTLE_TIME,
+                 batch_size: int = WATCH_BATCH_SIZE):
+        if _libc is None:
+            raise OSError(errno.ENOSYS, 'Watching is supported on Linux only')
+        self.folder_path = folder_path
+        self.settle_time = settle_time
+        self.batch_size = batch_size
+        self._fd = _check(_libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        # stop() wakes up waiting thread by writing to this pipe
+        self._wakeup_fds = os.pipe()
+        self._folders: Dict[int, str] = {}
+        # files being written: size, modification time and when they changed
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._is_stopped = False
+        self._add_tree(folder_path, collect=False)
+
+    def batches(self) -> Iterator[List[str]]:
+        """ Yield paths of new files which aren't written anymore """
+        while not self._is_stopped:
+            # without files being written there is nothing to wait for
+            timeout = self.settle_time if self._pending else None
+            readable, _, _ = select.select(
+                [self._fd, self._wakeup_fds[0]], [], [], timeout)
+            if self._fd in readable:
+                self._read_events()
+            ready = self._take_ready()
+            for i in range(0, len(ready), self.batch_size):
+                yield ready[i:i + self.batch_size]
+
+    def stop(self):
+        self._is_stopped = True
+        os.write(self._wakeup_fds[1], b'\0')
+
+    def close(self):
+        os.close(self._fd)
+        for fd in self._wakeup_fds:
+            os.close(fd)
+
+    def _add_tree(self, folder_path: str, collect: bool):
+        """
+        Watch folder and its subfolders.
+        Files already inside are collected if folder is new,
+        folder is watched before listing, so no file is missed
+        """
+        stack = [folder_path]
+        while stack:
+            path = stack.pop()
+            try:
+                wd = _check(_libc.inotify_add_watch(  # type: ignore
+                    self._fd, os.fsencode(path), WATCH_MASK))
+                self._folders[wd] = path
+                with os.scandir(path) as iterator:
+                    entries = list(iterator)
+            except OSError as e:
+                if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                    logger.exception(f'{path} can`t be watched')
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif collect and entry.is_file():
+                    self._touch(entry.path)
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, EVENTS_BUFFER_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                logger.warning('Too many events, folder is scanned again')
+                self._add_tree(self.folder_path, collect=True)
+            elif mask & IN_IGNORED:
+                # folder was removed
+                self._folders.pop(wd, None)
+            elif wd in self._folders:
+                path = os.path.join(self._folders[wd], name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(path, collect=True)
+                else:
+                    self._touch(path)
+
+    def _touch(self, path: str):
+        """ Remember that file has changed """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            return
+        self._pending[path] = (
+            stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def _take_ready(self) -> List[str]:
+        """ Take files which haven't changed for settle_time """
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime_ns, changed_at) in list(
+                self._pending.items()):
+            if now - changed_at < self.settle_time:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # file was removed or renamed
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                del self._pending[path]
+                ready.append(path)
+            else:
+                self._pending[path] = (
+                    stat.st_size, stat.st_mtime_ns, now)
+        return ready
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+
+def write(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture(scope='class')
+def files(request):
+    """ Test case gets write() and read() of text files """
+    request.cls.write = staticmethod(write)
+    request.cls.read = staticmethod(read)
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+from file_sort.utils.cache import MetadataCache
+from file_sort.utils.enums import ClassificationMethodEnum, ContentTypesEnum
+from file_sort.utils.file_classes import FileInfo
+
+
+class MethodKeyTestCase(unittest.TestCase):
+    """ Type guessed by extension isn't given out as checked by content """
+    def test_method_key(self):
+        with tempfile.TemporaryDirectory() as root:
+            file_path = os.path.join(root, 'a.jpg')
+            with open(file_path, 'w') as f:
+                f.write('text')
+            stat = os.stat(file_path)
+            info = FileInfo(file_path, ContentTypesEnum.IMAGE, 'jpg',
+                            datetime(2020, 1, 2))
+            cache = MetadataCache(os.path.join(root, 'cache.sqlite3'))
+            cache.set(stat, info, ClassificationMethodEnum.EXTENSION)
+            cache.flush()
+
+            self.assertIsNone(cache.get(
+                file_path, stat, ClassificationMethodEnum.CONTENT))
+            cached = cache.get(
+                file_path, stat, ClassificationMethodEnum.EXTENSION)
+            cache.close()
+
+        self.assertEqual(cached.content_type, ContentTypesEnum.IMAGE)
+        self.assertEqual(cached.date, info.date)
+
+    def test_old_table_dropped(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'cache.sqlite3')
+            connection = sqlite3.connect(path)
+            connection.execute(
+                'CREATE TABLE files (dev INTEGER, ino INTEGER, size INTEGER, '
+                'mtime_ns INTEGER, content_type TEXT, extension TEXT, '
+                'date TEXT, used REAL)')
+            connection.commit()
+            connection.close()
+            cache = MetadataCache(path)
+            columns = [row[1] for row in cache._connection.execute(
+                'PRAGMA table_info(files)')]
+            cache.close()
+
+        self.assertIn('method', columns)
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.main import Sorter
+
+FOLDERS_COUNT = 20
+WORKERS = 8
+RUNS_COUNT = 5
+
+
+@pytest.mark.usefixtures('files')
+class SaveAllStressTestCase(unittest.TestCase):
+    """
+    File renamed to free name doesn't overwrite file
+    which is placed under that name at the same time
+    """
+    def test_free_names(self):
+        for _ in range(RUNS_COUNT):
+            with tempfile.TemporaryDirectory() as root:
+                self._check_run(root)
+
+    def _check_run(self, root: str):
+        src_path = os.path.join(root, 'src')
+        dst_path = os.path.join(root, 'dst')
+        contents = ['old']
+        self.write(os.path.join(dst_path, 'x', 'a.txt'), 'old')
+        for i in range(FOLDERS_COUNT):
+            for name in ('a.txt', f'a ({i + 2}).txt'):
+                content = f'{i} {name}'
+                self.write(os.path.join(src_path, str(i), name), content)
+                contents.append(content)
+        sorter = Sorter(
+            src_path, dst_path, 'x', SortMethodEnum.COPY,
+            ConflictResolveMethodEnum.SAVE_ALL,
+            FolderCleanupOptionsEnum.LEAVE, workers=WORKERS)
+        results = list(sorter.sort())
+
+        self.assertTrue(all(is_done for is_done, _ in results), results)
+        folder_path = os.path.join(dst_path, 'x')
+        self.assertEqual(
+            sorted(self.read(os.path.join(folder_path, name))
+                   for name in os.listdir(folder_path)),
+            sorted(contents))
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from file_sort.utils.duplicates import DuplicateFinder, HashCache
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    DuplicatesOptionEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.main import Sorter
+from file_sort.utils.scanner import FileEntry
+
+OLD_CONTENT = '1' * 1000
+NEW_CONTENT = '2' * 1000
+
+
+@pytest.mark.usefixtures('files')
+class ReplacedDuplicateTestCase(unittest.TestCase):
+    """
+    File having the same content as replaced destination file
+    must not be taken for its duplicate
+    """
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        root = self._tmp.name
+        self.src_path = os.path.join(root, 'src')
+        self.dst_path = os.path.join(root, 'dst')
+        self.write(os.path.join(self.dst_path, 'x', 'a.txt'), OLD_CONTENT)
+        self.new_path = os.path.join(self.src_path, 'd2', 'a.txt')
+        self.same_path = os.path.join(self.src_path, 'd1', 'b.txt')
+        self.write(self.new_path, NEW_CONTENT)
+        self.write(self.same_path, OLD_CONTENT)
+        self.hash_cache = HashCache(os.path.join(root, 'hashes.sqlite3'))
+        self.addCleanup(self.hash_cache.close)
+
+    def _sort(self, method, duplicates_option):
+        sorter = Sorter(
+            self.src_path, self.dst_path, 'x', method,
+            ConflictResolveMethodEnum.REPLACE, FolderCleanupOptionsEnum.LEAVE,
+            duplicates_option=duplicates_option, hash_cache=self.hash_cache,
+            keep_order=True)
+        # replacing file goes first
+        entries = [FileEntry(self.new_path), FileEntry(self.same_path)]
+        return list(sorter.sort_files(entries))
+
+    def test_move_and_link(self):
+        results = self._sort(SortMethodEnum.MOVE, DuplicatesOptionEnum.LINK)
+        self.assertTrue(all(is_done for is_done, _ in results))
+        self.assertEqual(
+            self.read(os.path.join(self.dst_path, 'x', 'a.txt')), NEW_CONTENT)
+        self.assertEqual(
+            self.read(os.path.join(self.dst_path, 'x', 'b.txt')), OLD_CONTENT)
+
+    def test_skip(self):
+        results = self._sort(SortMethodEnum.COPY, DuplicatesOptionEnum.SKIP)
+        self.assertTrue(all(is_done for is_done, _ in results))
+        self.assertEqual(
+            self.read(os.path.join(self.dst_path, 'x', 'b.txt')), OLD_CONTENT)
+
+
+@pytest.mark.usefixtures('files')
+class DuplicateFinderTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.dst_path = os.path.join(self._tmp.name, 'dst')
+        self.path = os.path.join(self.dst_path, 'a.txt')
+        self.write(self.path, OLD_CONTENT)
+        self.src_path = os.path.join(self._tmp.name, 'src', 'b.txt')
+        self.write(self.src_path, OLD_CONTENT)
+        self.finder = DuplicateFinder(self.dst_path)
+
+    def test_renamed_candidate(self):
+        new_path = os.path.join(self.dst_path, 'a_1.txt')
+        self.finder.find(self.src_path, os.stat(self.src_path))
+        os.rename(self.path, new_path)
+        self.finder.rename(self.path, new_path)
+        duplicate_path, _ = self.finder.find(
+            self.src_path, os.stat(self.src_path))
+        self.assertEqual(duplicate_path, new_path)
+
+    def test_changed_candidate(self):
+        self.assertIsNotNone(
+            self.finder.find(self.src_path, os.stat(self.src_path))[0])
+        # other file with the same size is written under the same name
+        os.remove(self.path)
+        self.write(self.path, NEW_CONTENT)
+        duplicate_path, _ = self.finder.find(
+            self.src_path, os.stat(self.src_path))
+        self.assertIsNone(duplicate_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+from unittest import mock
+
+from file_sort.utils.enums import EventKindEnum
+from file_sort.utils.events import MEGABYTE, Progress, SortEvent
+
+
+class ProgressTestCase(unittest.TestCase):
+    """ Bytes of failed files are not taken for transferred ones """
+    def setUp(self):
+        self.progress = Progress(total_files=3, total_bytes=4 * MEGABYTE)
+        self.progress.update(SortEvent(
+            EventKindEnum.FINISHED, 'a', MEGABYTE, is_done=True))
+        self.progress.update(SortEvent(
+            EventKindEnum.FINISHED, 'b', 2 * MEGABYTE, error='Error'))
+        self.progress.update(SortEvent(
+            EventKindEnum.PROGRESS, 'c', MEGABYTE, MEGABYTE // 2))
+
+    def test_bytes(self):
+        self.assertEqual(self.progress.files, 2)
+        self.assertEqual(self.progress.files_failed, 1)
+        self.assertEqual(self.progress.bytes, MEGABYTE + MEGABYTE // 2)
+        self.assertEqual(self.progress.bytes_failed, 2 * MEGABYTE)
+
+    def test_eta(self):
+        with mock.patch.object(Progress, 'elapsed', 3.0):
+            # 1.5 MB transferred in 3 seconds, 0.5 MB is left
+            self.assertEqual(self.progress.eta, 1.0)
+            self.assertEqual(self.progress.to_text(),
+                             '0.5 MB/s, 0:00:01 left')
+
+    def test_unknown_eta(self):
+        progress = Progress()
+        self.assertIsNone(progress.eta)
+        self.assertTrue(progress.to_text().endswith('? left'))
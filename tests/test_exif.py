@@ -0,0 +1,125 @@
+import io
+import struct
+import unittest
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from file_sort.utils.exif import (
+    TAG_DATE_TIME,
+    TAG_DATE_TIME_DIGITIZED,
+    TAG_DATE_TIME_ORIGINAL,
+    TAG_EXIF_IFD,
+    ExifError,
+    read_exif_date
+)
+
+DATE_TIME = datetime(2001, 1, 1, 10, 0, 0)
+ORIGINAL = datetime(2002, 2, 2, 11, 0, 0)
+DIGITIZED = datetime(2003, 3, 3, 12, 0, 0)
+
+
+def make_tiff(endian: str = '<', date_time: Optional[datetime] = None,
+              original: Optional[datetime] = None,
+              digitized: Optional[datetime] = None) -> bytes:
+    """ TIFF block with dates in main IFD and EXIF IFD """
+    def pack(fmt: str, *values) -> bytes:
+        return struct.pack(endian + fmt, *values)
+
+    main = [(TAG_DATE_TIME, date_time)] if date_time else []
+    exif: List[Tuple[int, datetime]] = [
+        (tag, date) for tag, date in ((TAG_DATE_TIME_ORIGINAL, original),
+                                      (TAG_DATE_TIME_DIGITIZED, digitized))
+        if date]
+    main_count = len(main) + bool(exif)
+    exif_offset = 8 + 2 + main_count * 12 + 4
+    data_offset = exif_offset + (2 + len(exif) * 12 + 4 if exif else 0)
+    data = b''
+
+    def ascii_entry(tag: int, date: datetime) -> bytes:
+        nonlocal data
+        value = date.strftime('%Y:%m:%d %H:%M:%S').encode() + b'\x00'
+        entry = pack('HHII', tag, 2, len(value), data_offset + len(data))
+        data += value
+        return entry
+
+    main_ifd = pack('H', main_count) + b''.join(
+        ascii_entry(tag, date) for tag, date in main)
+    if exif:
+        main_ifd += pack('HHII', TAG_EXIF_IFD, 4, 1, exif_offset)
+    main_ifd += pack('I', 0)
+    exif_ifd = b''
+    if exif:
+        exif_ifd = pack('H', len(exif)) + b''.join(
+            ascii_entry(tag, date) for tag, date in exif) + pack('I', 0)
+    magic = b'II*\x00' if endian == '<' else b'MM\x00*'
+    return magic + pack('I', 8) + main_ifd + exif_ifd + data
+
+
+def make_jpeg(tiff: bytes) -> bytes:
+    """ JPEG with APP0 segment before EXIF one and no picture """
+    exif = b'Exif\x00\x00' + tiff
+    return b''.join((
+        b'\xff\xd8',
+        b'\xff\xe0', struct.pack('>H', 16), b'JFIF\x00' + b'\x00' * 9,
+        b'\xff\xe1', struct.pack('>H', len(exif) + 2), exif,
+        b'\xff\xda', struct.pack('>H', 2),
+        b'\xff\xd9',
+    ))
+
+
+class DatePriorityTestCase(unittest.TestCase):
+    """ Digitized date goes first, then original one, then date of file """
+    def _read(self, **dates) -> Optional[datetime]:
+        return read_exif_date(io.BytesIO(make_jpeg(make_tiff(**dates))))
+
+    def test_all_dates(self):
+        self.assertEqual(self._read(date_time=DATE_TIME, original=ORIGINAL,
+                                    digitized=DIGITIZED), DIGITIZED)
+
+    def test_original(self):
+        self.assertEqual(
+            self._read(date_time=DATE_TIME, original=ORIGINAL), ORIGINAL)
+
+    def test_date_time(self):
+        self.assertEqual(self._read(date_time=DATE_TIME), DATE_TIME)
+
+    def test_no_dates(self):
+        self.assertIsNone(self._read())
+
+    def test_big_endian_tiff(self):
+        f = io.BytesIO(make_tiff('>', date_time=DATE_TIME,
+                                 original=ORIGINAL))
+        self.assertEqual(read_exif_date(f), ORIGINAL)
+
+    def test_no_exif_segment(self):
+        f = io.BytesIO(b'\xff\xd8\xff\xda\x00\x02\xff\xd9')
+        self.assertIsNone(read_exif_date(f))
+
+
+class TruncatedTestCase(unittest.TestCase):
+    """ Cut files are told as broken ones, not read past their end """
+    def setUp(self):
+        self.tiff = make_tiff(date_time=DATE_TIME, original=ORIGINAL)
+
+    def test_segment(self):
+        jpeg = make_jpeg(self.tiff)
+        # EXIF segment is longer than what is left of file
+        f = io.BytesIO(jpeg[:len(jpeg) - 20])
+        with self.assertRaises(ExifError):
+            read_exif_date(f)
+
+    def test_segment_length(self):
+        with self.assertRaises(ExifError):
+            read_exif_date(io.BytesIO(b'\xff\xd8\xff\xe1\x00'))
+
+    def test_date_value(self):
+        with self.assertRaises(ExifError):
+            read_exif_date(io.BytesIO(self.tiff[:-5]))
+
+    def test_ifd(self):
+        with self.assertRaises(ExifError):
+            read_exif_date(io.BytesIO(self.tiff[:12]))
+
+    def test_not_image(self):
+        with self.assertRaises(ExifError):
+            read_exif_date(io.BytesIO(b'plain text'))
@@ -0,0 +1,134 @@
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from file_sort.utils import fastcopy
+from file_sort.utils.fastcopy import (
+    FileChangedError,
+    clone_file,
+    copy_file,
+    report_progress
+)
+
+CHUNK_SIZE = 64 * 1024
+HOLE_SIZE = 4 * 1024 * 1024
+DATA = b'data' * 1024
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'),
+                     'kernel copying is Linux only')
+class CopyFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.src_path = os.path.join(self._tmp.name, 'src')
+        self.dst_path = os.path.join(self._tmp.name, 'dst')
+
+    def _write(self, data: bytes):
+        with open(self.src_path, 'wb') as f:
+            f.write(data)
+
+    def _read(self) -> bytes:
+        with open(self.dst_path, 'rb') as f:
+            return f.read()
+
+    def test_clone(self):
+        self._write(DATA)
+
+        def _ioctl(dst_fd: int, request: int, src_fd: int):
+            # file system shares blocks, it is like copying for reader
+            os.sendfile(dst_fd, src_fd, 0, len(DATA))
+
+        with mock.patch.object(fastcopy.fcntl, 'ioctl',
+                               side_effect=_ioctl) as ioctl, \
+                mock.patch.object(fastcopy, '_copy_data') as copy_data:
+            copy_file(self.src_path, self.dst_path)
+        self.assertEqual(ioctl.call_args[0][1], fastcopy.FICLONE)
+        copy_data.assert_not_called()
+        self.assertEqual(self._read(), DATA)
+        self.assertEqual(os.stat(self.dst_path).st_mtime_ns,
+                         os.stat(self.src_path).st_mtime_ns)
+
+    def test_clone_unsupported(self):
+        self._write(DATA)
+        error = OSError(errno.EOPNOTSUPP, 'Operation not supported')
+        with mock.patch.object(fastcopy.fcntl, 'ioctl', side_effect=error):
+            self.assertFalse(clone_file(self.src_path, self.dst_path))
+            self.assertFalse(os.path.exists(self.dst_path))
+            copy_file(self.src_path, self.dst_path)
+        self.assertEqual(self._read(), DATA)
+
+    @unittest.skipUnless(hasattr(os, 'copy_file_range'),
+                         'copy_file_range is needed')
+    def test_copy_file_range(self):
+        self._write(DATA)
+        with mock.patch.object(fastcopy, '_clone', return_value=False), \
+                mock.patch('os.copy_file_range',
+                           wraps=os.copy_file_range) as copy_file_range:
+            copy_file(self.src_path, self.dst_path)
+        self.assertTrue(copy_file_range.called)
+        self.assertEqual(self._read(), DATA)
+
+    @unittest.skipUnless(hasattr(os, 'copy_file_range'),
+                         'copy_file_range is needed')
+    def test_copy_file_range_unsupported(self):
+        self._write(DATA)
+        error = OSError(errno.EXDEV, 'Invalid cross-device link')
+        with mock.patch.object(fastcopy, '_clone', return_value=False), \
+                mock.patch('os.copy_file_range', side_effect=error):
+            copy_file(self.src_path, self.dst_path)
+        self.assertEqual(self._read(), DATA)
+
+    def test_sparse(self):
+        with open(self.src_path, 'wb') as f:
+            f.seek(HOLE_SIZE)
+            f.write(DATA)
+            f.truncate(2 * HOLE_SIZE)
+        src_stat = os.stat(self.src_path)
+        if src_stat.st_blocks * 512 >= src_stat.st_size:
+            self.skipTest('file system doesn`t keep holes')
+        with mock.patch.object(fastcopy, '_clone', return_value=False):
+            copy_file(self.src_path, self.dst_path)
+
+        dst_stat = os.stat(self.dst_path)
+        self.assertEqual(dst_stat.st_size, 2 * HOLE_SIZE)
+        self.assertLess(dst_stat.st_blocks * 512, HOLE_SIZE)
+        with open(self.dst_path, 'rb') as f:
+            self.assertEqual(
+                os.lseek(f.fileno(), 0, os.SEEK_DATA) // 4096,
+                HOLE_SIZE // 4096)
+            f.seek(HOLE_SIZE)
+            self.assertEqual(f.read(len(DATA)), DATA)
+            self.assertEqual(f.read(), b'\0' * (HOLE_SIZE - len(DATA)))
+
+    def test_shrunk_source(self):
+        self._write(DATA * 64)
+
+        def _shrink(copied: int):
+            os.truncate(self.src_path, copied)
+
+        with mock.patch.object(fastcopy, '_clone', return_value=False), \
+                mock.patch.object(fastcopy, 'PROGRESS_CHUNK_SIZE',
+                                  CHUNK_SIZE), \
+                report_progress(_shrink), \
+                self.assertRaises(FileChangedError):
+            copy_file(self.src_path, self.dst_path)
+        self.assertFalse(os.path.exists(self.dst_path))
+
+    def test_changed_source(self):
+        self._write(DATA * 64)
+
+        def _append(copied: int):
+            with open(self.src_path, 'ab') as f:
+                f.write(DATA)
+
+        with mock.patch.object(fastcopy, '_clone', return_value=False), \
+                mock.patch.object(fastcopy, 'PROGRESS_CHUNK_SIZE',
+                                  CHUNK_SIZE), \
+                report_progress(_append), \
+                self.assertRaises(FileChangedError):
+            copy_file(self.src_path, self.dst_path)
+        self.assertFalse(os.path.exists(self.dst_path))
@@ -0,0 +1,80 @@
+import builtins
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from file_sort.utils.exif import read_exif_date
+from file_sort.utils.header import HeaderReader
+from tests.test_exif import ORIGINAL, make_jpeg, make_tiff
+
+HEADER_SIZE = 16
+DATA = bytes(range(256)) * 4
+
+
+class HeaderReaderTestCase(unittest.TestCase):
+    """ Everybody reading file shares one open and one read of header """
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.path = os.path.join(self._tmp.name, 'file.bin')
+        with open(self.path, 'wb') as f:
+            f.write(DATA)
+
+    def _open(self, header_size: int = HEADER_SIZE) -> HeaderReader:
+        reader = HeaderReader(self.path, header_size)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_lazy_open(self):
+        reader = HeaderReader(os.path.join(self._tmp.name, 'missing'))
+        # nothing is opened until somebody reads
+        with self.assertRaises(FileNotFoundError):
+            reader.read(1)
+        reader.close()
+
+    def test_single_open(self):
+        with mock.patch.object(builtins, 'open', wraps=open) as open_mock:
+            reader = self._open()
+            self.assertEqual(reader.header, DATA[:HEADER_SIZE])
+            self.assertEqual(reader.read(4), DATA[:4])
+            reader.seek(0)
+            self.assertEqual(reader.read(HEADER_SIZE), DATA[:HEADER_SIZE])
+            # the rest is read from the same opened file
+            reader.seek(100)
+            self.assertEqual(reader.read(8), DATA[100:108])
+            self.assertEqual(reader.header, DATA[:HEADER_SIZE])
+        self.assertEqual(open_mock.call_count, 1)
+
+    def test_header_reused(self):
+        reader = self._open()
+        reader.header
+        reader._file.read = mock.Mock(
+            side_effect=AssertionError('file is read again'))
+        reader.seek(2)
+        self.assertEqual(reader.read(8), DATA[2:10])
+
+    def test_small_file(self):
+        reader = self._open(header_size=len(DATA) * 2)
+        with mock.patch('os.stat', side_effect=AssertionError(
+                'size of file is known')):
+            self.assertEqual(reader.read(), DATA)
+            self.assertEqual(reader.seek(-4, io.SEEK_END), len(DATA) - 4)
+            self.assertEqual(reader.read(), DATA[-4:])
+
+    def test_seek_end(self):
+        reader = self._open()
+        self.assertEqual(reader.seek(-8, io.SEEK_END), len(DATA) - 8)
+        self.assertEqual(reader.read(), DATA[-8:])
+        self.assertEqual(reader.tell(), len(DATA))
+
+    def test_exif_after_header(self):
+        # date is read through the same reader type was guessed with
+        with open(self.path, 'wb') as f:
+            f.write(make_jpeg(make_tiff(original=ORIGINAL)))
+        with mock.patch.object(builtins, 'open', wraps=open) as open_mock:
+            reader = self._open()
+            self.assertTrue(reader.header.startswith(b'\xff\xd8'))
+            self.assertEqual(read_exif_date(reader), ORIGINAL)
+        self.assertEqual(open_mock.call_count, 1)
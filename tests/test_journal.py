@@ -0,0 +1,239 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import List, Optional
+from unittest import mock
+
+import pytest
+
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.journal import Journal
+from file_sort.utils.main import Sorter
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTENT = 'new content ' * 100
+OLD_CONTENT = 'old content'
+FILES_COUNT = 10
+
+
+@pytest.mark.usefixtures('files')
+class RecoverTestCase(unittest.TestCase):
+    """ Resumed run removes what interrupted run left unfinished """
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        root = self._tmp.name
+        self.src_path = os.path.join(root, 'src')
+        self.dst_path = os.path.join(root, 'dst')
+        self.journal_path = os.path.join(root, 'journal.jsonl')
+        self.file_path = os.path.join(self.src_path, 'a.txt')
+        self.new_file_path = os.path.join(self.dst_path, 'x', 'a.txt')
+        self.write(self.file_path, CONTENT)
+        os.makedirs(self.dst_path)
+
+    def _interrupt(self, operation: str, done: bool = False,
+                   stat: Optional[os.stat_result] = None):
+        """ Journal of run stopped while file was placed """
+        if stat is None:
+            stat = os.stat(self.file_path)
+        journal = Journal(self.journal_path)
+        journal.start(self.file_path, self.new_file_path, operation, stat)
+        if done:
+            journal.done(self.file_path, stat)
+        journal.close()
+
+    def _resume(self, method, conflict_resolve_method=(
+            ConflictResolveMethodEnum.SAVE_ALL)):
+        journal = Journal(self.journal_path, resume=True)
+        sorter = Sorter(
+            self.src_path, self.dst_path, 'x', method,
+            conflict_resolve_method, FolderCleanupOptionsEnum.LEAVE,
+            journal=journal)
+        try:
+            return list(sorter.sort())
+        finally:
+            journal.close()
+
+    def test_copy(self):
+        self.write(self.new_file_path, CONTENT[:10])
+        self._interrupt('copy')
+        results = self._resume(SortMethodEnum.COPY)
+        self.assertEqual(results, [(True, self.file_path)])
+        self.assertEqual(os.listdir(os.path.dirname(self.new_file_path)),
+                         ['a.txt'])
+        self.assertEqual(self.read(self.new_file_path), CONTENT)
+        self.assertTrue(os.path.exists(self.file_path))
+
+    def test_move(self):
+        # copy to other device was interrupted, source is left
+        self.write(self.new_file_path, CONTENT[:10])
+        self._interrupt('move')
+        results = self._resume(SortMethodEnum.MOVE)
+        self.assertEqual(results, [(True, self.file_path)])
+        self.assertEqual(self.read(self.new_file_path), CONTENT)
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_renamed_move(self):
+        # file was renamed, but it wasn't recorded
+        stat = os.stat(self.file_path)
+        os.makedirs(os.path.dirname(self.new_file_path))
+        os.rename(self.file_path, self.new_file_path)
+        self._interrupt('move', stat=stat)
+        self.assertEqual(self._resume(SortMethodEnum.MOVE), [])
+        self.assertEqual(self.read(self.new_file_path), CONTENT)
+
+    def test_recreated_after_rename(self):
+        # file was renamed, then other file was written at its path
+        stat = os.stat(self.file_path)
+        os.makedirs(os.path.dirname(self.new_file_path))
+        os.rename(self.file_path, self.new_file_path)
+        self._interrupt('move', stat=stat)
+        self.write(self.file_path, OLD_CONTENT)
+        results = self._resume(SortMethodEnum.MOVE)
+        self.assertEqual(results, [(True, self.file_path)])
+        self.assertEqual(self._read_all(), [CONTENT, OLD_CONTENT])
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_recreated_after_move(self):
+        # file was moved, then other file was written at its path
+        journal = Journal(self.journal_path)
+        sorter = Sorter(
+            self.src_path, self.dst_path, 'x', SortMethodEnum.MOVE,
+            ConflictResolveMethodEnum.SAVE_ALL,
+            FolderCleanupOptionsEnum.LEAVE, journal=journal)
+        list(sorter.sort())
+        journal.close()
+        self.write(self.file_path, OLD_CONTENT)
+        results = self._resume(SortMethodEnum.MOVE)
+        self.assertEqual(results, [(True, self.file_path)])
+        self.assertEqual(self._read_all(), [CONTENT, OLD_CONTENT])
+
+    def test_source_of_move_left(self):
+        # file was copied, removal of source was postponed
+        self.write(self.new_file_path, CONTENT)
+        self._interrupt('move', done=True)
+        self.assertEqual(self._resume(SortMethodEnum.MOVE), [])
+        self.assertEqual(self.read(self.new_file_path), CONTENT)
+        self.assertFalse(os.path.exists(self.file_path))
+
+    def test_source_without_copy_left(self):
+        # copy was removed by somebody, source is the only one left
+        self._interrupt('move', done=True)
+        results = self._resume(SortMethodEnum.MOVE)
+        self.assertEqual(results, [])
+        self.assertEqual(self.read(self.file_path), CONTENT)
+
+    def test_save_all(self):
+        # file with the same name was renamed, then copy was interrupted
+        folder_path = os.path.dirname(self.new_file_path)
+        self.write(os.path.join(folder_path, 'a (2).txt'), OLD_CONTENT)
+        self.write(self.new_file_path, CONTENT[:10])
+        self._interrupt('copy')
+        results = self._resume(SortMethodEnum.COPY)
+        self.assertEqual(results, [(True, self.file_path)])
+        self.assertEqual(sorted(os.listdir(folder_path)),
+                         ['a (2).txt', 'a.txt'])
+        self.assertEqual(self.read(self.new_file_path), CONTENT)
+        self.assertEqual(
+            self.read(os.path.join(folder_path, 'a (2).txt')), OLD_CONTENT)
+
+    def _read_all(self) -> List[str]:
+        """ Contents of files placed to destination folder """
+        folder_path = os.path.dirname(self.new_file_path)
+        return sorted(self.read(os.path.join(folder_path, name))
+                      for name in os.listdir(folder_path))
+
+
+@pytest.mark.usefixtures('files')
+class IdentityTestCase(unittest.TestCase):
+    """ File is done only while it is the same file """
+    def test_changed_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            file_path = os.path.join(root, 'a.txt')
+            journal_path = os.path.join(root, 'journal.jsonl')
+            self.write(file_path, CONTENT)
+            journal = Journal(journal_path)
+            journal.done(file_path, os.stat(file_path))
+            journal.close()
+
+            journal = Journal(journal_path, resume=True)
+            self.assertTrue(journal.is_done(file_path, os.stat(file_path)))
+            self.write(file_path, OLD_CONTENT)
+            self.assertFalse(journal.is_done(file_path, os.stat(file_path)))
+            journal.close()
+
+
+@pytest.mark.usefixtures('files')
+class CompactTestCase(unittest.TestCase):
+    """ Journal keeps only files which are still in place """
+    @mock.patch('file_sort.utils.journal.JOURNAL_COMPACT_SIZE', 4)
+    def test_compact(self):
+        with tempfile.TemporaryDirectory() as root:
+            journal_path = os.path.join(root, 'journal.jsonl')
+            file_paths = [os.path.join(root, 'src', f'{i}.txt')
+                          for i in range(FILES_COUNT)]
+            journal = Journal(journal_path)
+            for file_path in file_paths:
+                self.write(file_path, CONTENT)
+                journal.done(file_path, os.stat(file_path))
+            for file_path in file_paths[2:]:
+                os.remove(file_path)
+            journal.compact()
+            journal.close()
+            with open(journal_path) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+            journal = Journal(journal_path, resume=True)
+            for file_path in file_paths[:2]:
+                self.assertTrue(
+                    journal.is_done(file_path, os.stat(file_path)))
+            # records are few again, journal is left as it is
+            journal.compact()
+            journal.close()
+            with open(journal_path) as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+
+@pytest.mark.usefixtures('files')
+class ResumeTestCase(unittest.TestCase):
+    """ Files placed before interruption are not placed again """
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as root:
+            src_path = os.path.join(root, 'src')
+            dst_path = os.path.join(root, 'dst')
+            journal_path = os.path.join(root, 'journal.jsonl')
+            for i in range(FILES_COUNT):
+                self.write(os.path.join(src_path, f'{i}.txt'), str(i))
+            os.makedirs(dst_path)
+
+            journal = Journal(journal_path)
+            sorter = Sorter(
+                src_path, dst_path, 'x', SortMethodEnum.COPY,
+                ConflictResolveMethodEnum.SAVE_ALL,
+                FolderCleanupOptionsEnum.LEAVE, journal=journal)
+            results = sorter.sort()
+            for _ in range(FILES_COUNT // 2):
+                next(results)
+            results.close()
+            journal.close()
+
+            process = subprocess.run(
+                [sys.executable, '-m', 'file_sort.cli', src_path, dst_path,
+                 'x', '--resume', '--journal-path', journal_path],
+                cwd=ROOT_PATH, stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT, universal_newlines=True)
+            self.assertEqual(process.returncode, 0, process.stdout)
+            self.assertNotIn('[FAIL]', process.stdout)
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(dst_path, 'x'))),
+                sorted(f'{i}.txt' for i in range(FILES_COUNT)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.main import Sorter
+from file_sort.utils.metrics import Metrics
+
+FILES_COUNT = 6
+
+
+class ErrorCountTestCase(unittest.TestCase):
+    """ Error leaving nested timers is counted once """
+    def test_conflict_errors(self):
+        with tempfile.TemporaryDirectory() as root:
+            src_path = os.path.join(root, 'src')
+            dst_path = os.path.join(root, 'dst')
+            for folder_path in (src_path, os.path.join(dst_path, 'x')):
+                os.makedirs(folder_path)
+                for i in range(FILES_COUNT):
+                    with open(os.path.join(folder_path, f'{i}.txt'),
+                              'w') as f:
+                        f.write(str(i))
+            metrics = Metrics()
+            sorter = Sorter(
+                src_path, dst_path, 'x', SortMethodEnum.COPY,
+                ConflictResolveMethodEnum.DO_NOTHING,
+                FolderCleanupOptionsEnum.LEAVE, metrics=metrics)
+            results = list(sorter.sort())
+
+        self.assertFalse(any(is_done for is_done, _ in results))
+        errors = metrics.summary()['errors']
+        self.assertEqual(sum(error['count'] for error in errors),
+                         FILES_COUNT)
+        self.assertEqual(errors[0]['error'], 'FileExistsError')
+
+
+if __name__ == '__main__':
+    unittest.main()
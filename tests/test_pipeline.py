@@ -0,0 +1,81 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.main import Sorter
+
+FILES_COUNT = 30
+
+
+class EarlyCloseTestCase(unittest.TestCase):
+    """ Nothing is released while threads of stages still run """
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.src_path = os.path.join(self._tmp.name, 'src')
+        self.dst_path = os.path.join(self._tmp.name, 'dst')
+        os.makedirs(self.dst_path)
+        for i in range(200):
+            folder_path = os.path.join(self.src_path, str(i % 10))
+            os.makedirs(folder_path, exist_ok=True)
+            with open(os.path.join(folder_path, f'{i}.txt'), 'w') as f:
+                f.write(str(i))
+
+    def test_close(self):
+        sorter = Sorter(
+            self.src_path, self.dst_path, '%T', SortMethodEnum.MOVE,
+            ConflictResolveMethodEnum.SAVE_ALL,
+            FolderCleanupOptionsEnum.REMOVE, workers=4)
+        close = sorter._folders.close
+        alive = []
+
+        def _close():
+            alive.extend(
+                thread.name for thread in threading.enumerate()
+                if thread.name.startswith(('source', 'metadata',
+                                           'planner', 'transfer')))
+            close()
+        sorter._folders.close = _close  # type: ignore
+
+        results = sorter.sort()
+        next(results)
+        results.close()
+        self.assertEqual(alive, [])
+
+
+class ManifestTestCase(unittest.TestCase):
+    """ Counted files are kept as paths and sorted all """
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as root:
+            src_path = os.path.join(root, 'src')
+            dst_path = os.path.join(root, 'dst')
+            os.makedirs(dst_path)
+            for i in range(FILES_COUNT):
+                folder_path = os.path.join(src_path, str(i % 3))
+                os.makedirs(folder_path, exist_ok=True)
+                with open(os.path.join(folder_path, f'{i}.txt'), 'w') as f:
+                    f.write(str(i))
+            sorter = Sorter(
+                src_path, dst_path, 'x', SortMethodEnum.COPY,
+                ConflictResolveMethodEnum.SAVE_ALL,
+                FolderCleanupOptionsEnum.LEAVE)
+            self.assertEqual(sorter.total, FILES_COUNT)
+            self.assertTrue(all(isinstance(path, str)
+                                for path in sorter.manifest))
+            self.assertEqual(sorter.total_bytes, len(''.join(
+                str(i) for i in range(FILES_COUNT))))
+            results = list(sorter.sort())
+            self.assertEqual(len(results), FILES_COUNT)
+            self.assertTrue(all(is_done for is_done, _ in results))
+            self.assertEqual(len(os.listdir(os.path.join(dst_path, 'x'))),
+                             FILES_COUNT)
+
+
+if __name__ == '__main__':
+    unittest.main()
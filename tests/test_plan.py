@@ -0,0 +1,56 @@
+import io
+import os
+import tempfile
+import unittest
+
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.main import Sorter
+
+FOLDERS_COUNT = 10
+NAMES_COUNT = 6
+# runs of execution, order of workers differs every time
+REPEAT = 5
+
+
+class ExecuteSameNamesTestCase(unittest.TestCase):
+    """ Entries with the same destination are executed in plan order """
+    def test_parallel_execute(self):
+        for _ in range(REPEAT):
+            with tempfile.TemporaryDirectory() as root:
+                self._check(root)
+
+    def _check(self, root: str):
+        src_path = os.path.join(root, 'src')
+        dst_path = os.path.join(root, 'dst')
+        os.makedirs(dst_path)
+        for i in range(FOLDERS_COUNT):
+            folder_path = os.path.join(src_path, str(i))
+            os.makedirs(folder_path)
+            for j in range(NAMES_COUNT):
+                with open(os.path.join(folder_path, f'{j}.txt'), 'w') as f:
+                    f.write(f'{i} {j}')
+
+        def _get_sorter(workers: int) -> Sorter:
+            return Sorter(
+                src_path, dst_path, 'x', SortMethodEnum.COPY,
+                ConflictResolveMethodEnum.SAVE_ALL,
+                FolderCleanupOptionsEnum.LEAVE, workers=workers)
+
+        plan_file = io.StringIO()
+        self.assertTrue(all(
+            is_done for is_done, _ in _get_sorter(1).plan(plan_file)))
+        plan_file.seek(0)
+        results = list(_get_sorter(8).execute(plan_file))
+        self.assertEqual(len(results), FOLDERS_COUNT * NAMES_COUNT)
+        self.assertEqual(
+            [path for is_done, path in results if not is_done], [])
+        self.assertEqual(len(os.listdir(os.path.join(dst_path, 'x'))),
+                         FOLDERS_COUNT * NAMES_COUNT)
+
+
+if __name__ == '__main__':
+    unittest.main()
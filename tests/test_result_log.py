@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from file_sort.utils.result_log import ResultLog
+
+RECENT_SIZE = 10
+LINES_COUNT = 35
+
+
+class PagingTestCase(unittest.TestCase):
+    """ Any page of lines is read, old ones from file, last from memory """
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.log = ResultLog(os.path.join(self._tmp.name, 'done.log'),
+                             RECENT_SIZE)
+        self.addCleanup(self.log.close)
+        self.lines = [f'line {i} путь' for i in range(LINES_COUNT)]
+        for line in self.lines:
+            self.log.append(line)
+
+    def test_pages(self):
+        self.assertEqual(len(self.log), LINES_COUNT)
+        for start in range(-2, LINES_COUNT + 2):
+            for count in (1, 3, RECENT_SIZE, LINES_COUNT):
+                self.assertEqual(
+                    self.log.get(start, count),
+                    self.lines[max(start, 0):max(start, 0) + count],
+                    (start, count))
+
+    def test_from_file(self):
+        with mock.patch.object(ResultLog, '_read',
+                               wraps=self.log._read) as read:
+            self.log.get(LINES_COUNT - RECENT_SIZE, RECENT_SIZE)
+            read.assert_not_called()
+            self.log.get(0, 5)
+            read.assert_called_once_with(0, 5)
+
+    def test_append_after_read(self):
+        # reading must not move position lines are written at
+        self.log.get(0, 5)
+        self.log.append('new line')
+        self.log.get(3, 2)
+        self.log.append('last line')
+        lines = self.lines + ['new line', 'last line']
+        self.assertEqual(self.log.get(0, len(lines)), lines)
+        with open(self.log.path, encoding='utf-8') as f:
+            self.assertEqual(f.read().splitlines(), lines)
+
+    def test_new_lines_replaced(self):
+        self.log.append('first\nsecond')
+        self.assertEqual(self.log.get(LINES_COUNT, 1), ['first second'])
+
+    @mock.patch('file_sort.utils.result_log.SEARCH_CHUNK_SIZE', 4)
+    def test_find(self):
+        self.assertEqual(self.log.find('LINE 7 '), 7)
+        self.assertEqual(self.log.find('line 1', 2), 10)
+        self.assertEqual(self.log.find('line 33', 20), 33)
+        self.assertIsNone(self.log.find('missing'))
+
+    @mock.patch('file_sort.utils.result_log.SEARCH_CHUNK_SIZE', 4)
+    def test_filter(self):
+        filtered = self.log.filter(
+            'line 2', os.path.join(self._tmp.name, 'filtered.log'))
+        self.addCleanup(filtered.remove)
+        expected = [line for line in self.lines if 'line 2' in line]
+        self.assertEqual(filtered.get(0, LINES_COUNT), expected)
+
+    def test_remove(self):
+        self.log.remove()
+        self.assertFalse(os.path.exists(self.log.path))
+        self.assertFalse(os.path.exists(self.log.index_path))
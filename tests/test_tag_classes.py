@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime
+
+from file_sort.utils.enums import ContentTypesEnum
+from file_sort.utils.file_classes import File
+from file_sort.utils.tag_classes import PathRenderer
+
+MORNING = datetime(2020, 5, 2, 9, 15)
+EVENING = datetime(2020, 5, 2, 21, 45)
+NEXT_DAY = datetime(2020, 5, 3, 9, 15)
+
+
+def make_file(date: datetime, name: str = 'a.jpg') -> File:
+    return File(name, ContentTypesEnum.IMAGE, date)
+
+
+class MemoKeyTestCase(unittest.TestCase):
+    """ Folders are remembered by as much of date as format uses """
+    def test_date_only(self):
+        renderer = PathRenderer('%Y/%m/%d')
+        self.assertEqual(renderer.render(make_file(MORNING)),
+                         ('2020', '05', '02'))
+        self.assertEqual(renderer.render(make_file(EVENING)),
+                         ('2020', '05', '02'))
+        self.assertEqual(len(renderer._cache), 1)
+        self.assertEqual(renderer.render(make_file(NEXT_DAY)),
+                         ('2020', '05', '03'))
+        self.assertEqual(len(renderer._cache), 2)
+
+    def test_time(self):
+        renderer = PathRenderer('%Y/%H')
+        self.assertEqual(renderer.render(make_file(MORNING)),
+                         ('2020', '09'))
+        self.assertEqual(renderer.render(make_file(EVENING)),
+                         ('2020', '21'))
+        self.assertEqual(len(renderer._cache), 2)
+
+    def test_time_with_date(self):
+        # one tag with time is enough for whole date to be the key
+        renderer = PathRenderer('%Y/%m/%d %M')
+        self.assertEqual(renderer.render(make_file(MORNING)),
+                         ('2020', '05', '02 15'))
+        self.assertEqual(renderer.render(make_file(EVENING)),
+                         ('2020', '05', '02 45'))
+
+    def test_no_date(self):
+        renderer = PathRenderer('%E')
+        self.assertEqual(renderer.render(make_file(MORNING)), ('jpg',))
+        self.assertEqual(renderer.render(make_file(NEXT_DAY)), ('jpg',))
+        self.assertEqual(renderer.render(make_file(MORNING, 'a.png')),
+                         ('png',))
+        self.assertEqual(len(renderer._cache), 2)
+
+    def test_cache_size(self):
+        renderer = PathRenderer('%d', cache_size=1)
+        for date in (MORNING, NEXT_DAY, MORNING):
+            self.assertEqual(renderer.render(make_file(date)),
+                             (date.strftime('%d'),))
+        self.assertEqual(len(renderer._cache), 1)
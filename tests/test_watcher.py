@@ -0,0 +1,130 @@
+import os
+import sys
+import tempfile
+import unittest
+from typing import Iterator, List
+
+import pytest
+
+from file_sort.utils.enums import (
+    ConflictResolveMethodEnum,
+    FolderCleanupOptionsEnum,
+    SortMethodEnum
+)
+from file_sort.utils.journal import Journal
+from file_sort.utils.main import Sorter
+from file_sort.utils.watcher import Watcher
+
+SETTLE_TIME = 0.05
+CONTENT = 'content'
+NEW_CONTENT = 'new content'
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is needed')
+@pytest.mark.usefixtures('files')
+class WatcherTestCase(unittest.TestCase):
+    """ Files are given away once they are written and closed """
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = self._tmp.name
+        self.watcher = Watcher(self.root, settle_time=SETTLE_TIME)
+        self.addCleanup(self.watcher.close)
+        self.batches = self.watcher.batches()
+        self.addCleanup(self.batches.close)
+
+    def test_close_write(self):
+        file_path = os.path.join(self.root, 'a.txt')
+        with open(file_path, 'w') as f:
+            f.write(CONTENT)
+            f.flush()
+            # file is given away after it is closed and settled only once
+            with open(file_path, 'a') as other_f:
+                other_f.write(CONTENT)
+        self.assertEqual(next(self.batches), [file_path])
+        self.assertEqual(self.read(file_path), CONTENT * 2)
+
+    def test_new_folder(self):
+        # file could be written before folder is watched
+        file_path = os.path.join(self.root, 'sub', 'deeper', 'a.txt')
+        self.write(file_path, CONTENT)
+        self.assertEqual(next(self.batches), [file_path])
+
+    def test_stop(self):
+        self.watcher.stop()
+        self.assertEqual(list(self.batches), [])
+
+
+class RewritingWatcher:
+    """ Writes sorted file again and tells about it """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def batches(self) -> Iterator[List[str]]:
+        with open(self.file_path, 'w') as f:
+            f.write(NEW_CONTENT)
+        yield [self.file_path]
+
+
+class UploadWatcher:
+    """ Tells about files written one by one to new folder """
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self.is_folder_kept = False
+
+    def batches(self) -> Iterator[List[str]]:
+        os.makedirs(self.folder_path)
+        for name in ('a.txt', 'b.txt'):
+            # folder must be there while files are written to it
+            self.is_folder_kept = os.path.isdir(self.folder_path)
+            file_path = os.path.join(self.folder_path, name)
+            with open(file_path, 'w') as f:
+                f.write(name)
+            yield [file_path]
+
+
+@pytest.mark.usefixtures('files')
+class WatchTestCase(unittest.TestCase):
+    """ File written again at sorted path is sorted again """
+    def test_rewritten_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            src_path = os.path.join(root, 'src')
+            dst_path = os.path.join(root, 'dst')
+            file_path = os.path.join(src_path, 'a.txt')
+            self.write(file_path, CONTENT)
+            os.makedirs(dst_path)
+            journal = Journal(os.path.join(root, 'journal.jsonl'))
+            sorter = Sorter(
+                src_path, dst_path, 'x', SortMethodEnum.COPY,
+                ConflictResolveMethodEnum.SAVE_ALL,
+                FolderCleanupOptionsEnum.LEAVE, journal=journal)
+            results = list(sorter.watch(RewritingWatcher(file_path)))
+            journal.close()
+
+            self.assertEqual(results, [(True, file_path)] * 2)
+            folder_path = os.path.join(dst_path, 'x')
+            self.assertEqual(
+                sorted(self.read(os.path.join(folder_path, name))
+                       for name in os.listdir(folder_path)),
+                [CONTENT, NEW_CONTENT])
+
+    def test_cleanup(self):
+        with tempfile.TemporaryDirectory() as root:
+            src_path = os.path.join(root, 'src')
+            dst_path = os.path.join(root, 'dst')
+            os.makedirs(src_path)
+            os.makedirs(dst_path)
+            watcher = UploadWatcher(os.path.join(src_path, 'upload'))
+            sorter = Sorter(
+                src_path, dst_path, 'x', SortMethodEnum.MOVE,
+                ConflictResolveMethodEnum.SAVE_ALL,
+                FolderCleanupOptionsEnum.REMOVE)
+            results = list(sorter.watch(watcher))
+
+            self.assertEqual(len(results), 2)
+            self.assertTrue(watcher.is_folder_kept)
+            # empty folder is removed when watching stops
+            self.assertEqual(os.listdir(src_path), [])
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(dst_path, 'x'))),
+                ['a.txt', 'b.txt'])